@@ -6,6 +6,13 @@ from __future__ import absolute_import, print_function, division, unicode_litera
 This package provides both direct access to wrapped versions of the functions
 provided by the ahkdll, and also object wrappers around common operations.
 """
+import sys
+
+# Color matching, frame views and the engine helpers use Python 3 only APIs
+if sys.version_info < (3, 4):
+    raise ImportError("pyahk requires Python 3.4 or later!")
+del sys
+
 from ahk.ahk import *
 from ahk.script import Function, Script
 from ahk.control import Control
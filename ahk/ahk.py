@@ -5,53 +5,256 @@ from __future__ import absolute_import, print_function, division, unicode_litera
 
 Wrappers are provided for the functions found here:
     http://www.autohotkey.net/~HotKeyIt/AutoHotkey/files/Functions_List-txt.html
+
+All wrappers act on the current :class:`Engine` and delegate to its backend
+(see :func:`set_backend`), by default the loaded AutoHotkey.dll.
 """
-import ctypes, time, os
+import ctypes, itertools, re, shutil, tempfile, threading, time, os, weakref
 from functools import wraps
 
 from builtins import str
 
-_ahk = None
+from ahk.backend import Backend, DllBackend, _join_units, _units
+
+class Engine(object):
+    """An AutoHotkey engine instance with its own backend and state.
+
+    Every wrapper function of this module is also available as an Engine
+    method acting on that engine, e.g. ``engine.execute("x := 1")``.
+    The module level functions act on the current engine: the default engine,
+    unless another one is activated for the calling thread with::
+
+        with engine:
+            ahk.execute("x := 1")
+
+    Several engines can run side by side, each loaded from its own copy of
+    AutoHotkey.dll, as the dll holds a single script thread per module.
+    """
+
+    def __init__(self, backend=None, path=None):
+        """
+        :param backend: Backend to use, None loads a new AutoHotkey.dll copy.
+        :type backend: ahk.Backend instance or None
+        :param path: The dll to copy (default the first found, see
+            :func:`load_ahk_dll`).
+        :type path: str or None
+        :raises: OSError if no backend is given and the dll can't be loaded.
+        """
+        # Releases the dll copy of the engine, see close()
+        self._copy = None
+        if backend is None:
+            backend, folder = _load_dll_copy(path)
+            # Also run when the engine is garbage collected or at exit
+            self._copy = weakref.finalize(self, _remove_dll_copy, backend,
+                                          folder)
+        self.backend = backend
+        self.handle = None
+        # Handles from resolve_func, emptied when the script (re)starts/stops
+        self.funcs = {}
+        # Helper sources installed by _call_many, emptied along with funcs
+        self.helpers = {}
+        # Dispatcher shared by the engine's users, see ahk.dispatch.shared
+        self.dispatcher = None
+        # Time of the last start() and how long until ready() saw it running
+        self.started = None
+        self.startup = None
+
+    def batch(self, size=None):
+        """:returns: A :class:`Batch` queueing commands for this engine."""
+        return Batch(size, engine=self)
+
+    def close(self):
+        """Terminate the script and release the engine.
+
+        The dll copy loaded for the engine is unloaded and its temporary
+        folder deleted, the engine can't be used afterwards. Engines given a
+        backend only terminate their script. The engine's shared dispatcher
+        (see :func:`ahk.dispatch.shared`) is shut down first. Leaving a with
+        block only deactivates an engine, it is closed by this method or when
+        garbage collected.
+        """
+        if self._copy is not None and not self._copy.alive:
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.shutdown()
+        self.terminate()
+        if self._copy is not None:
+            self._copy()
+            self.backend = Backend()
+
+    def __enter__(self):
+        stack = getattr(_active, 'stack', None)
+        if stack is None:
+            stack = _active.stack = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active.stack.pop()
+        return False
+
+# Per-thread stack of engines activated with the with statement
+_active = threading.local()
+# Without a backend until one is selected by load_ahk_dll/set_backend below
+_default = Engine(backend=Backend())
+
+def _engine():
+    """:returns: The engine module level functions act on in this thread."""
+    stack = getattr(_active, 'stack', None)
+    if stack:
+        return stack[-1]
+    return _default
+
+def default_engine():
+    """:returns: The :class:`Engine` used unless another one is activated."""
+    return _default
+
+def current_engine():
+    """:returns: The :class:`Engine` wrapper functions act on in this thread."""
+    return _engine()
+
+def set_backend(backend):
+    """Select the backend of the default engine.
+
+    :param backend: The new backend, or None to unset.
+    :type backend: ahk.Backend instance
+    :returns: The previously selected backend.
+    """
+    previous = _default.backend
+    _default.backend = backend
+    return previous
+
+def get_backend():
+    """:returns: The backend of the current engine (or None)."""
+    return _engine().backend
+
+def _dll_paths():
+    """:returns: List of (path, unicode) for the dlls shipped with the module."""
+    path = os.path.dirname(__file__)
+    dllpaths = [r'ahkdll\Win32w\AutoHotkey.dll', r'ahkdll\Win32a\AutoHotkey.dll']
+    # Only a 64 bit dll can be loaded into a 64 bit process
+    if ctypes.sizeof(ctypes.c_void_p) == 8:
+        dllpaths = [r'ahkdll\x64w\AutoHotkey.dll']
+    # Win32a is the only ANSI build
+    return [(os.path.abspath(os.path.join(path, dllpath)),
+             'Win32a' not in dllpath)
+            for dllpath in dllpaths + [r'AutoHotkey.dll']]
+
 def load_ahk_dll():
-    global _ahk
+    """Load AutoHotkey.dll and select it as the engine backend.
+
+    The system dll is preferred, followed by the copies shipped in the module
+    directory matching the pointer width of the running Python.
+    Export prototypes are declared once here (see :class:`ahk.DllBackend`).
+
+    :returns: 0 if a dll was loaded, else 1.
+    """
     # This try/except allows documentation to be generated without access to the dll
     try:
-        _ahk = ctypes.cdll.AutoHotkey #load AutoHotKey dll
+        set_backend(DllBackend(ctypes.cdll.AutoHotkey)) #load AutoHotKey dll
+        return 0
     except OSError:
-        # Try loading the dll from the module directory
-        path = os.path.dirname(__file__)
-        dllpath1 = os.path.join(path, r'ahkdll\x64w\AutoHotkey.dll')
-        dllpath2 = os.path.join(path, r'ahkdll\Win32w\AutoHotkey.dll')
-        dllpath3 = os.path.join(path, r'ahkdll\Win32a\AutoHotkey.dll')
-        dllpath4 = os.path.join(path, r'AutoHotkey.dll')
-        
-        err_cnt = 0
-        try:
-            _ahk = ctypes.cdll.LoadLibrary(os.path.abspath(dllpath1))
-            return 0
-        except OSError:
-            err_cnt += 1
+        pass
+    # Try loading the dll from the module directory
+    for dllpath, unicode in _dll_paths():
         try:
-            _ahk = ctypes.cdll.LoadLibrary(os.path.abspath(dllpath2))
-            return 0
+            dll = ctypes.cdll.LoadLibrary(dllpath)
         except OSError:
-            err_cnt += 1
-        try:
-            _ahk = ctypes.cdll.LoadLibrary(os.path.abspath(dllpath3))
-            return 0
-        except OSError:
-            err_cnt += 1
+            continue
+        set_backend(DllBackend(dll, unicode=unicode))
+        return 0
+    print("Warning: Can't load AutoHotkey.dll, all ahk functions will fail.")
+    return 1
+
+_dll_copies = itertools.count(1)
+
+def _load_dll_copy(path=None):
+    """Load a private copy of AutoHotkey.dll for a new Engine.
+
+    Loading the same file twice returns the already loaded module, so the
+    dll is copied to a uniquely named temporary file first.
+
+    :returns: Tuple of the DllBackend for the copy and the temporary folder
+        holding it (see :func:`_remove_dll_copy`).
+    """
+    candidates = [(path, 'Win32a' not in path)] if path else _dll_paths()
+    for dllpath, unicode in candidates:
+        if not os.path.exists(dllpath):
+            continue
+        folder = tempfile.mkdtemp(prefix="pyahk")
+        copy = os.path.join(folder, "AutoHotkey{0}.dll".format(next(_dll_copies)))
+        shutil.copyfile(dllpath, copy)
         try:
-            _ahk = ctypes.cdll.LoadLibrary(os.path.abspath(dllpath4))
-            return 0
-        except OSError:
-            err_cnt += 1
-            
-        if err_cnt >= 4:
-            print("Warning: Can't load AutoHotkey.dll, all ahk functions will fail.")
-            return 1
+            return (DllBackend(ctypes.cdll.LoadLibrary(copy), unicode=unicode),
+                    folder)
+        except Exception:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+    raise OSError("Can't find AutoHotkey.dll to load a new engine from!")
+
+def _unload_dll(dll):
+    """Unload a dll loaded with ctypes, its functions can't be called after."""
+    if hasattr(ctypes, 'windll'):
+        free = ctypes.windll.kernel32.FreeLibrary
+        free.argtypes = [ctypes.c_void_p]
+        free(dll._handle)
+    else:
+        import _ctypes
+        _ctypes.dlclose(dll._handle)
 
-load_ahk_dll()
+def _remove_dll_copy(backend, folder):
+    """Terminate the script of a dll copy from :func:`_load_dll_copy`, unload
+    the copy and delete its folder."""
+    try:
+        if backend.ready():
+            backend.terminate(1)
+        _unload_dll(backend.dll)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+# The PYAHK_BACKEND environment variable allows running without the dll
+if os.environ.get('PYAHK_BACKEND', '').lower() == 'simulated':
+    from ahk.simulated import SimulatedBackend
+    set_backend(SimulatedBackend())
+else:
+    load_ahk_dll()
+
+# Per-thread stack of active Batch objects (see Batch)
+_batches = threading.local()
+_batch_ids = itertools.count(1)
+# Progress marker updated between the lines of a batch
+_BATCH_VAR = "_pyahk_batch"
+
+# Scratch variables of the object wrappers must not be shared across instances
+_scratch_ids = itertools.count(1)
+
+def _scratch_name():
+    """:returns: A new variable name, unique in this process."""
+    return "tmp{0}_{1}".format(int(time.time()), next(_scratch_ids))
+
+# Characters needing an escape inside quoted expression strings
+_QUOTE_ESCAPES = {'`': '``', '"': '""', '\n': '`n', '\r': '`r', ';': '`;'}
+_QUOTE_RE = re.compile('[`";\r\n]')
+
+def _quote(value):
+    """:returns: An ahk expression for value, integers are used as is."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    return '"{0}"'.format(_QUOTE_RE.sub(
+        lambda match: _QUOTE_ESCAPES[match.group()], str(value)))
+
+def _batch():
+    """:returns: The innermost active Batch of this thread, or None."""
+    stack = getattr(_batches, 'stack', None)
+    if stack:
+        return stack[-1]
+    return None
+
+def _flush():
+    """Run commands queued in an active batch before other calls to its engine."""
+    batch = _batch()
+    if batch is not None and batch.lines and batch.engine is _engine():
+        batch.flush()
 
 def start(filename=None, script="", options="", params=""):
     """Wrapper around ahkdll and ahktextdll.
@@ -67,33 +270,121 @@ def start(filename=None, script="", options="", params=""):
 
     :returns: Thread handle for created instance (see thread functions).
     """
+    _flush()
     #print(filename)
     if filename:
-        return _ahk.ahkdll(os.path.abspath(filename), options, params)
-    else:
-        return _ahk.ahktextdll(script, options, params)
+        filename = os.path.abspath(filename)
+    engine = _engine()
+    engine.started, engine.startup = _clock(), None
+    _invalidate_funcs()
+    engine.handle = engine.backend.start(filename, script, options, params)
+    return engine.handle
+
+# Monotonic where available, deadlines must not move with the wall clock
+_clock = getattr(time, 'monotonic', time.time)
+
+class Backoff(object):
+    """Adaptive polling policy used while waiting on the engine.
+
+    The first poll is repeated after `initial` seconds, every following delay
+    is `factor` times longer up to `maximum`. Fast engines are therefore
+    noticed within a fraction of a millisecond, while slow ones aren't
+    polled more often than every `maximum` seconds.
+    """
 
-def ready(nowait=False, retries=None):
+    def __init__(self, initial=0.0005, factor=2.0, maximum=0.05):
+        """
+        :param initial: First delay in seconds.
+        :type initial: float (default=0.0005)
+        :param factor: Growth of the delay after each poll.
+        :type factor: float (default=2.0)
+        :param maximum: Longest delay in seconds.
+        :type maximum: float (default=0.05)
+        """
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+
+    def delays(self, timeout=None, retries=None):
+        """Generate the delays to sleep between polls.
+
+        The last delay is shortened to end at the deadline, generation stops
+        when the deadline passes or after `retries` - 1 delays.
+
+        :param timeout: Seconds from now until the deadline, None for no limit.
+        :type timeout: float or None
+        :param retries: Total number of polls, None for no limit.
+        :type retries: int or None
+        """
+        deadline = None if timeout is None else _clock() + timeout
+        delay = self.initial
+        count = 1
+        while retries is None or count < retries:
+            if deadline is not None:
+                remaining = deadline - _clock()
+                if remaining <= 0:
+                    return
+                delay = min(delay, remaining)
+            yield delay
+            count += 1
+            delay = min(delay * self.factor, self.maximum)
+
+    def wait(self, check, timeout=None, retries=None):
+        """Poll `check` until it returns True.
+
+        :param check: Function called without arguments.
+        :type check: callable
+        :returns: True if check succeeded before the deadline, else False.
+        """
+        if check():
+            return True
+        for delay in self.delays(timeout, retries):
+            time.sleep(delay)
+            if check():
+                return True
+        return False
+
+def _check_ready():
+    """Poll ahkReady once, recording the startup time on success."""
+    engine = _engine()
+    if not engine.backend.ready():
+        return False
+    if engine.started is not None:
+        engine.startup = _clock() - engine.started
+        engine.started = None
+    return True
+
+def ready(nowait=False, retries=None, timeout=None, backoff=None):
     """Wrapper around ahkReady.
 
     Returns True if ahk is ready to use.
     By default this polls the dll function until it is ready.
     By calling with nowait=True the immediate result is returned instead.
     By calling with retries > 1 state will be checked at most retries times.
+    By calling with timeout state will be checked until timeout seconds
+    have passed.
+    Polls are spaced by an adaptive backoff (see :class:`Backoff`),
+    an awaitable version is available as :func:`ahk.aio.ready`.
+
+    :param backoff: Polling policy (default Backoff()).
+    :type backoff: Backoff or None
+    :returns: True if ready, else False.
     """
     if nowait:
         retries = 1
-    if retries and retries >= 1:
-        for i in range(retries):
-            if _ahk.ahkReady() == 1:
-                return True
-            time.sleep(0.01)
-    else:
-        while 1:
-            if _ahk.ahkReady() == 1:
-                return True
-            time.sleep(0.1)
-    return False
+    if retries is not None and retries < 1:
+        retries = None
+    return (backoff or Backoff()).wait(_check_ready, timeout, retries)
+
+def startup_time():
+    """How long the last started script took to become ready.
+
+    Measured from :func:`start` until :func:`ready` first saw the engine
+    running, so the value includes up to one polling delay.
+
+    :returns: The duration in seconds, or None if not (yet) known.
+    """
+    return _engine().startup
 
 def add_lines(script="", filename=None, duplicates=False, ignore=True):
     """Wrapper around addFile and addScript.
@@ -106,6 +397,7 @@ def add_lines(script="", filename=None, duplicates=False, ignore=True):
 
     :returns: Pointer address to first line in added script (see execute_line).
     """
+    _flush()
     if filename:
         if duplicates:
             duplicates = 1
@@ -117,21 +409,185 @@ def add_lines(script="", filename=None, duplicates=False, ignore=True):
                 ignore = 1
         else:
             ignore = 0
-        return int(_ahk.addFile(os.path.abspath(filename), duplicates, ignore))
+        return _engine().backend.add_file(os.path.abspath(filename), duplicates, ignore)
     else:
-        return int(_ahk.addScript(script))
+        return _engine().backend.add_script(script)
 
 def execute(script):
     """Wrapper around ahkExec.
 
     Execute provided ahk commands. No lines are added to the active script.
+    While a :class:`Batch` is active the commands are queued instead, and
+    True is always returned (see :attr:`Batch.results`).
 
     :returns: True if successful, else False.
     """
-    result = _ahk.ahkExec(script)
-    if result == 1:
+    batch = _batch()
+    if batch is not None and batch.engine is _engine():
+        batch.add(script)
         return True
-    return False
+    return _engine().backend.execute(script)
+
+def _valid_prefix(lines):
+    """Find how many leading lines load without error (without running them).
+
+    :returns: Tuple of the number of lines and the engine calls made.
+    """
+    # Bisect using a leading return, which loads but doesn't execute the lines
+    low, high, calls = 0, len(lines), 0
+    while low < high:
+        mid = (low + high + 1) // 2
+        calls += 1
+        if _engine().backend.execute("return\n" + "\n".join(lines[:mid])):
+            low = mid
+        else:
+            high = mid - 1
+    return low, calls
+
+def execute_many(lines, size=None):
+    """Execute a sequence of commands with as few engine calls as possible.
+
+    The lines are joined into a single ahkExec call (or one per `size` lines)
+    with a progress marker between lines, so the first failing line can be
+    reported. Each item must be a complete statement or block, execution stops
+    at the first failing line just like it would in a single script.
+    A group of lines costs two engine calls (execute and reading the marker),
+    more only when a line fails to load.
+
+    :param lines: The commands to execute.
+    :type lines: iterable of str
+    :param size: Maximum number of lines per engine call (default all).
+    :type size: int or None
+    :returns: A status per line: True if it ran, False if it failed,
+        None if it didn't run because an earlier line failed.
+    """
+    return _execute_many(lines, size)[0]
+
+def _execute_many(lines, size=None):
+    """See execute_many.
+
+    :returns: Tuple of the status per line and the engine calls made.
+    """
+    _flush()
+    lines = list(lines)
+    size = size or len(lines) or 1
+    results, calls = [], 0
+    for first in range(0, len(lines), size):
+        group = lines[first:first + size]
+        done, made = _execute_group(group)
+        results += done
+        calls += made
+        if results and results[-1] is not True:
+            break
+    results += [None] * (len(lines) - len(results))
+    return results, calls
+
+def _execute_group(lines):
+    """Execute lines in one engine call, see execute_many.
+
+    :returns: Tuple of the status per line and the engine calls made.
+    """
+    tag = next(_batch_ids)
+    marker = '{0} := "{1}:{{0}}"'.format(_BATCH_VAR, tag)
+    script = []
+    for i, line in enumerate(lines):
+        script.append(marker.format(i))
+        script.append(line)
+    script.append(marker.format(len(lines)))
+    success = _engine().backend.execute("\n".join(script))
+    progress = _engine().backend.get(_BATCH_VAR).split(":")
+    if progress[0] != str(tag):
+        # Nothing ran, find the line which fails to load and run those before
+        done, calls = _valid_prefix(lines)
+        results, made = _execute_group(lines[:done]) if done else ([], 0)
+        calls += 2 + made
+        if results and results[-1] is not True:
+            return results, calls
+        return results + [False], calls
+    done = int(progress[1])
+    if done == len(lines):
+        return [True] * done, 2
+    # Stopped at line `done`, either due to an error or an explicit exit
+    return [True] * done + [success], 2
+
+class Batch(object):
+    """Context manager queueing executed commands into batched engine calls.
+
+    Inside the block :func:`execute` (and so every Script/Control wrapper
+    built on it) queues commands, which are run through
+    :func:`execute_many` when the block exits. Any other engine call (e.g.
+    :func:`get`) first flushes the queue, so reads always see earlier
+    writes::
+
+        with ahk.Batch() as batch:
+            script.send("Hello")
+            script.click(x=10, y=10)
+        batch.failed # None, or index of the first failing command
+
+    Batches are per thread, entering a batch flushes any already active one.
+    Only commands for the batch's engine are queued, other engines aren't
+    affected.
+    """
+
+    def __init__(self, size=None, engine=None):
+        """
+        :param size: Maximum number of lines per engine call (default all).
+        :type size: int or None
+        :param engine: The engine to queue commands for (default current).
+        :type engine: Engine or None
+        """
+        self.size = size
+        self.engine = engine or _engine()
+        self.lines = []
+        self.executed = []
+        self.results = []
+
+    @property
+    def failed(self):
+        """Index of the first failed command, or None."""
+        for i, result in enumerate(self.results):
+            if result is False:
+                return i
+        return None
+
+    def add(self, script):
+        """Queue a command."""
+        self.lines.append(script)
+
+    def flush(self):
+        """Execute all queued commands.
+
+        :returns: The status of each flushed command (see execute_many).
+        """
+        lines, self.lines = self.lines, []
+        results = []
+        if lines:
+            stack = _batches.stack
+            stack.remove(self) # Don't re-queue while executing
+            try:
+                with self.engine:
+                    results = execute_many(lines, self.size)
+            finally:
+                stack.append(self)
+        self.executed += lines
+        self.results += results
+        return results
+
+    def __enter__(self):
+        _flush()
+        if getattr(_batches, 'stack', None) is None:
+            _batches.stack = []
+        _batches.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Queued commands run even if the block raised, as they would have
+        # without the batch.
+        try:
+            self.flush()
+        finally:
+            _batches.stack.remove(self)
+        return False
 
 def jump(label, nowait=False):
     """Wrapper around ahkLabel.
@@ -142,45 +598,145 @@ def jump(label, nowait=False):
 
     :returns: True if label exists, else False.
     """
+    _flush()
     if nowait:
         nowait = 1
     else:
         nowait = 0
 
-    result = _ahk.ahkLabel(label, nowait)
-    if result == 1:
-        return True
-    return False
+    return _engine().backend.jump(label, nowait)
+
+# ahkFunction/ahkPostFunction take at most this many arguments
+_MAX_ARGS = 10
+# Scratch variables passing the arguments of longer calls
+_ARG_VAR = "_pyahk_arg{0}"
+_RESULT_VAR = "_pyahk_result"
+_BLANKS = [''] * _MAX_ARGS
+
+def _pad(args):
+    """:returns: A new list of args as strings, padded with blanks."""
+    params = [str(arg) for arg in args]
+    params += _BLANKS[len(params):]
+    return params
+
+class FuncHandle(object):
+    """A resolved ahk function, see :func:`resolve_func`.
+
+    AutoHotkey.dll only calls functions by name, so a handle records that
+    the function exists and passes the name on. Handles stay valid until
+    the script is reloaded or terminated.
+    """
+
+    def __init__(self, name, engine):
+        """
+        :param name: The name of the function.
+        :type name: str
+        :param engine: The engine the function was found in.
+        :type engine: Engine
+        """
+        self.name = name
+        self.engine = engine
+        self.valid = True
+
+    def __call__(self, *args):
+        """Call the function (see :func:`call`).
+
+        :returns: Result of function call as a string.
+        """
+        _flush()
+        if len(args) > _MAX_ARGS:
+            with self.engine:
+                return _call_spilled(self.name, args)
+        return self.engine.backend.call(self.name, _pad(args))
+
+    def post(self, *args):
+        """Call the function discarding the result (see :func:`post`).
+
+        :returns: True if function exists, else False.
+        """
+        _flush()
+        if len(args) > _MAX_ARGS:
+            with self.engine:
+                return _call_spilled(self.name, args, result=False)
+        return self.engine.backend.post(self.name, _pad(args))
+
+    def __repr__(self):
+        return "<FuncHandle {0}{1}>".format(
+            self.name, "" if self.valid else " (invalid)")
+
+def _invalidate_funcs():
+    """Drop all cached function handles of the current engine."""
+    engine = _engine()
+    for handle in engine.funcs.values():
+        handle.valid = False
+    engine.funcs.clear()
+    engine.helpers.clear()
+
+def resolve_func(name):
+    """Resolve a function name to a cached :class:`FuncHandle`.
+
+    The name is looked up with ahkFindFunc on first use only, later calls
+    return the same handle until :func:`start`, :func:`reload` or
+    :func:`terminate` invalidate the cache. :func:`call` and :func:`post`
+    also use a cached handle when one exists.
+
+    :returns: FuncHandle, or None if the function doesn't exist.
+    """
+    engine = _engine()
+    handle = engine.funcs.get(name)
+    if handle is not None:
+        return handle
+    if not find_func(name):
+        return None
+    handle = engine.funcs[name] = FuncHandle(name, engine)
+    return handle
+
+def _call_spilled(func, args, result=True):
+    """Call with more than _MAX_ARGS arguments, passed through variables."""
+    names = [_ARG_VAR.format(i) for i in range(len(args))]
+    set_many(zip(names, args))
+    if not result:
+        return execute("{0}({1})".format(func, ", ".join(names)))
+    set(_RESULT_VAR, "")
+    if not execute("{0} := {1}({2})".format(_RESULT_VAR, func, ", ".join(names))):
+        return ""
+    return get(_RESULT_VAR)
 
 def call(func, *args):
     """Wrapper around ahkFunction.
 
     Call the indicated function.
+    Calls with more arguments than ahkFunction supports (10) are passed
+    through variables instead, taking a few more engine calls.
 
     :returns: Result of function call as a string.
     """
-    params = [''] * 10
-    if args:
-        params = [str(arg) for arg in args]
-        params += ['']*(10-len(params))
-    result = _ahk.ahkFunction(func, *params)
-    return ctypes.cast(int(result), ctypes.c_char_p).value
+    handle = _engine().funcs.get(func)
+    if handle is not None:
+        return handle(*args)
+    _flush()
+    if len(args) > _MAX_ARGS:
+        return _call_spilled(func, args)
+    params = [str(arg) for arg in args]
+    return _engine().backend.call(func, params)
 
 def post(func, *args):
     """Wrapper around ahkPostFunction.
 
     Call the indicated function but discard results.
+    Calls with more than 10 arguments are run synchronously (see
+    :func:`call`).
 
     :returns: True if function exists, else False.
     """
-    params = [''] * 10
-    if args:
-        params = [str(arg) for arg in args]
-        params += ['']*(10-len(params))
-    result = _ahk.ahkPostFunction(func, *params)
-    if result == 0: # 0 if function exists, else -1
-        return True
-    return False
+    handle = _engine().funcs.get(func)
+    if handle is not None:
+        return handle.post(*args)
+    _flush()
+    if len(args) > _MAX_ARGS:
+        return _call_spilled(func, args, result=False)
+    params = [str(arg) for arg in args]
+    return _engine().backend.post(func, params)
 
 def set(name, value):
     """Wrapper around ahkassign.
@@ -189,12 +745,10 @@ def set(name, value):
 
     :returns: True for success and False for failure.
     """
+    _flush()
     if not type(value) in (str,):
         value = str(value)
-    result = _ahk.ahkassign(name, value)
-    if result == 0: # 0 for success, else -1
-        return True
-    return False
+    return _engine().backend.set(name, value)
 
 def get(name, pointer=False):
     """Wrapper around ahkgetvar.
@@ -204,12 +758,105 @@ def get(name, pointer=False):
 
     :returns: A string representing the value, or a c_char_p.
     """
-    # Workaround for ahkgetvar always returning pointers
-    result = _ahk.ahkgetvar(name, 0)
-    result = ctypes.cast(int(result), ctypes.c_wchar_p)
-    if pointer:
+    _flush()
+    return _engine().backend.get(name, pointer)
+
+# Engine side helpers for get_many/set_many, installed on first use.
+# Values are length prefixed (in UTF-16 units, as counted by StrLen) so any
+# content can be transferred, the leading "#" tells the helpers are loaded.
+_MANY_FUNCS = """
+_pyahk_get_many(_pyahk_names) {
+    global
+    local _pyahk_out := "#", _pyahk_value
+    Loop, Parse, _pyahk_names, `n
+    {
+        _pyahk_value := %A_LoopField%
+        _pyahk_out .= StrLen(_pyahk_value) ":" _pyahk_value
+    }
+    return _pyahk_out
+}
+_pyahk_set_many(_pyahk_data) {
+    global
+    local _pyahk_pos := 1, _pyahk_end := StrLen(_pyahk_data)
+    local _pyahk_sep, _pyahk_name, _pyahk_len
+    while (_pyahk_pos <= _pyahk_end) {
+        _pyahk_sep := InStr(_pyahk_data, ":", true, _pyahk_pos)
+        _pyahk_name := SubStr(_pyahk_data, _pyahk_pos, _pyahk_sep - _pyahk_pos)
+        _pyahk_pos := InStr(_pyahk_data, ":", true, _pyahk_sep + 1)
+        _pyahk_len := SubStr(_pyahk_data, _pyahk_sep + 1, _pyahk_pos - _pyahk_sep - 1)
+        %_pyahk_name% := SubStr(_pyahk_data, _pyahk_pos + 1, _pyahk_len)
+        _pyahk_pos += _pyahk_len + 1
+    }
+    return "#"
+}
+"""
+
+def _call_many(func, args, source=_MANY_FUNCS):
+    """Call an engine side helper, installing the source when missing.
+
+    Helper results must start with "#". The source is installed at most once
+    per script run (see :func:`start`), a helper failing once installed
+    isn't reinstalled.
+
+    :raises: RuntimeError if the helper fails.
+    """
+    engine = _engine()
+    result = engine.backend.call(func, args)
+    if result.startswith("#"):
         return result
-    return result.value
+    if source not in engine.helpers:
+        engine.helpers[source] = func
+        # Defining the functions twice would be a load error
+        if not find_func(func):
+            engine.backend.add_script(source)
+            result = engine.backend.call(func, args)
+            if result.startswith("#"):
+                return result
+    raise RuntimeError("Engine helper {0} failed, got {1!r}!".format(
+        func, result))
+
+def get_many(names):
+    """Get the values of several variables with a single engine call.
+
+    :param names: The variable names.
+    :type names: iterable of str
+    :returns: dict of name -> string value.
+    """
+    _flush()
+    names = list(names)
+    if not names:
+        return {}
+    data = _call_many("_pyahk_get_many", ["\n".join(names)])
+    # Lengths count UTF-16 units, slice in those if the text has astral chars
+    data = _units(data)
+    values, pos = {}, 1
+    for name in names:
+        sep = data.index(":", pos)
+        end = sep + 1 + int(data[pos:sep])
+        values[name] = _join_units(data[sep + 1:end])
+        pos = end
+    return values
+
+def set_many(mapping):
+    """Assign several variables with a single engine call.
+
+    :param mapping: The variable names and values.
+    :type mapping: dict or iterable of (name, value) pairs
+    :returns: True for success and False for failure.
+    """
+    _flush()
+    if hasattr(mapping, 'items'):
+        mapping = mapping.items()
+    data = []
+    for name, value in mapping:
+        value = str(value)
+        data.append("{0}:{1}:{2}".format(name, len(_units(value)), value))
+    if not data:
+        return True
+    try:
+        return _call_many("_pyahk_set_many", ["".join(data)]) == "#"
+    except RuntimeError:
+        return False
 
 def terminate(timeout=1):
     """Wrapper around ahkTerminate.
@@ -217,15 +864,19 @@ def terminate(timeout=1):
     Terminate the script, removing all hotkeys and hotstrings.
     The default timeout is 1ms, must be positive > 0.
     """
+    _flush()
+    _invalidate_funcs()
     if ready(nowait=True):
-        _ahk.ahkTerminate(timeout)
+        _engine().backend.terminate(timeout)
 
 def reload():
     """Wrapper around ahkReload.
 
     Terminates and restarts the script.
     """
-    _ahk.ahkReload()
+    _flush()
+    _invalidate_funcs()
+    _engine().backend.reload()
 
 def find_func(name):
     """Wrapper around ahkFindFunc.
@@ -248,7 +899,8 @@ def find_func(name):
 
     :returns: The address of the function as an integer.
     """
-    return int(_ahk.ahkFindFunc(name))
+    _flush()
+    return _engine().backend.find_func(name)
 
 def find_label(name):
     """Wrapper around ahkFindLabel.
@@ -257,7 +909,8 @@ def find_label(name):
 
     :returns: The address of the label as an integer.
     """
-    return int(_ahk.ahkFindLabel(name))
+    _flush()
+    return _engine().backend.find_label(name)
 
 def pause(pause_=True):
     """Wrapper around ahkPause.
@@ -268,6 +921,7 @@ def pause(pause_=True):
 
     :returns: True if the script is paused, else False.
     """
+    _flush()
     # Changed arg name from pause to pause_ to appease pylint:
     # Redefining name 'pause' from outer scope
     if pause_:
@@ -276,10 +930,7 @@ def pause(pause_=True):
         pause_ = ""
     else:
         pause_ = 0
-    result = _ahk.ahkPause(pause_)
-    if result == 1:
-        return True
-    return False
+    return _engine().backend.pause(pause_)
 
 def exec_line(line=None, mode=3, wait=False):
     """Wrapper around ahkExecuteLine.
@@ -297,12 +948,45 @@ def exec_line(line=None, mode=3, wait=False):
 
     :returns: A line pointer address.
     """
+    _flush()
     if not line:
-        return int(_ahk.ahkExecuteLine("", 0, 0))
+        return _engine().backend.exec_line("", 0, 0)
     elif wait:
         wait = 1
     else:
         wait = 0
     #line = hex(line)
-    return int(_ahk.ahkExecuteLine(line, mode, wait))
-
+    return _engine().backend.exec_line(line, mode, wait)
+
+def _engine_method(func):
+    """Build an Engine method running a wrapper function on that engine."""
+    @wraps(func)
+    def method(self, *args, **kwargs):
+        with self:
+            return func(*args, **kwargs)
+    return method
+
+for _func in (start, ready, startup_time, add_lines, execute, execute_many,
+              jump, call, post, set, get, set_many, get_many, terminate,
+              reload, find_func, find_label, resolve_func, pause, exec_line):
+    setattr(Engine, _func.__name__, _engine_method(_func))
+del _func
+
+def _on_engine(method):
+    """Decorator running an object wrapper method on the object's engine."""
+    @wraps(method)
+    def bound(self, *args, **kwargs):
+        with self._engine:
+            return method(self, *args, **kwargs)
+    return bound
+
+def _engine_bound(cls):
+    """Class decorator binding the public methods of an object wrapper.
+
+    Instances keep their Engine as `_engine`, the wrapper functions called
+    from the methods then act on it instead of the current engine.
+    """
+    for name, attr in list(vars(cls).items()):
+        if callable(attr) and not name.startswith('_'):
+            setattr(cls, name, _on_engine(attr))
+    return cls
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""asyncio versions of the low-level wrappers and the Script/Control objects.
+
+This module requires Python 3 and isn't imported by the ahk package, use::
+
+    import ahk.aio
+
+    await ahk.aio.start()
+    await ahk.aio.ready(timeout=5)
+    script = await ahk.aio.Script.create()
+    await script.send("abc")
+
+AutoHotkey.dll expects to be driven from the thread that started it, so every
+engine call is run on one dedicated engine thread (see :func:`engine`) while
+the event loop keeps running. Waits are implemented as polls from the event
+loop, which makes them cancellable like any other task.
+"""
+import asyncio, concurrent.futures, threading
+from functools import partial, wraps
+
+from ahk import ahk as _ahk
+from ahk import control as _control
+from ahk import script as _script
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def engine():
+    """Get the executor owning the engine thread, creating it on first use.
+
+    :returns: concurrent.futures.ThreadPoolExecutor with a single thread.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="ahk-engine")
+        return _engine
+
+def shutdown(wait=True):
+    """Stop the engine thread, a new one is created by the next call.
+
+    :param wait: Whether to wait for pending calls to finish.
+    :type wait: bool (default=True)
+    """
+    global _engine
+    with _engine_lock:
+        executor, _engine = _engine, None
+    if executor is not None:
+        executor.shutdown(wait)
+
+async def run(func, *args, **kwargs):
+    """Run any callable on the engine thread.
+
+    :returns: The result of func(\\*args, \\*\\*kwargs).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(engine(),
+                                      partial(func, *args, **kwargs))
+
+def _wrap(func):
+    """Build an awaitable version of a blocking wrapper."""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    wrapper.__doc__ = "Awaitable :func:`ahk.{0}`, run on the engine thread.".format(
+        func.__name__)
+    return wrapper
+
+start = _wrap(_ahk.start)
+add_lines = _wrap(_ahk.add_lines)
+execute = _wrap(_ahk.execute)
+execute_many = _wrap(_ahk.execute_many)
+jump = _wrap(_ahk.jump)
+call = _wrap(_ahk.call)
+post = _wrap(_ahk.post)
+set = _wrap(_ahk.set)
+get = _wrap(_ahk.get)
+set_many = _wrap(_ahk.set_many)
+get_many = _wrap(_ahk.get_many)
+terminate = _wrap(_ahk.terminate)
+reload = _wrap(_ahk.reload)
+find_func = _wrap(_ahk.find_func)
+find_label = _wrap(_ahk.find_label)
+pause = _wrap(_ahk.pause)
+exec_line = _wrap(_ahk.exec_line)
+
+async def _poll(check, timeout=None, backoff=None):
+    """Run check on the engine thread until it returns True.
+
+    Sleeps between polls happen on the event loop, so cancelling the
+    awaiting task stops the wait.
+
+    :returns: True if check succeeded before timeout, else False.
+    """
+    if await run(check):
+        return True
+    for delay in (backoff or _ahk.Backoff()).delays(timeout):
+        await asyncio.sleep(delay)
+        if await run(check):
+            return True
+    return False
+
+async def ready(timeout=None, backoff=None):
+    """Awaitable :func:`ahk.ready`.
+
+    Polls ahkReady with the same adaptive backoff, but sleeps without
+    blocking the event loop.
+
+    :param timeout: Seconds to wait, None waits forever.
+    :type timeout: float or None (default=None)
+    :param backoff: Polling policy (default ahk.Backoff()).
+    :type backoff: ahk.Backoff or None
+    :returns: True if ready, else False.
+    """
+    return await _poll(_ahk._check_ready, timeout, backoff)
+
+class _Proxy(object):
+    """Awaitable facade over a blocking wrapper object.
+
+    Public methods of the wrapped object are returned as coroutine functions
+    running the method on the engine thread.
+    """
+
+    def __init__(self, wrapped):
+        """
+        :param wrapped: The blocking object to forward to.
+        """
+        self.wrapped = wrapped
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not callable(
+                getattr(type(self.wrapped), name, None)):
+            raise AttributeError("No method named {0}!".format(name))
+        return _wrap(getattr(self.wrapped, name))
+
+class Script(_Proxy):
+    """Awaitable wrapper around :class:`ahk.Script`.
+
+    All Script methods are available as coroutines, e.g.
+    ``await script.winActivate("Notepad")``.
+    Waiting methods poll from the event loop and can be cancelled.
+    """
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        """Create the ahk.Script on the engine thread.
+
+        Takes the same arguments as :class:`ahk.Script`.
+
+        :returns: New aio.Script instance.
+        """
+        return cls(await run(_script.Script, *args, **kwargs))
+
+    async def getvar(self, name):
+        """:returns: The converted value of the wrapped variable `name`."""
+        return await run(getattr, self.wrapped, name)
+
+    async def setvar(self, name, value):
+        """Assign value to the wrapped variable `name`."""
+        await run(setattr, self.wrapped, name, value)
+
+    async def waitWindow(self, title="", text="", timeout=5,
+                         extitle="", extext="", closed=False, backoff=None):
+        """Cancellable :meth:`ahk.Script.waitWindow`.
+
+        :returns: True if a matching window exists (or closed), else False.
+        """
+        def check():
+            found = self.wrapped.winExist(title, text, extitle, extext)
+            return not found if closed else bool(found)
+        return await _poll(check, timeout, backoff)
+
+    async def waitActive(self, title="", text="", timeout=5,
+                         extitle="", extext="", deactivate=False, backoff=None):
+        """Cancellable :meth:`ahk.Script.waitActive`.
+
+        :returns: True if a matching window is (de)activated, else False.
+        """
+        def check():
+            found = self.wrapped.winActive(title, text, extitle, extext)
+            return not found if deactivate else bool(found)
+        return await _poll(check, timeout, backoff)
+
+    async def waitPixel(self, x=0, y=0, color=None,
+                        threshold=0.01, interval=0.5, timeout=False):
+        """Cancellable :meth:`ahk.Script.waitPixel`.
+
+        :returns: True if pixel changed, False if timeout.
+        """
+        script = self.wrapped
+        # Wait for a match with the given color, else for a change
+        match = bool(color)
+        if not color:
+            color = await run(script.getPixel, x, y)
+        def check():
+            current = script.getPixel(x, y)
+            return (script._color_delta(color, current) <= threshold) == match
+        backoff = _ahk.Backoff(interval, 1, interval)
+        return await _poll(check, timeout or None, backoff)
+
+class Control(_Proxy):
+    """Awaitable wrapper around :class:`ahk.Control`."""
+
+    @classmethod
+    async def create(cls, script, *args, **kwargs):
+        """Create the ahk.Control on the engine thread.
+
+        Takes the same arguments as :class:`ahk.Control`.
+
+        :param script: Script object to use internally.
+        :type script: aio.Script or ahk.Script instance
+        :returns: New aio.Control instance.
+        """
+        if isinstance(script, Script):
+            script = script.wrapped
+        return cls(await run(_control.Control, script, *args, **kwargs))
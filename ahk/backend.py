@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Engine backends used by the low-level wrappers.
+
+The wrappers in :mod:`ahk.ahk` never talk to AutoHotkey.dll directly, instead
+they delegate to a backend object implementing the :class:`Backend` interface.
+:class:`DllBackend` forwards to the exports of a loaded AutoHotkey.dll, other
+backends (see :mod:`ahk.simulated`) can stand in where the dll is unavailable.
+
+Backend methods receive already normalized arguments, all the defaulting and
+flag conversion happens in the wrappers.
+"""
+import ctypes, struct
+
+from builtins import str
+
+class Backend(object):
+    """Interface implemented by all AutoHotkey engine backends."""
+
+    def start(self, filename=None, script="", options="", params=""):
+        """Start a new script thread from an absolute filename or a string.
+
+        :returns: Thread handle for created instance.
+        """
+        raise NotImplementedError
+
+    def ready(self):
+        """Check once if the script thread is ready.
+
+        :returns: True if ready, else False.
+        """
+        raise NotImplementedError
+
+    def add_file(self, filename, duplicates, ignore):
+        """Add lines from the absolute filename without evaluating them.
+
+        :returns: Line address of the first added line.
+        """
+        raise NotImplementedError
+
+    def add_script(self, script):
+        """Add lines from a string and evaluate them.
+
+        :returns: Line address of the first added line.
+        """
+        raise NotImplementedError
+
+    def execute(self, script):
+        """Execute commands without adding lines to the script.
+
+        :returns: True if successful, else False.
+        """
+        raise NotImplementedError
+
+    def jump(self, label, nowait):
+        """GoSub (nowait=0) or GoTo (nowait=1) a label.
+
+        :returns: True if the label exists, else False.
+        """
+        raise NotImplementedError
+
+    def call(self, func, args):
+        """Call a function with a list of string arguments.
+
+        :returns: The function result as a string.
+        """
+        raise NotImplementedError
+
+    def post(self, func, args):
+        """Call a function with a list of string arguments, discard the result.
+
+        :returns: True if the function exists, else False.
+        """
+        raise NotImplementedError
+
+    def set(self, name, value):
+        """Assign the string value to a variable.
+
+        :returns: True for success and False for failure.
+        """
+        raise NotImplementedError
+
+    def get(self, name, pointer=False):
+        """Get the value of a variable.
+
+        :returns: The value as a string, or a c_wchar_p if pointer is True.
+        """
+        raise NotImplementedError
+
+    def terminate(self, timeout):
+        """Terminate the script thread."""
+        raise NotImplementedError
+
+    def reload(self):
+        """Terminate and restart the script thread."""
+        raise NotImplementedError
+
+    def find_func(self, name):
+        """:returns: The address of the named function, or 0."""
+        raise NotImplementedError
+
+    def find_label(self, name):
+        """:returns: The address of the named label, or 0."""
+        raise NotImplementedError
+
+    def pause(self, state):
+        """Pause (1), un-pause (0) or query ("") the script.
+
+        :returns: True if the script is paused, else False.
+        """
+        raise NotImplementedError
+
+    def exec_line(self, line, mode, wait):
+        """Execute from a line address (see :func:`ahk.exec_line`).
+
+        :returns: A line address.
+        """
+        raise NotImplementedError
+
+    def is_window(self, hwnd, active=False):
+        """Check a window handle without calling into the engine.
+
+        :param active: Check the window is the active one instead.
+        :type active: bool (default=False)
+        :returns: True or False, or None if the backend can't tell.
+        """
+        return None
+
+    def create_event(self):
+        """Create an event the engine can set with
+        ``DllCall("SetEvent", "Ptr", handle)``.
+
+        The returned object has a `handle` attribute and `wait(timeout=None)`
+        (True once set), `clear()` and `close()` methods.
+
+        :returns: The event, or None if the backend doesn't support events.
+        """
+        return None
+
+class Win32Event(object):
+    """Manual reset kernel event object."""
+
+    def __init__(self):
+        kernel32 = ctypes.windll.kernel32
+        kernel32.CreateEventW.restype = ctypes.c_void_p
+        kernel32.CreateEventW.argtypes = (ctypes.c_void_p, ctypes.c_int,
+                                          ctypes.c_int, ctypes.c_wchar_p)
+        for name in ('SetEvent', 'ResetEvent', 'CloseHandle'):
+            getattr(kernel32, name).argtypes = (ctypes.c_void_p,)
+        kernel32.WaitForSingleObject.argtypes = (ctypes.c_void_p,
+                                                 ctypes.c_uint32)
+        kernel32.WaitForSingleObject.restype = ctypes.c_uint32
+        self._kernel32 = kernel32
+        self.handle = kernel32.CreateEventW(None, 1, 0, None)
+
+    def wait(self, timeout=None):
+        """:returns: True if the event is set, False if timed out."""
+        ms = 0xFFFFFFFF if timeout is None else max(int(timeout * 1000), 0)
+        return self._kernel32.WaitForSingleObject(self.handle, ms) == 0
+
+    def set(self):
+        self._kernel32.SetEvent(self.handle)
+
+    def clear(self):
+        self._kernel32.ResetEvent(self.handle)
+
+    def close(self):
+        if self.handle:
+            self._kernel32.CloseHandle(self.handle)
+            self.handle = None
+
+# Build specific string type used by the dll exports
+_ANSI = 'mbcs' if hasattr(ctypes, 'WinDLL') else 'latin-1'
+
+class _AnsiString(ctypes.c_char_p):
+    """c_char_p accepting text, encoded with the ANSI code page."""
+
+    @classmethod
+    def from_param(cls, value):
+        if isinstance(value, str):
+            value = value.encode(_ANSI, 'replace')
+        return ctypes.c_char_p.from_param(value)
+
+class _WideString(ctypes.c_wchar_p):
+    """c_wchar_p subclass, returned as-is instead of converted to str."""
+
+# UINT_PTR results (thread handles, line and function addresses) are pointer
+# sized, the default c_int restype truncates them on x64 builds.
+_PTR = ctypes.c_size_t
+
+def prototypes(unicode=True):
+    """Build the binding table for the AutoHotkey.dll exports.
+
+    :param unicode: Whether the dll is a unicode (w) or ANSI (a) build.
+    :type unicode: bool (default=True)
+    :returns: dict of export name -> (restype, argtypes).
+    """
+    text = ctypes.c_wchar_p if unicode else _AnsiString
+    c_int, c_uint = ctypes.c_int, ctypes.c_uint
+    return {
+        'ahkdll': (_PTR, (text, text, text)),
+        'ahktextdll': (_PTR, (text, text, text)),
+        'ahkReady': (c_int, ()),
+        'addFile': (_PTR, (text, c_int, c_int)),
+        'addScript': (_PTR, (text, c_int)),
+        'ahkExec': (c_int, (text,)),
+        'ahkLabel': (c_int, (text, c_int)),
+        'ahkFunction': (ctypes.c_wchar_p if unicode else ctypes.c_char_p,
+                        (text,) * 11),
+        'ahkPostFunction': (c_int, (text,) * 11),
+        'ahkassign': (c_int, (text, text)),
+        'ahkgetvar': (ctypes.c_wchar_p if unicode else ctypes.c_char_p,
+                      (text, c_uint)),
+        'ahkTerminate': (c_int, (c_int,)),
+        'ahkReload': (c_int, ()),
+        'ahkFindFunc': (_PTR, (text,)),
+        'ahkFindLabel': (_PTR, (text,)),
+        'ahkPause': (c_int, (text,)),
+        'ahkExecuteLine': (_PTR, (_PTR, c_int, c_int)),
+    }
+
+def bind(dll, unicode=True):
+    """Apply the export prototypes to a loaded dll.
+
+    Exports missing from older dll versions are skipped.
+
+    :returns: List of the bound export names.
+    """
+    bound = []
+    for name, (restype, argtypes) in prototypes(unicode).items():
+        try:
+            func = getattr(dll, name)
+        except AttributeError:
+            continue
+        func.restype = restype
+        func.argtypes = argtypes
+        bound.append(name)
+    return bound
+
+def _text(value):
+    """Convert a string result (str, bytes or None) to text."""
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        return value.decode(_ANSI, 'replace')
+    return value
+
+# Unicode builds count string lengths and positions in UTF-16 code units
+def _units(text):
+    """Split characters outside the BMP into their UTF-16 surrogate pairs."""
+    data = text.encode('utf-16-le', 'surrogatepass')
+    if len(data) == 2 * len(text):
+        return text
+    return ''.join(chr(unit) for unit in
+                   struct.unpack('<{0}H'.format(len(data) // 2), data))
+
+def _join_units(text):
+    """Inverse of _units, re-combine surrogate pairs."""
+    return text.encode('utf-16-le', 'surrogatepass').decode(
+        'utf-16-le', 'surrogatepass')
+
+class DllBackend(Backend):
+    """Backend forwarding to the exports of a loaded AutoHotkey.dll.
+
+    Prototypes (argtypes/restype) are declared once for every export when the
+    backend is created, so no per-call argument guessing or result casting is
+    required.
+    """
+
+    def __init__(self, dll, unicode=True):
+        """
+        :param dll: The loaded library.
+        :type dll: ctypes.CDLL
+        :param unicode: Whether the dll is a unicode (w) or ANSI (a) build.
+        :type unicode: bool (default=True)
+        """
+        self.dll = dll
+        self.unicode = unicode
+        self.exports = bind(dll, unicode)
+        # Separate function object returning the variable pointer itself
+        self._getvar_ptr = None
+        if 'ahkgetvar' in self.exports:
+            self._getvar_ptr = dll['ahkgetvar']
+            self._getvar_ptr.restype = _WideString if unicode else _AnsiString
+            self._getvar_ptr.argtypes = dll.ahkgetvar.argtypes
+
+    def start(self, filename=None, script="", options="", params=""):
+        if filename:
+            return self.dll.ahkdll(filename, options, params)
+        return self.dll.ahktextdll(script, options, params)
+
+    def ready(self):
+        return self.dll.ahkReady() == 1
+
+    def add_file(self, filename, duplicates, ignore):
+        return self.dll.addFile(filename, duplicates, ignore)
+
+    def add_script(self, script):
+        # 1 = execute the added lines and wait for them to finish
+        return self.dll.addScript(script, 1)
+
+    def execute(self, script):
+        return self.dll.ahkExec(script) == 1
+
+    def jump(self, label, nowait):
+        return self.dll.ahkLabel(label, nowait) == 1
+
+    def call(self, func, args):
+        params = args if len(args) == 10 else list(args) + ['']*(10-len(args))
+        return _text(self.dll.ahkFunction(func, *params))
+
+    def post(self, func, args):
+        params = args if len(args) == 10 else list(args) + ['']*(10-len(args))
+        # 0 if function exists, else -1
+        return self.dll.ahkPostFunction(func, *params) == 0
+
+    def set(self, name, value):
+        # 0 for success, else -1
+        return self.dll.ahkassign(name, value) == 0
+
+    def get(self, name, pointer=False):
+        if pointer:
+            return self._getvar_ptr(name, 0)
+        return _text(self.dll.ahkgetvar(name, 0))
+
+    def terminate(self, timeout):
+        self.dll.ahkTerminate(timeout)
+
+    def reload(self):
+        self.dll.ahkReload()
+
+    def find_func(self, name):
+        return self.dll.ahkFindFunc(name)
+
+    def find_label(self, name):
+        return self.dll.ahkFindLabel(name)
+
+    def pause(self, state):
+        # ahkPause takes "On", "Off" or "" (query only)
+        if state != "":
+            state = "On" if state else "Off"
+        return self.dll.ahkPause(state) == 1
+
+    def exec_line(self, line, mode, wait):
+        return self.dll.ahkExecuteLine(line or 0, mode, wait)
+
+    def is_window(self, hwnd, active=False):
+        windll = getattr(ctypes, 'windll', None)
+        if windll is None:
+            return None
+        user32 = windll.user32
+        if active:
+            user32.GetForegroundWindow.restype = ctypes.c_void_p
+            return user32.GetForegroundWindow() == hwnd
+        user32.IsWindow.argtypes = (ctypes.c_void_p,)
+        return bool(user32.IsWindow(hwnd))
+
+    def create_event(self):
+        if getattr(ctypes, 'windll', None) is None:
+            return None
+        return Win32Event()
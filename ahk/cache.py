@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Bounded caches for values read from the engine.
+
+A :class:`Cache` maps keys to values, dropping the least recently used
+entry once it holds `size` entries and, optionally, entries older than
+`ttl` seconds::
+
+    cache = Cache(256, ttl=5)
+    cache.put(("a", "b"), 42)
+    cache.get(("a", "b")) # -> 42
+
+It's used to memoize pure :class:`ahk.Function` calls (see the `cache`
+option of :meth:`ahk.Script.function`).
+"""
+import collections, threading
+
+from ahk import ahk as _ahk
+
+class Cache(object):
+    """A thread-safe least recently used mapping with optional expiry."""
+
+    def __init__(self, size=128, ttl=None, clock=None):
+        """
+        :param size: Most entries kept, None for no bound.
+        :type size: int or None (default=128)
+        :param ttl: Seconds entries stay valid, None for no expiry.
+        :type ttl: float or None (default=None)
+        :param clock: Function returning the current time in seconds
+            (default monotonic clock).
+        :type clock: callable or None
+        """
+        self.size = size
+        self.ttl = ttl
+        self._clock = clock or _ahk._clock
+        self._entries = collections.OrderedDict() # key -> (value, expires)
+        self._lock = threading.Lock()
+        self._stats = dict(hits=0, misses=0, evictions=0, expirations=0)
+
+    def get(self, key, default=None):
+        """:returns: The value cached for key, or default if missing."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and (entry[1] is None or
+                                      entry[1] > self._clock()):
+                self._entries[key] = entry # Now the most recently used
+                self._stats['hits'] += 1
+                return entry[0]
+            if entry is not None:
+                self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+            return default
+
+    def put(self, key, value):
+        """Cache value for key, evicting the least recently used entry."""
+        expires = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+            if self.size is not None:
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+
+    def invalidate(self, key):
+        """Drop the entry for key.
+
+        :returns: True if an entry was dropped, else False.
+        """
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Snapshot of the cache statistics.
+
+        * ``hits``/``misses`` - Lookups answered from the cache or not.
+        * ``evictions`` - Entries dropped for the size bound.
+        * ``expirations`` - Entries found expired.
+        * ``entries`` - Entries currently cached.
+
+        :returns: dict of statistic name -> value.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[1] is None or
+                                          entry[1] > self._clock())
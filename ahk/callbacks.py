@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Call Python from AHK code.
+
+A :class:`CallbackRegistry` exposes Python callables as AHK functions, so
+hotkeys, timers or any script code can notify Python instead of Python
+polling variables::
+
+    registry = CallbackRegistry()
+    registry.register(on_hotkey, name="OnHotkey")
+    ahk.add_lines("F1::OnHotkey(A_ThisHotkey)")
+
+The generated AHK functions ``DllCall`` a ctypes trampoline, whose address
+is stored in a global of the engine, one per registry. The trampoline only
+queues the call: handlers run on worker threads, so a slow handler can't
+stall the engine. The queue is bounded, and calls arriving while it is full
+are dropped (the AHK function returns 0 then, else 1). Queue depth, drops
+and the delay between the engine call and the handler starting are reported
+by :meth:`CallbackRegistry.metrics`.
+"""
+import ctypes, inspect, itertools, threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from ahk import ahk as _ahk
+
+# Signature of the trampoline: callback id and length prefixed arguments
+_TRAMPOLINE = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_wchar_p)
+
+# Prefix of the global holding the trampoline address of each registry
+_ADDRESS_VAR = "_pyahk_callback"
+
+_WRAPPER = """
+{name}({params}) {{
+    global {var}
+    return DllCall({var}, "Int", {id}, "WStr", {payload}, "Cdecl Int")
+}}
+"""
+
+def _parse(payload, count):
+    """:returns: List of count arguments from the length prefixed payload."""
+    # Lengths count UTF-16 units, slice in those if the text has astral chars
+    data = _ahk._units(payload)
+    args, pos = [], 0
+    for i in range(count):
+        sep = data.index(":", pos)
+        end = sep + 1 + int(data[pos:sep])
+        args.append(_ahk._join_units(data[sep + 1:end]))
+        pos = end
+    return args
+
+def _arity(func):
+    """:returns: Number of positional parameters of func, 10 if variadic."""
+    try:
+        params = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return _ahk._MAX_ARGS
+    count = 0
+    for param in params:
+        if param.kind == param.VAR_POSITIONAL:
+            return _ahk._MAX_ARGS
+        if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            count += 1
+    return count
+
+class _Callback(object):
+    """A registered callable."""
+    __slots__ = ('id', 'name', 'func', 'params', 'calls')
+
+    def __init__(self, id, name, func, params):
+        self.id = id
+        self.name = name
+        self.func = func
+        self.params = params
+        self.calls = 0
+
+class CallbackRegistry(object):
+    """Python callables callable from AHK code of an engine."""
+    _ids = itertools.count(1)
+    _registries = itertools.count(1)
+
+    def __init__(self, size=256, workers=1, engine=None):
+        """
+        :param size: Most calls queued before new ones are dropped.
+        :type size: int (default=256)
+        :param workers: Number of threads running the handlers.
+        :type workers: int (default=1)
+        :param engine: The engine whose scripts call back (default current).
+        :type engine: ahk.Engine or None
+        """
+        self._engine = engine or _ahk.current_engine()
+        self._queue = queue.Queue(size)
+        self._lock = threading.Lock()
+        self._callbacks = {} # id -> _Callback
+        self._names = {} # AHK function name -> _Callback
+        self._trampoline = _TRAMPOLINE(self._enqueue)
+        self.address = ctypes.cast(self._trampoline, ctypes.c_void_p).value
+        # Registries sharing an engine keep their trampolines apart
+        self._var = "{0}{1}".format(_ADDRESS_VAR, next(self._registries))
+        self._stats = dict(calls=0, dropped=0, delivered=0, errors=0,
+                           max_depth=0, latency_total=0.0, latency_max=0.0)
+        self.last_error = None
+        self._closed = False
+        # Stop markers shutdown() couldn't queue, the workers queue them
+        self._stops = 0
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work,
+                                      name="ahk-callbacks-{0}".format(i))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def register(self, func, name=None):
+        """Expose func to the engine's scripts as an AHK function.
+
+        The AHK function takes as many parameters as func has positional
+        ones (all optional), func receives them as strings. Its return value
+        is discarded, the AHK function returns 1 if the call was queued or
+        0 if it was dropped.
+
+        :param func: The callable.
+        :type func: callable
+        :param name: The AHK function name (default func.__name__).
+        :type name: str or None
+        :returns: The AHK function name.
+        """
+        name = name or func.__name__
+        params = min(_arity(func), _ahk._MAX_ARGS)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Registry has been shut down!")
+            old = self._names.get(name)
+            callback = _Callback(old.id if old else next(self._ids), name,
+                                 func, params)
+            self._callbacks[callback.id] = callback
+            self._names[name] = callback
+        if old is None or old.params != params:
+            self._install([callback])
+        return name
+
+    def install(self):
+        """Install the AHK functions again, e.g. after the engine was
+        reloaded."""
+        with self._lock:
+            callbacks = list(self._names.values())
+        self._install(callbacks)
+
+    def _install(self, callbacks):
+        names = ["_pyahk_p{0}".format(i + 1) for i in range(_ahk._MAX_ARGS)]
+        source = []
+        for callback in callbacks:
+            params = names[:callback.params]
+            payload = " ".join('StrLen({0}) ":" {0}'.format(param)
+                               for param in params) or '""'
+            source.append(_WRAPPER.format(
+                name=callback.name, var=self._var, id=callback.id,
+                params=", ".join('{0}=""'.format(param) for param in params),
+                payload=payload))
+        with self._engine:
+            _ahk._flush()
+            _ahk.add_lines("".join(source))
+            _ahk.set(self._var, str(self.address))
+
+    def _enqueue(self, id, payload):
+        """Trampoline target, runs on the engine thread."""
+        now = _ahk._clock()
+        with self._lock:
+            self._stats['calls'] += 1
+            callback = self._callbacks.get(id)
+        if callback is None:
+            return 0
+        try:
+            self._queue.put_nowait((callback, payload, now))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return 0
+        with self._lock:
+            self._stats['max_depth'] = max(self._stats['max_depth'],
+                                           self._queue.qsize())
+        return 1
+
+    def _work(self):
+        """Worker thread main loop."""
+        while True:
+            item = self._queue.get()
+            self._pass_stop()
+            if item is None:
+                return
+            callback, payload, queued = item
+            latency = _ahk._clock() - queued
+            with self._lock:
+                self._stats['latency_total'] += latency
+                self._stats['latency_max'] = max(self._stats['latency_max'],
+                                                 latency)
+                callback.calls += 1
+            try:
+                callback.func(*_parse(payload or "", callback.params))
+            except Exception as exc:
+                with self._lock:
+                    self._stats['errors'] += 1
+                    self.last_error = exc
+            with self._lock:
+                self._stats['delivered'] += 1
+
+    def _pass_stop(self):
+        """Queue a stop marker owed by shutdown() in the slot just freed."""
+        with self._lock:
+            if not self._stops:
+                return
+            self._stops -= 1
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            with self._lock:
+                self._stops += 1
+
+    def metrics(self):
+        """Snapshot of the callback statistics.
+
+        * ``calls`` - Calls made by the engine.
+        * ``dropped`` - Calls dropped because the queue was full.
+        * ``delivered`` - Calls handled (``errors`` of them raised, see
+          :attr:`last_error`).
+        * ``depth``/``max_depth`` - Calls currently/at most queued.
+        * ``latency_mean``/``latency_max`` - Seconds from the engine call to
+          the handler starting.
+        * ``handlers`` - dict of AHK function name -> calls handled.
+
+        :returns: dict of metric name -> value.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['handlers'] = dict((callback.name, callback.calls)
+                                     for callback in self._names.values())
+        stats['depth'] = self._queue.qsize()
+        latency_total = stats.pop('latency_total')
+        stats['latency_mean'] = (latency_total / stats['delivered']
+                                 if stats['delivered'] else 0.0)
+        return stats
+
+    def shutdown(self, wait=True):
+        """Stop the workers after the queued calls.
+
+        Calls made by the engine afterwards are dropped. Keep the registry
+        referenced while the engine may still call back: the trampoline is
+        freed with it.
+
+        :param wait: Whether to wait for the queued calls to be handled.
+        :type wait: bool (default=True)
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._callbacks = {}
+        # Don't block on a full queue (or deadlock when called from a
+        # handler), markers not fitting are queued by the workers
+        for thread in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                with self._lock:
+                    self._stops += 1
+        if wait:
+            for thread in self._threads:
+                if thread is not threading.current_thread():
+                    thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Capture screen regions as RGB buffers.
+
+:meth:`ahk.Script.getPixel` costs three engine calls per pixel, a
+:func:`capture` grabs a whole rectangle at once into a :class:`Frame`::
+
+    frame = script.capture(0, 0, 100, 100)
+    frame.pixel(10, 20)   # -> (r, g, b)
+    frame.view[20, 10, 0] # red, from a memoryview shaped (height, width, 3)
+    frame.array()         # NumPy array, if NumPy is installed
+
+Where the pixels come from is up to a swappable :class:`Capturer`, see
+:func:`set_capturer`. By default the screen is copied with GDI on Windows,
+the simulated desktop is read when the engine is a
+:class:`ahk.simulated.SimulatedBackend` and other engines are asked to run
+a PixelGetColor loop (still a single engine call).
+"""
+import ctypes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ahk import ahk as _ahk
+from ahk import color as _color
+
+class Frame(object):
+    """A captured rectangle of RGB pixels, stored row by row."""
+
+    def __init__(self, data, x, y, width, height):
+        """
+        :param data: width * height RGB triplets.
+        :type data: bytearray
+        :param x: Screen x coordinate of the left column.
+        :type x: int
+        :param y: Screen y coordinate of the top row.
+        :type y: int
+        """
+        if len(data) != width * height * 3:
+            raise ValueError("Expected {0} bytes of pixel data, got {1}!".format(
+                width * height * 3, len(data)))
+        self.data = data
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def view(self):
+        """memoryview of the pixel data shaped (height, width, 3)."""
+        return memoryview(self.data).cast('B', (self.height, self.width, 3))
+
+    def array(self):
+        """:returns: numpy.ndarray of uint8 shaped (height, width, 3), sharing
+            the frame's memory.
+        :raises: ImportError if NumPy isn't installed.
+        """
+        if numpy is None:
+            raise ImportError("Frame.array() requires NumPy!")
+        return numpy.frombuffer(self.data, dtype=numpy.uint8).reshape(
+            self.height, self.width, 3)
+
+    def pixel(self, x, y):
+        """:returns: The (r, g, b) color at screen coordinates x, y."""
+        col, row = x - self.x, y - self.y
+        if not (0 <= col < self.width and 0 <= row < self.height):
+            raise IndexError("Pixel {0}, {1} not in the frame!".format(x, y))
+        offset = (row * self.width + col) * 3
+        return tuple(self.data[offset:offset + 3])
+
+    def find(self, colors, threshold=0.01):
+        """:returns: Screen coordinates (x, y) of the first pixel matching
+            colors, or None. See :func:`ahk.color.find`."""
+        return _color.find(self, colors, threshold)
+
+    def matches(self, colors, threshold=0.01):
+        """:returns: List of screen coordinates (x, y) of the pixels matching
+            colors. See :func:`ahk.color.matches`."""
+        return _color.matches(self, colors, threshold)
+
+    def __repr__(self):
+        return "<Frame {0}x{1} at {2}, {3}>".format(
+            self.width, self.height, self.x, self.y)
+
+class Capturer(object):
+    """Interface of the pixel sources used by :func:`capture`."""
+
+    def grab(self, x, y, width, height):
+        """Copy a rectangle of the screen (screen coordinates).
+
+        :returns: bytearray of width * height RGB triplets, row by row.
+        """
+        raise NotImplementedError
+
+    def pixels(self, points):
+        """Read the colors of several pixels at once (screen coordinates).
+
+        The default grabs the bounding box of the points if it is small,
+        else each pixel separately.
+
+        :param points: List of (x, y) coordinates.
+        :returns: List of (r, g, b) colors in the order of points.
+        """
+        if not points:
+            return []
+        xs, ys = [p[0] for p in points], [p[1] for p in points]
+        left, top = min(xs), min(ys)
+        width, height = max(xs) - left + 1, max(ys) - top + 1
+        if width * height <= self.BOX_LIMIT:
+            frame = Frame(self.grab(left, top, width, height),
+                          left, top, width, height)
+            return [frame.pixel(x, y) for x, y in points]
+        return [tuple(self.grab(x, y, 1, 1)) for x, y in points]
+
+    # Most pixels grabbed to read scattered points at once
+    BOX_LIMIT = 256 * 256
+
+class SyntheticCapturer(Capturer):
+    """Reads a simulated :class:`ahk.simulated.Desktop`, for tests."""
+
+    def __init__(self, desktop=None):
+        """
+        :param desktop: The desktop to read (default a new blank one).
+        :type desktop: ahk.simulated.Desktop or None
+        """
+        if desktop is None:
+            from ahk.simulated import Desktop
+            desktop = Desktop()
+        self.desktop = desktop
+
+    def grab(self, x, y, width, height):
+        return self.desktop.region(x, y, width, height)
+
+# Engine side helper reading a rectangle with PixelGetColor
+_CAPTURE_FUNCS = """
+_pyahk_capture(_pyahk_x, _pyahk_y, _pyahk_w, _pyahk_h) {
+    local out := "#", color, row
+    CoordMode, Pixel, Screen
+    Loop, %_pyahk_h%
+    {
+        row := _pyahk_y + A_Index - 1
+        Loop, %_pyahk_w%
+        {
+            PixelGetColor, color, % _pyahk_x + A_Index - 1, %row%, RGB
+            out .= SubStr(color, 3)
+        }
+    }
+    return out
+}
+"""
+
+# Engine side helper reading the pixels of a "x|y|x|y..." list
+_PIXELS_FUNCS = """
+_pyahk_pixels(_pyahk_points) {
+    local out := "#", color, x
+    CoordMode, Pixel, Screen
+    Loop, Parse, _pyahk_points, |
+    {
+        if Mod(A_Index, 2)
+        {
+            x := A_LoopField
+            continue
+        }
+        PixelGetColor, color, %x%, %A_LoopField%, RGB
+        out .= SubStr(color, 3)
+    }
+    return out
+}
+"""
+
+class EngineCapturer(Capturer):
+    """Runs a PixelGetColor loop in the engine, one engine call per grab.
+
+    Slow in the engine, but works with any backend.
+    """
+
+    def __init__(self, engine=None):
+        """
+        :param engine: The engine to use (default current at grab time).
+        :type engine: ahk.Engine or None
+        """
+        self.engine = engine
+
+    def grab(self, x, y, width, height):
+        with self.engine or _ahk.current_engine():
+            _ahk._flush()
+            data = _ahk._call_many("_pyahk_capture", [
+                str(x), str(y), str(width), str(height)], _CAPTURE_FUNCS)
+        return bytearray.fromhex(data[1:])
+
+    def pixels(self, points):
+        if not points:
+            return []
+        with self.engine or _ahk.current_engine():
+            _ahk._flush()
+            data = _ahk._call_many("_pyahk_pixels", ["|".join(
+                "{0}|{1}".format(x, y) for x, y in points)], _PIXELS_FUNCS)
+        data = bytearray.fromhex(data[1:])
+        return [tuple(data[i:i + 3]) for i in range(0, len(data), 3)]
+
+class _BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [('biSize', ctypes.c_uint32), ('biWidth', ctypes.c_int32),
+                ('biHeight', ctypes.c_int32), ('biPlanes', ctypes.c_uint16),
+                ('biBitCount', ctypes.c_uint16),
+                ('biCompression', ctypes.c_uint32),
+                ('biSizeImage', ctypes.c_uint32),
+                ('biXPelsPerMeter', ctypes.c_int32),
+                ('biYPelsPerMeter', ctypes.c_int32),
+                ('biClrUsed', ctypes.c_uint32),
+                ('biClrImportant', ctypes.c_uint32)]
+
+class GdiCapturer(Capturer):
+    """Copies the screen with GDI BitBlt, without calling into the engine.
+
+    Windows only.
+    """
+    SRCCOPY = 0x00CC0020
+
+    def __init__(self):
+        user32, gdi32 = ctypes.windll.user32, ctypes.windll.gdi32
+        handle = ctypes.c_void_p
+        user32.GetDC.restype = handle
+        user32.GetDC.argtypes = (handle,)
+        user32.ReleaseDC.argtypes = (handle, handle)
+        gdi32.CreateCompatibleDC.restype = handle
+        gdi32.CreateCompatibleDC.argtypes = (handle,)
+        gdi32.CreateCompatibleBitmap.restype = handle
+        gdi32.CreateCompatibleBitmap.argtypes = (handle, ctypes.c_int,
+                                                 ctypes.c_int)
+        gdi32.SelectObject.restype = handle
+        gdi32.SelectObject.argtypes = (handle, handle)
+        gdi32.BitBlt.argtypes = (handle, ctypes.c_int, ctypes.c_int,
+                                 ctypes.c_int, ctypes.c_int, handle,
+                                 ctypes.c_int, ctypes.c_int, ctypes.c_uint32)
+        gdi32.GetDIBits.argtypes = (handle, handle, ctypes.c_uint,
+                                    ctypes.c_uint, ctypes.c_void_p,
+                                    ctypes.c_void_p, ctypes.c_uint)
+        gdi32.DeleteObject.argtypes = (handle,)
+        gdi32.DeleteDC.argtypes = (handle,)
+        self.user32, self.gdi32 = user32, gdi32
+
+    def grab(self, x, y, width, height):
+        user32, gdi32 = self.user32, self.gdi32
+        screen = user32.GetDC(None)
+        memory = gdi32.CreateCompatibleDC(screen)
+        bitmap = gdi32.CreateCompatibleBitmap(screen, width, height)
+        previous = gdi32.SelectObject(memory, bitmap)
+        try:
+            gdi32.BitBlt(memory, 0, 0, width, height, screen, x, y,
+                         self.SRCCOPY)
+            # Top-down 32 bit BGRX rows
+            header = _BITMAPINFOHEADER(ctypes.sizeof(_BITMAPINFOHEADER),
+                                       width, -height, 1, 32, 0)
+            buf = ctypes.create_string_buffer(width * height * 4)
+            gdi32.GetDIBits(memory, bitmap, 0, height, buf,
+                            ctypes.byref(header), 0)
+        finally:
+            gdi32.SelectObject(memory, previous)
+            gdi32.DeleteObject(bitmap)
+            gdi32.DeleteDC(memory)
+            user32.ReleaseDC(None, screen)
+        bgrx = buf.raw
+        rgb = bytearray(width * height * 3)
+        rgb[0::3], rgb[1::3], rgb[2::3] = bgrx[2::4], bgrx[1::4], bgrx[0::4]
+        return rgb
+
+# Capturer selected with set_capturer, None picks one per engine
+_capturer = None
+_gdi = None # Shared GdiCapturer
+
+def set_capturer(capturer):
+    """Select the pixel source used by :func:`capture`.
+
+    :param capturer: The new capturer, None to pick one by platform/engine.
+    :type capturer: Capturer or None
+    :returns: The previous capturer.
+    """
+    global _capturer
+    previous, _capturer = _capturer, capturer
+    return previous
+
+def get_capturer():
+    """:returns: The Capturer used by :func:`capture` on the current engine."""
+    if _capturer is not None:
+        return _capturer
+    desktop = getattr(_ahk.current_engine().backend, 'desktop', None)
+    if desktop is not None:
+        return SyntheticCapturer(desktop)
+    if hasattr(ctypes, 'windll'):
+        global _gdi
+        if _gdi is None:
+            _gdi = GdiCapturer()
+        return _gdi
+    return EngineCapturer()
+
+def capture(x, y, width, height, capturer=None):
+    """Capture a rectangle of the screen (screen coordinates).
+
+    :param capturer: Pixel source (default :func:`get_capturer`).
+    :type capturer: Capturer or None
+    :returns: A :class:`Frame`.
+    """
+    if width <= 0 or height <= 0:
+        raise ValueError("Capture size must be positive!")
+    data = (capturer or get_capturer()).grab(x, y, width, height)
+    return Frame(data, x, y, width, height)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Search captured frames for colors.
+
+Colors match when their error, as computed by
+:meth:`ahk.Script.waitPixel` (sum of the channel differences over
+``255 * 3``), is within a threshold. Instead of comparing pixel by pixel in
+Python, whole :class:`ahk.capture.Frame` buffers are compared at once::
+
+    frame = script.capture(0, 0, 200, 100)
+    find(frame, (255, 0, 0))                 # first red pixel, or None
+    matches(frame, [(255, 0, 0), (0, 255, 0)], threshold=0.05)
+
+NumPy is used when installed. Without it the frame is compared with
+``bytes.translate`` tables and arithmetic on big ints holding a 16 bit lane
+per pixel, which still runs in C.
+"""
+import array, numbers, sys
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Slices of these make the channel difference tables
+_ASCENDING = bytes(bytearray(range(256)))
+_DESCENDING = _ASCENDING[::-1]
+
+def delta(c1, c2):
+    """:returns: The error between two (r, g, b) colors, 0.0 to 1.0."""
+    return sum(abs(a - b) for a, b in zip(c1, c2)) / float(255 * 3)
+
+def _limit(threshold):
+    """:returns: Largest summed channel difference within threshold."""
+    limit = min(int(threshold * 255 * 3) + 1, 255 * 3)
+    while limit >= 0 and limit / float(255 * 3) > threshold:
+        limit -= 1
+    return limit
+
+def _targets(colors):
+    """:returns: List of (r, g, b) targets from a color or list of colors."""
+    if len(colors) == 3 and all(isinstance(c, numbers.Integral) for c in colors):
+        return [tuple(colors)]
+    return [tuple(color) for color in colors]
+
+def _misses_numpy(frame, targets, limit):
+    pixels = frame.array().reshape(-1, 3).astype(numpy.int16)
+    hit = numpy.zeros(len(pixels), dtype=bool)
+    for color in targets:
+        hit |= numpy.abs(pixels - numpy.array(color, dtype=numpy.int16)
+                         ).sum(axis=1) <= limit
+    return (~hit).astype(numpy.uint8).tobytes()
+
+def _channels(frame):
+    """:returns: bytes of the red, green and blue values of a frame."""
+    return [bytes(frame.data[i::3]) for i in range(3)]
+
+def _lane_sum(channels, color, total=0):
+    """:returns: total plus an int holding a big endian 16 bit lane per pixel
+        with its summed channel differences from color."""
+    lane = bytearray(2 * len(channels[0]))
+    for channel, value in zip(channels, color):
+        table = _DESCENDING[255 - value:255] + _ASCENDING[:256 - value]
+        lane[1::2] = channel.translate(table)
+        total += int.from_bytes(lane, 'big')
+    return total
+
+def _misses_lanes(frame, targets, limit):
+    count = frame.width * frame.height
+    channels = _channels(frame)
+    # Adding this sets bit 15 of lanes above the limit, the sum of three
+    # differences (at most 765) never carries into the next lane.
+    offset = int.from_bytes(
+        (0x8000 - limit - 1).to_bytes(2, 'big') * count, 'big')
+    missed = int.from_bytes(b"\x80\x00" * count, 'big')
+    for color in targets:
+        missed &= _lane_sum(channels, color, offset)
+    return missed.to_bytes(2 * count, 'big')[0::2]
+
+def _misses(frame, colors, threshold):
+    """:returns: bytes with a zero for every pixel matching a color."""
+    targets = _targets(colors)
+    limit = _limit(threshold)
+    if limit < 0 or not targets:
+        return b"\x01" * (frame.width * frame.height)
+    if numpy is not None:
+        return _misses_numpy(frame, targets, limit)
+    return _misses_lanes(frame, targets, limit)
+
+def distances(frame, color):
+    """Compute the error of every pixel of a frame against a color.
+
+    The values are summed channel differences, divide them by ``255 * 3``
+    for the error factor used by the thresholds.
+
+    :param frame: The pixels to compare.
+    :type frame: ahk.capture.Frame
+    :param color: The color to compare with.
+    :type color: tuple(int r, int g, int b)
+    :returns: array.array('H') of values 0 to 765, row by row.
+    """
+    count = frame.width * frame.height
+    if numpy is not None:
+        pixels = frame.array().reshape(-1, 3).astype(numpy.int16)
+        values = numpy.abs(pixels - numpy.array(color, dtype=numpy.int16)
+                           ).sum(axis=1).astype(numpy.uint16)
+        return array.array('H', values.tobytes())
+    values = array.array('H', _lane_sum(_channels(frame), color).to_bytes(
+        2 * count, 'big'))
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values
+
+def mask(frame, colors, threshold=0.01):
+    """Compare every pixel of a frame against colors.
+
+    :param frame: The pixels to search.
+    :type frame: ahk.capture.Frame
+    :param colors: The color, or list of colors, to look for.
+    :type colors: tuple(int r, int g, int b) or list of tuples
+    :param threshold: Error factor allowed for determining color match.
+    :type threshold: float (default=0.01)
+    :returns: bytearray with 1 for matching pixels, else 0, row by row.
+    """
+    return bytearray(_misses(frame, colors, threshold).translate(
+        bytes(bytearray([1] + [0] * 255))))
+
+def find(frame, colors, threshold=0.01):
+    """Find the first pixel matching colors, in rows from the top left.
+
+    :param frame: The pixels to search.
+    :type frame: ahk.capture.Frame
+    :param colors: The color, or list of colors, to look for.
+    :type colors: tuple(int r, int g, int b) or list of tuples
+    :param threshold: Error factor allowed for determining color match.
+    :type threshold: float (default=0.01)
+    :returns: Screen coordinates (x, y) of the pixel, or None.
+    """
+    index = _misses(frame, colors, threshold).find(b"\x00")
+    if index < 0:
+        return None
+    return (frame.x + index % frame.width, frame.y + index // frame.width)
+
+def matches(frame, colors, threshold=0.01):
+    """Find all pixels matching colors.
+
+    :param frame: The pixels to search.
+    :type frame: ahk.capture.Frame
+    :param colors: The color, or list of colors, to look for.
+    :type colors: tuple(int r, int g, int b) or list of tuples
+    :param threshold: Error factor allowed for determining color match.
+    :type threshold: float (default=0.01)
+    :returns: List of screen coordinates (x, y), in rows from the top left.
+    """
+    misses = _misses(frame, colors, threshold)
+    found, index = [], misses.find(b"\x00")
+    while index >= 0:
+        found.append((frame.x + index % frame.width,
+                      frame.y + index // frame.width))
+        index = misses.find(b"\x00", index + 1)
+    return found
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Precompiled, escape-safe ahk command templates.
+
+Formatting values straight into a command corrupts it when they contain
+commas, percent signs, semicolons or line breaks. A :class:`Command` parses
+its template once and escapes every value by the rules of its field::
+
+    set_text = command("ControlSetText, {control}, {value}, {title}")
+    execute(set_text.format("Edit1", "50%, off", "Untitled"))
+    # ControlSetText, Edit1, 50`%`, off, Untitled
+
+Fields are written like those of :meth:`str.format`, by name or position,
+with an optional kind:
+
+* ``{name}`` - Text argument of a command. Backticks, commas, percent
+  signs, semicolons and line breaks are escaped. Values with leading or
+  trailing blanks, which commands trim, are passed as forced expressions.
+* ``{name:expr}`` - A string literal in an expression, see
+  :func:`ahk.ahk._quote`.
+* ``{name:name}`` - A variable, function or command name, inserted as is.
+
+Compiled templates are cached by :func:`command`.
+"""
+import keyword, re, string
+
+from builtins import str
+
+from ahk.ahk import _quote
+
+# Characters escaped in command arguments, and blanks commands would trim
+_ESCAPE_RE = re.compile(r'[`%,;\r\n]')
+_BLANKS = ' \t'
+_ESCAPES = {'`': '``', '%': '`%', ',': '`,', ';': '`;',
+            '\r': '`r', '\n': '`n'}
+
+def text(value):
+    """:returns: value escaped to be used as is as a command argument."""
+    if value.__class__ is not str:
+        if isinstance(value, int): # Booleans as 1/0
+            return str(int(value))
+        value = str(value)
+    if not value:
+        return value
+    if value[0] in _BLANKS or value[-1] in _BLANKS:
+        return "% " + _quote(value)
+    if _ESCAPE_RE.search(value) is None:
+        return value
+    return _ESCAPE_RE.sub(_escape, value)
+
+def _escape(match):
+    return _ESCAPES[match.group()]
+
+def _name(value):
+    """:returns: value as a variable, function or command name."""
+    return value if value.__class__ is str else str(value)
+
+# Escape function of each field kind
+_KINDS = {'': text, 'expr': _quote, 'name': _name}
+
+def _safe(joined):
+    """:returns: True if none of the NUL separated values in joined would be
+        escaped as command arguments (see :func:`text`)."""
+    # Substring tests beat a regular expression on short commands
+    return ('`' not in joined and '%' not in joined and ',' not in joined and
+            ';' not in joined and '\n' not in joined and '\r' not in joined and
+            ' \0' not in joined and '\0 ' not in joined and
+            '\t\0' not in joined and '\0\t' not in joined)
+
+class Command(object):
+    """A command template parsed into a list of parts.
+
+    Each part is a literal, followed by the index of a value and the escape
+    function of its field. Commands whose text values need no escapes are
+    formatted at once from a %-format of the template.
+
+    Commands formatted from text values only are memoized, wrappers tend to
+    repeat the same commands (e.g. for the same window and control).
+    """
+    # Most commands memoized per template
+    CACHE_SIZE = 256
+
+    def __init__(self, template):
+        """
+        :param template: The command with {fields}, see :mod:`ahk.command`.
+        :type template: str
+        :raises: ValueError for malformed templates or unknown field kinds.
+        """
+        self.template = template
+        self._cache = {}
+        parsed, params = [], []
+        auto = 0
+        for literal, field, kind, conversion in string.Formatter().parse(
+                template):
+            if field is None:
+                parsed.append((literal, None, None))
+                continue
+            if conversion or kind not in _KINDS:
+                raise ValueError(
+                    "Unknown field {{{0}}} in command: {1}".format(
+                        field + ("!" + conversion if conversion else "") +
+                        (":" + kind if kind else ""), template))
+            if field == "":
+                field, auto = str(auto), auto + 1
+            if not (field.isdigit() or re.match(r'^[A-Za-z]\w*$', field)
+                    and not keyword.iskeyword(field)):
+                raise ValueError("Bad field name {{{0}}} in command: {1}"
+                                 .format(field, template))
+            if field not in params:
+                params.append(field)
+            parsed.append((literal, field, kind))
+        positional = sorted(int(p) for p in params if p.isdigit())
+        if positional != list(range(len(positional))):
+            raise ValueError("Positional fields must count from 0: " + template)
+        # Positional fields come first, named ones in order of appearance
+        self.fields = tuple(["_" + str(p) for p in positional] +
+                            [p for p in params if not p.isdigit()])
+        self._count = len(self.fields)
+        index = dict((field.lstrip("_"), i)
+                     for i, field in enumerate(self.fields))
+        self._parts = [(literal, None if field is None else index[field],
+                        None if field is None else _KINDS[kind])
+                       for literal, field, kind in parsed]
+        # Without characters to escape, text values are inserted as is by a
+        # %-format of the template
+        self._values = [(i, None if escape is text else escape)
+                        for literal, i, escape in self._parts
+                        if escape is not None]
+        self._percent = "".join(literal.replace('%', '%%') +
+                                ("" if escape is None else "%s")
+                                for literal, i, escape in self._parts)
+        # Every field a text field used once, in order: values format as is
+        self._direct = self._values == [(i, None)
+                                        for i in range(len(self.fields))]
+
+    def format(self, *args, **kwargs):
+        """:returns: The command with escaped values."""
+        if kwargs or len(args) != self._count:
+            args = tuple(self._bind(args, kwargs))
+        cache = self._cache
+        try:
+            result = cache.get(args)
+        except TypeError: # Unhashable values
+            return self._compose(args)
+        if result is None:
+            try:
+                joined = "\0%s\0" % "\0".join(args)
+            except TypeError:
+                # Not all strings. These aren't memoized, equal values of
+                # other types (e.g. 1, 1.0 and True) can't share a command.
+                return self._compose(args)
+            if self._direct and _safe(joined):
+                result = self._percent % args
+            else:
+                result = self._compose(args, joined)
+            if len(cache) >= self.CACHE_SIZE:
+                cache.clear()
+            cache[args] = result
+        return result
+
+    def _compose(self, args, joined=None):
+        """Build the command from the parts.
+
+        :param joined: The values if all strings, between NUL separators.
+        :returns: The command with escaped values.
+        """
+        if joined is not None and _safe(joined):
+            # Text values are used as is
+            return self._percent % tuple([args[i] if escape is None else
+                                          escape(args[i])
+                                          for i, escape in self._values])
+        parts = []
+        for literal, i, escape in self._parts:
+            parts.append(literal)
+            if escape is not None:
+                parts.append(escape(args[i]))
+        return "".join(parts)
+
+    def _bind(self, args, kwargs):
+        """:returns: List of the field values from the format arguments.
+
+        :raises: TypeError for missing or unexpected arguments.
+        """
+        if len(args) > self._count:
+            raise TypeError("{0!r} takes {1} values ({2} given)".format(
+                self, self._count, len(args)))
+        values = list(args)
+        for field in self.fields[len(args):]:
+            if field not in kwargs:
+                raise TypeError("{0!r} missing value {1}".format(self, field))
+            values.append(kwargs.pop(field))
+        if kwargs:
+            raise TypeError("{0!r} got unexpected values {1}".format(
+                self, ", ".join(sorted(kwargs))))
+        return values
+
+    def __repr__(self):
+        return "<Command {0!r}>".format(self.template)
+
+# template -> Command
+_commands = {}
+
+def command(template):
+    """:returns: The :class:`Command` compiled from template, cached."""
+    compiled = _commands.get(template)
+    if compiled is None:
+        compiled = _commands[template] = Command(template)
+    return compiled
@@ -6,9 +6,25 @@ from __future__ import absolute_import, print_function, division, unicode_litera
 This module gives a simplified wrapper around the loose collection of AHK
 functions related to manipulation of window controls.
 """
-import time
 from functools import partial, wraps
 from ahk import *
+from ahk.ahk import _engine_bound, _scratch_name
+from ahk.command import command
+
+# Commands of the wrapper methods
+_SAVE_DELAY = command("{var:name} := {delay:name}")
+_SET_DELAY = command("{cmd:name}, {delay}")
+_RESTORE_DELAY = command("{cmd:name}, % {var:name}")
+_CLICK = command("ControlClick, {control}, {title}, {text}, {button}, "
+                 "{count}, {options}, {extitle}, {extext}")
+_SEND = command(
+    "{cmd:name}, {control}, {keys}, {title}, {text}, {extitle}, {extext}")
+_SET_TEXT = command("ControlSetText, {control}, {value}, {title}, {text}, "
+                    "{extitle}, {extext}")
+_GET = command("ControlGet, {var:name}, {cmd:name}, , {control}, {title}, "
+               "{text}, {extitle}, {extext}")
+_CONTROL = command("Control, {cmd:name}, {value}, {control}, {title}, "
+                   "{text}, {extitle}, {extext}")
 
 def _delay(method):
     """Decorator to add delay behavior to Control methods."""
@@ -17,22 +33,27 @@ def _delay(method):
         """Inner function.""" # For pylint
         # Store old values of delay and set new delays
         if self._cdelay is not None:
-            execute("{0} := A_ControlDelay".format('c'+self._tmpname))
-            execute("SetControlDelay, {0}".format(self._cdelay))
+            execute(_SAVE_DELAY.format('c'+self._tmpname, "A_ControlDelay"))
+            execute(_SET_DELAY.format("SetControlDelay", self._cdelay))
         if self._kdelay is not None:
-            execute("{0} := A_KeyDelay".format('k'+self._tmpname))
-            execute("SetKeyDelay, {0}".format(self._kdelay))
+            execute(_SAVE_DELAY.format('k'+self._tmpname, "A_KeyDelay"))
+            execute(_SET_DELAY.format("SetKeyDelay", self._kdelay))
         # Run the wrapped method
         method(self, *args, **kwargs)
         # Restore saved delay values
         if self._cdelay is not None:
-            execute("SetControlDelay, %{0}%".format('c'+self._tmpname))
+            execute(_RESTORE_DELAY.format("SetControlDelay",
+                                          'c'+self._tmpname))
         if self._kdelay is not None:
-            execute("SetKeyDelay, %{0}%".format('k'+self._tmpname))
+            execute(_RESTORE_DELAY.format("SetKeyDelay", 'k'+self._tmpname))
     return delayed
 
+@_engine_bound
 class Control(object):
-    """Wrapper around ahk window control commands."""
+    """Wrapper around ahk window control commands.
+
+    Controls act on the engine of the Script they were created with.
+    """
 
     def __init__(self, script, title="", text="", extitle="", extext="",
                  store=True):
@@ -55,6 +76,7 @@ class Control(object):
         :raises: NameError if store=True but a matching window can't be found.
         """
         self.script = script
+        self._engine = getattr(script, 'engine', None) or current_engine()
         self.params = (title, text, extitle, extext)
         self.hwnd = None
         if store:
@@ -64,7 +86,7 @@ class Control(object):
                 raise NameError("Can't find matching window:\n\t" +
                                 win.format(*self.params))
         # Internal state
-        self._tmpname = "tmp{0}".format(str(int(time.time())))
+        self._tmpname = _scratch_name()
         self._cdelay = None # control delay
         self._kdelay = None # key delay
 
@@ -131,10 +153,8 @@ class Control(object):
                 control = pos
             else:
                 options += " " + pos
-        # Setup window id args
-        cmd = "ControlClick, {0}, {1}, {2}, {3}, {4}, {5}, {6}, {7}"
-        execute(cmd.format(control, title, text, button, count,
-                           options, extitle, extext))
+        execute(_CLICK.format(control, title, text, button, count,
+                              options, extitle, extext))
 
     @_delay
     def send(self, control="", keys="", raw=False):
@@ -155,8 +175,7 @@ class Control(object):
         cmd = "ControlSend"
         if raw:
             cmd = "ControlSendRaw"
-        cmd = cmd + ", {0}, {1}, {2}, {3}, {4}"
-        execute(cmd.format(control, keys, title, text, extitle, extext))
+        execute(_SEND.format(cmd, control, keys, title, text, extitle, extext))
 
     @_delay
     def setText(self, control="", value=""):
@@ -172,8 +191,7 @@ class Control(object):
         """
         title, text, extitle, extext = self._params()
 
-        execute("ControlSetText, {0}, {1}, {2}, {3}, {4}, {5}".format(
-            control, value, title, text, extitle, extext))
+        execute(_SET_TEXT.format(control, value, title, text, extitle, extext))
 
     def get_choices(self, control=""):
         """Retrieve the available values from a ComboBox.
@@ -184,8 +202,8 @@ class Control(object):
         """
         title, text, extitle, extext = self._params()
 
-        execute("ControlGet, {0}, List,,{1},{2},{3},{4}".format(
-            self._tmpname, control, title, text, extitle, extext))
+        execute(_GET.format(self._tmpname, "List", control, title, text,
+                            extitle, extext))
         return get(self._tmpname).split('\n')
 
     def get_chosen(self, control=""):
@@ -197,8 +215,8 @@ class Control(object):
         """
         title, text, extitle, extext = self._params()
 
-        execute("ControlGet, {0}, Choice,,{1},{2},{3},{4}".format(
-            self._tmpname, control, title, text, extitle, extext))
+        execute(_GET.format(self._tmpname, "Choice", control, title, text,
+                            extitle, extext))
         return get(self._tmpname)
 
     @_delay
@@ -216,10 +234,10 @@ class Control(object):
         title, text, extitle, extext = self._params()
 
         cmd = "ChooseString"
-        if type(value) not in (str, unicode):
+        if not isinstance(value, str):
             cmd = "Choose"
-        execute("Control, {0}, {1}, {2}, {3}, {4}, {5}, {6}".format(
-            cmd, value, control, title, text, extitle, extext))
+        execute(_CONTROL.format(cmd, value, control, title, text,
+                                extitle, extext))
 
     def is_checked(self, control=""):
         """Check if a checkbox control is checked.
@@ -230,8 +248,8 @@ class Control(object):
         """
         title, text, extitle, extext = self._params()
 
-        execute("ControlGet, {0}, Checked,,{1},{2},{3},{4}".format(
-            self._tmpname, control, title, text, extitle, extext))
+        execute(_GET.format(self._tmpname, "Checked", control, title, text,
+                            extitle, extext))
         result = int(get(self._tmpname))
         if result == 1:
             return True
@@ -263,5 +281,5 @@ class Control(object):
         elif not state and checked:
             cmd = "Uncheck"
 
-        execute("Control, {0},, {1}, {2}, {3}, {4}, {5}".format(
-            cmd, control, title, text, extitle, extext))
+        execute(_CONTROL.format(cmd, "", control, title, text,
+                                extitle, extext))
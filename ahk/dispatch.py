@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Thread-safe access to the engine through a single worker thread.
+
+The wrappers in :mod:`ahk.ahk` and the Script/Control objects must not be
+used from several threads at once. A :class:`Dispatcher` gives one worker
+thread ownership of the engine, any number of producer threads submit
+requests and get :class:`concurrent.futures.Future` objects back::
+
+    dispatcher = Dispatcher()
+    dispatcher.submit(ahk.start).result()
+    futures = [dispatcher.execute("x += 1") for i in range(100)]
+    value = dispatcher.get("x").result()
+
+Consecutive queued :meth:`Dispatcher.execute` requests, from any producer,
+are merged into batched engine calls (see :func:`ahk.execute_many`).
+Components sharing an engine, like :class:`ahk.windows.WindowWaiter`, use
+the engine's :func:`shared` dispatcher unless given another one.
+"""
+import collections, threading
+from concurrent.futures import Future
+
+from ahk import ahk as _ahk
+
+class _Request(object):
+    """A queued engine request."""
+    __slots__ = ('future', 'script', 'call', 'submitted')
+
+    def __init__(self, script=None, call=None):
+        self.future = Future()
+        self.script = script
+        self.call = call
+        self.submitted = _ahk._clock()
+
+class Dispatcher(object):
+    """Serialize engine access from many threads onto one worker thread.
+
+    Metrics for sizing producer and worker threads are available from
+    :meth:`metrics`.
+    """
+
+    def __init__(self, batch_size=64, name="ahk-dispatcher", engine=None):
+        """
+        :param batch_size: Most execute requests merged into one engine call.
+        :type batch_size: int (default=64)
+        :param name: Name of the worker thread.
+        :type name: str (default="ahk-dispatcher")
+        :param engine: The engine requests act on (default current).
+        :type engine: ahk.Engine or None
+        """
+        self.batch_size = batch_size
+        self.engine = engine or _ahk.current_engine()
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = dict(submitted=0, completed=0, engine_calls=0,
+                           coalesced=0, max_depth=0, wait_total=0.0,
+                           wait_max=0.0)
+        self.thread = threading.Thread(target=self._work, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _put(self, request):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Dispatcher has been shut down!")
+            self._queue.append(request)
+            self._stats['submitted'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'],
+                                           len(self._queue))
+            self._cond.notify()
+        return request.future
+
+    def submit(self, func, *args, **kwargs):
+        """Run func(\\*args, \\*\\*kwargs) on the worker thread.
+
+        Use this for Script and Control methods, they run as a whole so
+        their scratch variables aren't touched by other requests meanwhile.
+
+        :returns: Future of the function result.
+        """
+        return self._put(_Request(call=(func, args, kwargs)))
+
+    def execute(self, script):
+        """Queue :func:`ahk.execute`, merged with neighbouring executes.
+
+        Every request is a separate statement or block, a failing request
+        doesn't stop the others.
+
+        :returns: Future resolving to True if successful, else False.
+        """
+        return self._put(_Request(script=script))
+
+    def get(self, name):
+        """:returns: Future of :func:`ahk.get`."""
+        return self.submit(_ahk.get, name)
+
+    def set(self, name, value):
+        """:returns: Future of :func:`ahk.set`."""
+        return self.submit(_ahk.set, name, value)
+
+    def call(self, func, *args):
+        """:returns: Future of :func:`ahk.call`."""
+        return self.submit(_ahk.call, func, *args)
+
+    def metrics(self):
+        """Snapshot of the dispatcher statistics.
+
+        * ``depth`` - Requests currently queued.
+        * ``max_depth`` - Most requests ever queued at once.
+        * ``submitted``/``completed`` - Request counts.
+        * ``engine_calls`` - Engine calls made: one per submit and single
+          execute, those made by :func:`ahk.execute_many` for batches of
+          executes (two or more).
+        * ``coalesced`` - Execute requests merged into a preceding one.
+        * ``wait_mean``/``wait_max`` - Seconds requests spent queued.
+
+        :returns: dict of metric name -> value.
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['depth'] = len(self._queue)
+        wait_total = stats.pop('wait_total')
+        stats['wait_mean'] = (wait_total / stats['completed']
+                              if stats['completed'] else 0.0)
+        return stats
+
+    def shutdown(self, wait=True):
+        """Stop accepting requests, the worker exits once the queue is empty.
+
+        :param wait: Whether to block until the worker has finished.
+        :type wait: bool (default=True)
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if wait and threading.current_thread() is not self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def _next(self):
+        """:returns: The next group of requests, or None when shut down."""
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            group = [self._queue.popleft()]
+            if group[0].script is not None:
+                while (self._queue and self._queue[0].script is not None and
+                       len(group) < self.batch_size):
+                    group.append(self._queue.popleft())
+        return group
+
+    def _work(self):
+        """Worker thread main loop."""
+        with self.engine:
+            self._loop()
+
+    def _loop(self):
+        while True:
+            group = self._next()
+            if group is None:
+                return
+            now = _ahk._clock()
+            group = [request for request in group
+                     if request.future.set_running_or_notify_cancel()]
+            with self._cond:
+                for request in group:
+                    wait = now - request.submitted
+                    self._stats['wait_total'] += wait
+                    self._stats['wait_max'] = max(self._stats['wait_max'], wait)
+            if not group:
+                continue
+            if group[0].script is None:
+                self._run(group[0])
+            else:
+                self._execute(group)
+            with self._cond:
+                self._stats['completed'] += len(group)
+
+    def _run(self, request):
+        func, args, kwargs = request.call
+        self._count(1)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            request.future.set_exception(exc)
+        else:
+            request.future.set_result(result)
+
+    def _execute(self, group):
+        """Run execute requests with as few engine calls as possible."""
+        if len(group) == 1:
+            self._count(1)
+            try:
+                result = _ahk.execute(group[0].script)
+            except BaseException as exc:
+                group[0].future.set_exception(exc)
+            else:
+                group[0].future.set_result(result)
+            return
+        with self._cond:
+            self._stats['coalesced'] += len(group) - 1
+        while group:
+            try:
+                results, calls = _ahk._execute_many(
+                    [req.script for req in group])
+            except BaseException as exc:
+                self._count(1)
+                for request in group:
+                    request.future.set_exception(exc)
+                return
+            self._count(calls)
+            # Requests after a failing one didn't run, continue with them
+            pending = []
+            for request, result in zip(group, results):
+                if result is None:
+                    pending.append(request)
+                else:
+                    request.future.set_result(result)
+            group = pending
+
+    def _count(self, calls):
+        with self._cond:
+            self._stats['engine_calls'] += calls
+
+# Serializes the creation of shared dispatchers
+_shared_lock = threading.Lock()
+
+def shared(engine=None):
+    """Get the dispatcher shared by all users of an engine.
+
+    The dispatcher is created on first use, and again if it was shut down.
+    :meth:`ahk.Engine.close` shuts it down.
+
+    :param engine: The engine (default current).
+    :type engine: ahk.Engine or None
+    :returns: The engine's Dispatcher.
+    """
+    engine = engine or _ahk.current_engine()
+    with _shared_lock:
+        dispatcher = engine.dispatcher
+        if dispatcher is None or dispatcher._closed:
+            dispatcher = engine.dispatcher = Dispatcher(
+                name="ahk-shared-dispatcher", engine=engine)
+        return dispatcher
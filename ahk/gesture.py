@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Batched mouse gestures.
+
+Each :meth:`ahk.Script.click` is an engine call of its own, so a drag along
+a path of a hundred points costs a hundred calls. A :class:`Gesture`
+collects moves, presses, releases, clicks and delays and runs them as one
+block with a single engine call::
+
+    drag = script.gesture(tolerance=2)
+    drag.move(10, 10).press()
+    for x, y in path:
+        drag.move(x, y)
+    drag.release().play()
+
+Moves between other steps are coalesced: a move is dropped when the
+pointer path stays within `tolerance` pixels of the path without it.
+Coordinates are interpreted like those of :meth:`ahk.Script.click`.
+"""
+from ahk import ahk as _ahk
+from ahk.command import command
+
+_CLICK = command("Click {button}, {count}")
+_CLICK_AT = command("Click {x}, {y}, {button}, {count}")
+_PRESS = command("Click {button}, Down")
+_RELEASE = command("Click {button}, Up")
+_MOVE = command("MouseMove, {x}, {y}, {speed}")
+_MOVE_RELATIVE = command("MouseMove, {x}, {y}, {speed}, R")
+_SLEEP = command("Sleep, {ms}")
+
+def _distance(point, start, end):
+    """:returns: Distance in pixels of point from the segment start-end."""
+    (px, py), (sx, sy), (ex, ey) = point, start, end
+    dx, dy = ex - sx, ey - sy
+    length = dx * dx + dy * dy
+    t = 0 if not length else max(0, min(1, ((px - sx) * dx +
+                                            (py - sy) * dy) / length))
+    cx, cy = sx + t * dx, sy + t * dy
+    return ((px - cx) ** 2 + (py - cy) ** 2) ** 0.5
+
+def coalesce(points, tolerance=0):
+    """Drop the points of a path which don't change it by more than
+    tolerance pixels.
+
+    The first and last points are kept, dropped points are within tolerance
+    of the segment between the kept points around them.
+
+    :param points: The path as a list of (x, y) coordinates.
+    :type points: list
+    :returns: List of the points kept.
+    """
+    if len(points) < 3:
+        return list(points)
+    # Ramer-Douglas-Peucker: keep the farthest point off each segment
+    keep = [True] + [False] * (len(points) - 2) + [True]
+    segments = [(0, len(points) - 1)]
+    while segments:
+        first, last = segments.pop()
+        farthest, worst = None, tolerance
+        for index in range(first + 1, last):
+            distance = _distance(points[index], points[first], points[last])
+            if distance > worst:
+                farthest, worst = index, distance
+        if farthest is not None:
+            keep[farthest] = True
+            segments += [(first, farthest), (farthest, last)]
+    return [point for point, kept in zip(points, keep) if kept]
+
+class Gesture(object):
+    """A sequence of mouse actions run with one engine call."""
+
+    def __init__(self, tolerance=0, interval=0, speed=0, engine=None):
+        """
+        :param tolerance: Most pixels the path may change when coalescing
+            moves, 0 only drops repeated and collinear points.
+        :type tolerance: float (default=0)
+        :param interval: Seconds to wait after each move.
+        :type interval: float (default=0)
+        :param speed: Speed of moves from 0 (instant) to 100 (slowest).
+        :type speed: int (default=0)
+        :param engine: The engine to run in (default current at play time).
+        :type engine: ahk.Engine or None
+        """
+        self.tolerance = tolerance
+        self.interval = interval
+        self.speed = speed
+        self.engine = engine
+        self.steps = []
+
+    def move(self, x, y, relative=False):
+        """Move the pointer.
+
+        :param relative: Offset from the current position.
+        :type relative: bool (default=False)
+        :returns: The gesture, for chaining.
+        """
+        self.steps.append(('rmove' if relative else 'move', (x, y)))
+        return self
+
+    def path(self, points):
+        """Move the pointer along a list of (x, y) coordinates.
+
+        :returns: The gesture, for chaining.
+        """
+        for x, y in points:
+            self.move(x, y)
+        return self
+
+    def press(self, button="left"):
+        """Press and hold a button.
+
+        :returns: The gesture, for chaining.
+        """
+        self.steps.append(('command', _PRESS.format(button)))
+        return self
+
+    def release(self, button="left"):
+        """Release a button.
+
+        :returns: The gesture, for chaining.
+        """
+        self.steps.append(('command', _RELEASE.format(button)))
+        return self
+
+    def click(self, x=None, y=None, button="left", count=1):
+        """Click a button, at x, y if given else at the pointer.
+
+        :returns: The gesture, for chaining.
+        """
+        if x is None and y is None:
+            self.steps.append(('command', _CLICK.format(button, count)))
+        else:
+            x, y = x or 0, y or 0
+            self.steps.append(('click', _CLICK_AT.format(x, y, button, count),
+                               (x, y)))
+        return self
+
+    def sleep(self, seconds):
+        """Wait before the following steps.
+
+        :returns: The gesture, for chaining.
+        """
+        self.steps.append(('sleep', int(round(seconds * 1000))))
+        return self
+
+    def _move(self, point, relative=False):
+        """:returns: The command lines moving the pointer to point."""
+        move = _MOVE_RELATIVE if relative else _MOVE
+        lines = [move.format(point[0], point[1], self.speed)]
+        if self.interval:
+            lines.append(_SLEEP.format(int(round(self.interval * 1000))))
+        return lines
+
+    def compile(self):
+        """:returns: The AHK command lines of the gesture, moves coalesced."""
+        lines, run = [], []
+        position = None # Pointer position before the run, None if unknown
+        for step in self.steps + [('end', None)]:
+            kind, value = step[:2]
+            if kind == 'move':
+                run.append(value)
+                continue
+            if run:
+                start = [] if position is None else [position]
+                for point in coalesce(start + run, self.tolerance)[len(start):]:
+                    lines += self._move(point)
+                position, run = run[-1], []
+            if kind == 'rmove':
+                lines += self._move(value, relative=True)
+                position = None
+            elif kind in ('command', 'click'):
+                lines.append(value)
+                if kind == 'click':
+                    position = step[2]
+            elif kind == 'sleep':
+                lines.append(_SLEEP.format(value))
+        return lines
+
+    def play(self):
+        """Run the gesture with one engine call.
+
+        :returns: True if successful, else False.
+        """
+        lines = self.compile()
+        if not lines:
+            return True
+        with self.engine or _ahk.current_engine():
+            return _ahk.execute("\n".join(lines) + "\n")
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return "<Gesture {0} steps>".format(len(self.steps))
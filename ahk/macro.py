@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Compiled keystroke macros.
+
+Calling :meth:`ahk.Script.send` once per field of a form costs an engine
+call each. A :class:`Macro` runs a whole sequence of text, keys and delays
+with a single engine call::
+
+    login = Macro(["jdoe", Keys("{Tab}"), password, 0.2, Keys("{Enter}")])
+    script.play(login)
+
+Text is sent literally: Send modifiers (``!+^#``) and braces are escaped,
+:class:`Keys` are passed through in AHK key syntax and numbers are delays in
+seconds. A macro played again is compiled into an AHK function, installed
+once per engine and cached by content, so one-off macros don't pile up
+functions in the engine.
+"""
+import hashlib, numbers, re
+
+from builtins import str
+
+from ahk import ahk as _ahk
+from ahk.cache import Cache
+from ahk.command import command
+
+class Keys(str):
+    """Keystrokes in AHK Send syntax (e.g. "^a" or "{Tab 3}"), sent as is."""
+
+# Characters with a meaning in Send, sent literally when wrapped in braces
+_SEND_SPECIAL = '!+^#{}'
+
+# Longest text sent by one command, long commands are split
+_CHUNK = 2000
+
+_SEND = command("{mode:name} % {keys:expr}")
+_SLEEP = command("Sleep, {ms}")
+
+def escape(text):
+    """Escape text so Send types it literally.
+
+    :returns: The text in AHK Send syntax.
+    """
+    text = text.replace("\r\n", "\n")
+    return "".join("{" + char + "}" if char in _SEND_SPECIAL else char
+                   for char in text)
+
+# One keystroke of Send syntax: modifiers then a {braced} key or character
+_STROKE = re.compile(r"[!+^#]*(?:\{\}\}|\{[^}]*\}|[\s\S])")
+
+def _chunks(keys):
+    """Split Send syntax into pieces of about _CHUNK characters, between
+    keystrokes."""
+    chunk, size = [], 0
+    for stroke in _STROKE.findall(keys):
+        if size + len(stroke) > _CHUNK and chunk:
+            yield "".join(chunk)
+            chunk, size = [], 0
+        chunk.append(stroke)
+        size += len(stroke)
+    if chunk:
+        yield "".join(chunk)
+
+# (mode, steps) -> (function name, source)
+_compiled = Cache(256)
+# (mode, steps) -> times played, macros are compiled from this many plays on
+_plays = Cache(256)
+_COMPILE_AFTER = 2
+
+class Macro(object):
+    """A sequence of text, keystrokes and delays replayed with one engine
+    call."""
+
+    def __init__(self, steps=(), mode='SendInput'):
+        """
+        :param steps: Text (str), keystrokes (:class:`Keys`) and delays in
+            seconds (numbers).
+        :type steps: iterable
+        :param mode: The ahk command used to send keys (see
+            :meth:`ahk.Script.send`).
+        :type mode: str (default='SendInput')
+        """
+        self.mode = mode
+        self.steps = []
+        for step in steps:
+            if isinstance(step, Keys):
+                self.keys(step)
+            elif isinstance(step, numbers.Number):
+                self.sleep(step)
+            else:
+                self.text(step)
+
+    def text(self, text):
+        """Add text typed literally.
+
+        :returns: The macro, for chaining.
+        """
+        self.steps.append(('keys', escape(str(text))))
+        return self
+
+    def keys(self, keys):
+        """Add keystrokes in AHK Send syntax.
+
+        :returns: The macro, for chaining.
+        """
+        self.steps.append(('keys', str(keys)))
+        return self
+
+    def key(self, name, count=1):
+        """Add a named key, e.g. key("Tab", 3) or key("Shift", "down").
+
+        :returns: The macro, for chaining.
+        """
+        return self.keys("{{{0}}}".format(name) if count == 1 else
+                         "{{{0} {1}}}".format(name, count))
+
+    def sleep(self, seconds):
+        """Add a delay.
+
+        :returns: The macro, for chaining.
+        """
+        self.steps.append(('sleep', int(round(seconds * 1000))))
+        return self
+
+    def _lines(self):
+        """:returns: The AHK command lines of the macro."""
+        lines, keys, delay = [], [], 0
+        # Merge neighbouring keys and neighbouring delays
+        for kind, value in self.steps + [('end', None)]:
+            if kind != 'keys' and keys:
+                for chunk in _chunks("".join(keys)):
+                    lines.append(_SEND.format(self.mode, chunk))
+                keys = []
+            if kind != 'sleep' and delay:
+                lines.append(_SLEEP.format(delay))
+                delay = 0
+            if kind == 'keys':
+                keys.append(value)
+            elif kind == 'sleep':
+                delay += value
+        return lines
+
+    def compile(self):
+        """Compile the macro into an AHK function (cached by content).
+
+        :returns: Tuple of the function name and its source.
+        """
+        key = (self.mode, tuple(self.steps))
+        compiled = _compiled.get(key)
+        if compiled is None:
+            body = "".join("    {0}\n".format(line) for line in self._lines())
+            name = "_pyahk_macro_" + hashlib.sha1(
+                body.encode('utf-8')).hexdigest()[:16]
+            compiled = (name, "\n{0}() {{\n{1}    return \"#\"\n}}\n".format(
+                name, body))
+            _compiled.put(key, compiled)
+        return compiled
+
+    def play(self, engine=None):
+        """Replay the macro with a single engine call.
+
+        The first play executes the lines directly. Macros played again are
+        compiled and installed in the engine (see :meth:`compile`), taking a
+        few more engine calls once, and are then called by name.
+
+        :param engine: The engine to send with (default current).
+        :type engine: ahk.Engine or None
+        :returns: True if successful, else False.
+        """
+        key = (self.mode, tuple(self.steps))
+        plays = _plays.get(key, 0) + 1
+        _plays.put(key, plays)
+        with engine or _ahk.current_engine() as engine:
+            _ahk._flush()
+            if plays < _COMPILE_AFTER:
+                return engine.backend.execute("\n".join(self._lines()))
+            name, source = self.compile()
+            try:
+                return _ahk._call_many(name, [], source) == "#"
+            except RuntimeError:
+                return False
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return "<Macro {0} steps>".format(len(self.steps))
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Run automation jobs in parallel on a farm of engine processes.
+
+Each worker process hosts its own engine, jobs are picklable callables run
+in a worker with that engine as the default, so they use the ahk module as
+usual::
+
+    def fill_form(name):
+        ahk.execute("...")
+        return ahk.get("result")
+
+    with Pool(4) as pool:
+        futures = [pool.submit(fill_form, name, key=name) for name in names]
+        results = [future.result() for future in futures]
+
+Jobs sharing an affinity `key` always run on the same worker, in order, so
+all steps of one window or session see the same engine state. Workers are
+health checked and restarted when they die. A worker whose engine keeps
+failing to start is restarted with growing delays, and given up after a
+number of attempts.
+
+Workers are started with the "spawn" method, which imports the ``__main__``
+module again in every worker. Scripts creating a pool must do so under an
+``if __name__ == "__main__":`` guard, or each worker runs the script too.
+"""
+import itertools, multiprocessing, os, threading
+from concurrent.futures import Future
+
+from ahk import ahk as _ahk
+from ahk.cache import Cache
+
+# Longest delay in seconds between restarts of a worker failing to start
+_MAX_RESTART_DELAY = 30.0
+
+class WorkerError(RuntimeError):
+    """A job was lost because its worker process died."""
+
+def _ping():
+    """Health check job."""
+    import ahk
+    return ahk.ready(nowait=True)
+
+def _worker(tasks, results, backend, timeout):
+    """Worker process main loop."""
+    import ahk
+    if backend is not None:
+        ahk.set_backend(backend())
+    ahk.start()
+    if not ahk.ready(timeout=timeout):
+        # Fails the queued jobs, the dead worker is restarted by the pool
+        results.send((None, False, WorkerError(
+            "Worker engine not ready after {0}s".format(timeout))))
+        results.close()
+        return
+    results.send((None, True, None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, func, args, kwargs = task
+        try:
+            result = (job_id, True, func(*args, **kwargs))
+        except Exception as exc:
+            result = (job_id, False, exc)
+        try:
+            results.send(result)
+        except Exception as exc:
+            # Unpicklable result or exception
+            results.send((job_id, False, RuntimeError(
+                "Can't return job result: {0!r}".format(exc))))
+    ahk.terminate()
+    results.close()
+
+class _Worker(object):
+    """Parent side state of one worker process."""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.tasks = None
+        self.reader = None # Thread receiving the results
+        self.pending = {} # job id -> Future
+        self.restarts = -1
+        self.error = None # Reported by the process before it exits
+        self.ready = False # Whether the engine of the process started
+        self.failures = 0 # Consecutive starts whose engine wasn't ready
+        self.retry_at = None # When a dead worker may be restarted
+        self.failed = False # Given up after too many failed starts
+
+class Pool(object):
+    """A farm of worker processes each hosting an AutoHotkey engine.
+
+    The worker processes import the ``__main__`` module, a script creating a
+    pool must do so under an ``if __name__ == "__main__":`` guard.
+    """
+
+    def __init__(self, processes=None, backend=None, timeout=10,
+                 health_interval=1.0, context=None, max_restarts=5,
+                 restart_delay=0.5, affinity_size=4096):
+        """
+        :param processes: Number of workers (default os.cpu_count()).
+        :type processes: int or None
+        :param backend: Picklable factory for the worker backends, e.g.
+            ahk.simulated.SimulatedBackend. None loads AutoHotkey.dll.
+        :type backend: callable or None
+        :param timeout: Seconds for a worker engine to become ready.
+        :type timeout: float (default=10)
+        :param health_interval: Seconds between health checks, None
+            disables the background monitor (see :meth:`check`).
+        :type health_interval: float or None (default=1.0)
+        :param context: multiprocessing start method (default "spawn",
+            as used on Windows).
+        :type context: str or None
+        :param max_restarts: Consecutive failed starts (engine not ready)
+            after which a worker is given up, None for no limit.
+        :type max_restarts: int or None (default=5)
+        :param restart_delay: Seconds before restarting a worker that failed
+            to start, doubled after every further failure (up to 30s).
+        :type restart_delay: float (default=0.5)
+        :param affinity_size: Most affinity keys remembered, the least
+            recently used key is forgotten and may move to another worker.
+        :type affinity_size: int or None (default=4096)
+        :raises: OSError if a worker process can't be started.
+        """
+        self.backend = backend
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self._ctx = multiprocessing.get_context(context or "spawn")
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._affinity = Cache(affinity_size) # key -> worker index
+        self._closed = False
+        self._workers = [_Worker(i) for i in range(processes or os.cpu_count() or 1)]
+        try:
+            for worker in self._workers:
+                self._start(worker)
+        except Exception:
+            for worker in self._workers:
+                if worker.process is not None and worker.process.is_alive():
+                    worker.process.terminate()
+                    worker.process.join()
+            raise
+        self._stop = threading.Event()
+        self._monitor = None
+        if health_interval:
+            self._monitor = threading.Thread(target=self._watch,
+                args=(health_interval,), name="ahk-pool-health")
+            self._monitor.daemon = True
+            self._monitor.start()
+
+    @property
+    def size(self):
+        """Number of worker processes."""
+        return len(self._workers)
+
+    def _start(self, worker):
+        """(Re)start the process of a worker."""
+        # Every process gets its own result pipe, a process dying while it
+        # writes can't block the others then.
+        receiver, sender = self._ctx.Pipe(duplex=False)
+        worker.tasks = self._ctx.Queue()
+        worker.process = self._ctx.Process(target=_worker,
+            args=(worker.tasks, sender, self.backend, self.timeout),
+            name="ahk-pool-{0}".format(worker.index))
+        worker.process.daemon = True
+        worker.process.start()
+        sender.close() # Receiving fails once the process is gone
+        worker.reader = threading.Thread(target=self._collect,
+            args=(worker, receiver),
+            name="ahk-pool-results-{0}".format(worker.index))
+        worker.reader.daemon = True
+        worker.reader.start()
+        worker.ready = False
+        worker.restarts += 1
+
+    def _pick(self, key):
+        """:returns: The worker for a job with the affinity key."""
+        index = None if key is None else self._affinity.get(key)
+        if index is not None:
+            return self._workers[index]
+        # Prefer running workers, then those waiting to be restarted
+        workers = ([worker for worker in self._workers
+                    if worker.retry_at is None and not worker.failed] or
+                   [worker for worker in self._workers if not worker.failed] or
+                   self._workers)
+        worker = min(workers, key=lambda worker: len(worker.pending))
+        if key is not None:
+            self._affinity.put(key, worker.index)
+        return worker
+
+    def submit(self, func, *args, **kwargs):
+        """Run func(\\*args, \\*\\*kwargs) in a worker process.
+
+        Pass `key` to pin the job to the worker which ran the first job with
+        the same key, jobs without a key go to the least busy worker.
+
+        :returns: concurrent.futures.Future of the result. It raises the job's
+            exception, or WorkerError if the worker died.
+        """
+        key = kwargs.pop('key', None)
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Pool has been shut down!")
+            worker = self._pick(key)
+            if worker.failed:
+                future.set_exception(WorkerError(
+                    "Worker {0} given up after {1} failed starts".format(
+                        worker.index, worker.failures)))
+                return future
+            job_id = next(self._ids)
+            worker.pending[job_id] = future
+            worker.tasks.put((job_id, func, args, kwargs))
+        return future
+
+    def map(self, func, iterable, key=None):
+        """Run func on every item of iterable in parallel.
+
+        :param key: Optional function computing the affinity key of an item.
+        :type key: callable or None
+        :returns: List of results in order.
+        """
+        futures = [self.submit(func, item,
+                               key=None if key is None else key(item))
+                   for item in iterable]
+        return [future.result() for future in futures]
+
+    def _collect(self, worker, receiver):
+        """Resolve futures with results sent by a worker process."""
+        process = worker.process
+        while True:
+            try:
+                job_id, ok, value = receiver.recv()
+            except (EOFError, OSError):
+                receiver.close()
+                return
+            if job_id is None and ok:
+                # The engine of the worker started
+                with self._lock:
+                    if worker.process is process:
+                        worker.ready = True
+                        worker.failures = 0
+                continue
+            if job_id is None:
+                # The worker can't run jobs, fail those it was given
+                with self._lock:
+                    if worker.process is not process: # Already restarted
+                        continue
+                    worker.error = value
+                    lost, worker.pending = worker.pending, {}
+                for future in lost.values():
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(value)
+                continue
+            with self._lock:
+                future = worker.pending.pop(job_id, None)
+            if future is None or not future.set_running_or_notify_cancel():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def check(self):
+        """Check the worker processes, restarting dead ones.
+
+        Jobs pending on a dead worker fail with WorkerError, jobs with its
+        affinity keys keep going to the restarted worker. Workers whose
+        engine didn't start are restarted after a delay growing with every
+        failure (see `restart_delay`), and given up after `max_restarts`
+        failures in a row: jobs for them fail at once from then on.
+
+        :returns: Indexes of the restarted workers.
+        """
+        restarted = []
+        now = _ahk._clock()
+        with self._lock:
+            if self._closed:
+                return restarted
+            for worker in self._workers:
+                if worker.failed or worker.process.is_alive():
+                    continue
+                lost, worker.pending = worker.pending, {}
+                error = "Worker {0} died (exit code {1})".format(
+                    worker.index, worker.process.exitcode)
+                if worker.error is not None:
+                    error += ": {0}".format(worker.error)
+                for future in lost.values():
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(WorkerError(error))
+                if worker.retry_at is None:
+                    # Just found dead
+                    worker.error = None
+                    delay = 0
+                    if not worker.ready:
+                        worker.failures += 1
+                        if self.max_restarts is not None and \
+                                worker.failures > self.max_restarts:
+                            worker.failed = True
+                            continue
+                        delay = min(self.restart_delay *
+                                    2 ** (worker.failures - 1),
+                                    _MAX_RESTART_DELAY)
+                    worker.retry_at = now + delay
+                if now < worker.retry_at:
+                    continue
+                worker.retry_at = None
+                self._start(worker)
+                restarted.append(worker.index)
+        return restarted
+
+    def health(self, timeout=None):
+        """Ping every worker engine.
+
+        :param timeout: Seconds to wait for each answer (default pool timeout).
+        :returns: List with True for each responsive worker with a ready
+            engine, else False.
+        """
+        futures = []
+        with self._lock:
+            for worker in self._workers:
+                future = Future()
+                job_id = next(self._ids)
+                worker.pending[job_id] = future
+                worker.tasks.put((job_id, _ping, (), {}))
+                futures.append(future)
+        status = []
+        for future in futures:
+            try:
+                status.append(future.result(timeout or self.timeout) is True)
+            except Exception:
+                status.append(False)
+        return status
+
+    def stats(self):
+        """:returns: List of dict(pid, pending, restarts, failed) per worker,
+            failed is True once the worker has been given up."""
+        with self._lock:
+            return [dict(pid=worker.process.pid, pending=len(worker.pending),
+                         restarts=worker.restarts, failed=worker.failed)
+                    for worker in self._workers]
+
+    def _watch(self, interval):
+        """Background health monitor."""
+        while not self._stop.wait(interval):
+            self.check()
+
+    def shutdown(self, wait=True):
+        """Stop the workers after their queued jobs.
+
+        :param wait: Whether to wait for the worker processes to exit.
+        :type wait: bool (default=True)
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for worker in self._workers:
+                worker.tasks.put(None)
+        self._stop.set()
+        if wait:
+            for worker in self._workers:
+                worker.process.join()
+                worker.reader.join()
+                for future in worker.pending.values():
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(WorkerError(
+                            "Worker {0} exited".format(worker.index)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
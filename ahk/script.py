@@ -8,12 +8,43 @@ This module contains higher-level object oriented wrappers around AHK scripting.
 import time
 from functools import partial
 from ahk import *
+from ahk.ahk import _clock, _engine_bound, _on_engine, _quote, _scratch_name
+from ahk import color as _color
+from ahk.cache import Cache
+from ahk.callbacks import CallbackRegistry
+from ahk.capture import capture as _capture
+from ahk.command import command
+from ahk.gesture import Gesture
+from ahk.macro import Macro
+from ahk.watch import EngineWatcher, PixelWatcher
+from ahk.windows import WindowTable, WindowWaiter
+
+# Marks cache misses, results may be None
+_MISSING = object()
+
+# Commands of the wrapper methods
+_SEND = command("{mode:name} {keys}")
+_CLICK = command("Click {button}")
+_CLICK_COUNT = command("Click {button}, {count}")
+_CLICK_AT = command("Click {button}, {x}, {y}")
+_CLICK_AT_COUNT = command("Click {button}, {x}, {y}, {count}")
+_WIN_LAST = command("{cmd:name}")
+_WIN = command("{cmd:name}, {title}, {text}, {extitle}, {extext}")
+_WIN_FIND = command("{var:name} := {func:name}({title:expr}, {text:expr}, "
+                    "{extitle:expr}, {extext:expr})")
+_WIN_WAIT = command(
+    "{cmd:name}, {title}, {text}, {timeout}, {extitle}, {extext}")
+_PIXEL_GET = command("PixelGetColor, {var:name}, {x}, {y}, {opt}")
+_MSGBOX = command("MsgBox {options}, {title}, {text}")
+_MSGBOX_TIMEOUT = command("MsgBox {options}, {title}, {text}, {timeout}")
+_MSG_RESULT = command("ifMsgBox, {button}\n\t{var:name} := 1\n"
+                      "ifMsgBox, Timeout\n\t{var:name} := -1")
 
 class Function(object):
     """Object wrapper around ahk functions"""
     template = "\n{0}{1} {{\n{2}\n}}"
 
-    def __init__(self, name, result, args, body):
+    def __init__(self, name, result, args, body, engine=None, cache=None):
         """
         Called Functions are automatically transform to their result by calling
         the provided result function on the return value from the ahk function
@@ -27,50 +58,221 @@ class Function(object):
         :type args: str (default='()')
         :param body: The body of the function (excluding braces).
         :type body: str (default='')
+        :param engine: The engine to define the function in (default current).
+        :type engine: ahk.Engine or None
+        :param cache: Memoize the converted results of a pure function by its
+            arguments, either True, an LRU size bound or a
+            :class:`ahk.cache.Cache` (e.g. ``Cache(256, ttl=5)``).
+        :type cache: bool, int, Cache or None (default=None)
         """
+        self._engine = engine or current_engine()
         self.name = name
+        if cache is True:
+            cache = Cache()
+        elif cache is not None and not isinstance(cache, Cache):
+            cache = Cache(cache) if cache else None
+        self.cache = cache
         self.definition = self.template.format(name, args, body)
-        execute(self.definition)
+        with self._engine:
+            execute(self.definition)
         self.result = result
-        # Because the ahkdll function call function is broken use temp
-        # variables as a work-around.
-        self.tmpname = "tmp{0}".format(str(int(time.time())))
+        # Per-instance variable receiving results of expression calls
+        self.tmpname = _scratch_name()
+        self._handle = None
+
+    def _resolve(self):
+        """:returns: The cached FuncHandle, or None if not found."""
+        handle = self._handle
+        if handle is None or not handle.valid:
+            handle = self._handle = resolve_func(self.name)
+        return handle
 
     def __call__(self, *args):
-        """Call the wrapped function and return the converted result."""
-        args = ",".join(str(i) for i in args)
-        # Execute the function and assign the result to the temp variable
-        execute("{0} := {1}({2})".format(
-            self.tmpname, self.name, args))
-        # Get the result from the temp variable
-        result = self.result(get(self.tmpname))
-        # And delete the temp variable value
-        set(self.tmpname, "")
+        """Call the wrapped function and return the converted result.
+
+        Arguments are passed as strings with a single engine call, when the
+        function can't be resolved (e.g. after a reload) the call is made as
+        an expression instead. Memoized calls are answered from the cache
+        without calling into the engine.
+        """
+        if self.cache is None:
+            return self._call(args)
+        key = tuple(str(arg) for arg in args)
+        result = self.cache.get(key, _MISSING)
+        if result is _MISSING:
+            result = self._call(args)
+            self.cache.put(key, result)
         return result
 
+    @_on_engine
+    def _call(self, args):
+        handle = self._resolve()
+        if handle is not None:
+            return self.result(handle(*args))
+        return self.result(self.evaluate(*args))
+
+    def invalidate(self, *args):
+        """Drop memoized results.
+
+        :param args: Arguments of the call to forget, none clears the cache.
+        """
+        if self.cache is None:
+            return
+        if args:
+            self.cache.invalidate(tuple(str(arg) for arg in args))
+        else:
+            self.cache.clear()
+
+    @_on_engine
+    def evaluate(self, *args):
+        """Call the function as an expression, arguments are quoted.
+
+        :returns: Result of the function call as a string.
+        """
+        execute("{0} := {1}({2})".format(
+            self.tmpname, self.name, ", ".join(_quote(arg) for arg in args)))
+        return get(self.tmpname)
+
+class _Variable(object):
+    """Binding of a Script attribute to an ahk variable.
+
+    The read command is formatted once, converted values can be cached.
+    """
+    __slots__ = ('name', 'kind', 'tmpname', 'command', 'max_age', 'cached',
+                 'value', 'read_at')
+
+    def __init__(self, name, kind, tmpname, cache=False):
+        """
+        :param cache: False, True or the most seconds a value is reused
+            (see :meth:`Script.variable`).
+        """
+        self.name = name
+        self.kind = kind
+        self.tmpname = tmpname
+        # The clipboard can't be directly read... Others?
+        self.command = "{0} := {1}".format(tmpname, name)
+        self.max_age = cache
+        self.cached = bool(cache)
+        self.value = None
+        self.read_at = None # Time the cached value was read, None if unset
+
+    def load(self, script):
+        """:returns: The converted value of the variable, cached or read."""
+        if self.read_at is not None and (self.max_age is True or
+                _clock() - self.read_at <= self.max_age):
+            return self.value
+        with script._engine:
+            execute(self.command)
+            value = self.kind(get(self.tmpname))
+        if self.cached:
+            self.remember(value)
+        return value
+
+    def store(self, script, value):
+        """Assign the variable, caching the value if successful."""
+        with script._engine:
+            written = set(self.name, value)
+        if self.cached:
+            if written:
+                self.assigned(value)
+            else:
+                self.read_at = None
+
+    def remember(self, value):
+        """Cache a converted value read from ahk."""
+        self.value, self.read_at = value, _clock()
+
+    def assigned(self, value):
+        """Cache a value just assigned to the variable."""
+        # The engine stores the string, a read would convert that
+        try:
+            self.remember(self.kind(str(value)))
+        except ValueError:
+            self.read_at = None
+
+class _Binding(object):
+    """Descriptor reading the variables of one name for every Script.
+
+    Installed on :class:`Script` once per variable name, reads of wrapped
+    variables go straight to the instance's :class:`_Variable` instead of
+    failing the normal lookup and falling back to ``__getattr__``.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, script, owner):
+        if script is None:
+            return self
+        binding = script.__dict__.get('_vars', {}).get(self.name)
+        if binding is None:
+            # Not wrapped by this instance, __getattr__ looks further
+            raise AttributeError("No variable named {0}!".format(self.name))
+        return binding.load(script)
+
+@_engine_bound
 class Script(object):
-    """Wrapper around ahk script commands."""
+    """Wrapper around ahk script commands.
 
-    def __init__(self, script="", filename=None):
+    Scripts are bound to one :class:`ahk.Engine`, all methods act on it.
+    """
+
+    def __init__(self, script="", filename=None, timeout=10, engine=None):
         """
         Initializes the ahk script engine just like calling the low-level
         function ahk.start followed by ahk.ready.
+        The time the engine took to become ready is available as
+        :attr:`startup`.
+
+        :param timeout: Seconds to wait for the engine, None waits forever.
+        :type timeout: float or None (default=10)
+        :param engine: The engine to run the script in (default current).
+        :type engine: ahk.Engine or None
+        :raises: RuntimeError if the engine isn't ready within timeout.
         """
-        self._handle = start(script=script, filename=filename)
-        ready()
-        self._vars = dict()
+        self._engine = engine or current_engine()
+        self._handle = self._engine.start(script=script, filename=filename)
+        # Copies share the engine, only the instance which started it owns it
+        self._owner = id(self)
+        if not self._engine.ready(timeout=timeout):
+            raise RuntimeError(
+                    "Script not ready after {0} seconds!".format(timeout))
+        self._startup = self._engine.startup
+        self._vars = dict() # name -> _Variable
         self._funcs = dict()
-        self._tmpname = "tmp{0}".format(str(int(time.time())))
+        self._tmpname = _scratch_name()
+        self._windows = None # Window lookup Cache (see cache_windows)
+        self._stale = 0 # Cached windows found invalid
+        self._waiter = None # WindowWaiter (see window_waiter)
+        self._callbacks = None # CallbackRegistry (see callbacks)
 
         # Add some default variables
         self.variable('Clipboard')
-        self.variable('ErrorLevel', kind=partial(int, base=0))
+        self.variable('ErrorLevel', kind=partial(int, base=0), value=0)
+
+    @property
+    def startup(self):
+        """Seconds the engine took to become ready (see ahk.startup_time)."""
+        return self._startup
+
+    @property
+    def engine(self):
+        """The :class:`ahk.Engine` running this script."""
+        return self._engine
 
     def __del__(self):
-        """Call terminate to kill the script engine."""
-        terminate()
+        """Call terminate to kill the script engine.
 
-    def variable(self, name, kind=str, value=''):
+        Engines restarted by another Script since, and copies of the Script,
+        are left running.
+        """
+        engine = self.__dict__.get('_engine')
+        if engine is not None and engine.handle == self._handle and \
+                self.__dict__.get('_owner') == id(self):
+            engine.terminate()
+
+    def variable(self, name, kind=str, value='', cache=False):
         """Create a new ahk variable wrapper.
 
         Wrapped variables are tracked by the instance and can be accessed as
@@ -90,30 +292,64 @@ class Script(object):
         :type kind: callable type (default=str)
         :param value: Initial value of the variable.
         :type value: match kind or str (default='')
+        :param cache: Reuse read values, True until the variable is assigned
+            through the instance or invalidated, a number to also re-read
+            values older than that many seconds. Use it for variables only
+            changed by Python or rarely by the script (see :meth:`invalidate`).
+        :type cache: bool or float (default=False)
         :raises: AttributeError if the provided name already exists in the
             instance as either a variable or an attribute.
         """
         if name[0] == '_':
             raise AttributeError(
                     "Variable names may not start with an underscore!")
-        if hasattr(self, name):
-            raise AttributeError(
-                    "Name: {0} already exists as an attribute!".format(name))
         if name in self._vars:
             raise AttributeError(
                     "Name: {0} already exists as a variable!".format(name))
+        if hasattr(self, name):
+            raise AttributeError(
+                    "Name: {0} already exists as an attribute!".format(name))
         if name in self._funcs:
             raise AttributeError(
                     "Name: {0} already exists as a function!".format(name))
 
         if set(name, value):
-            self._vars[name] = kind
+            binding = _Variable(name, kind, self._tmpname, cache)
+            self._vars[name] = binding
+            if not isinstance(Script.__dict__.get(name), _Binding):
+                setattr(Script, name, _Binding(name))
+            if binding.cached:
+                binding.assigned(value)
         else:
             raise AttributeError(
                     "Failure reported by ahk while setting {0}={1}!".format(
                         name, value))
 
-    def function(self, name, result=str, args='()', body=''):
+    def invalidate(self, *names):
+        """Drop cached variable values, the next reads get them from ahk.
+
+        Call this after script code changed cached variables.
+
+        :param names: Variables to drop, none drops all.
+        """
+        for name in names or self._vars:
+            self._vars[name].read_at = None
+
+    def snapshot(self):
+        """Read every wrapped variable with a single engine call.
+
+        Values of cached variables are refreshed with the ones read.
+
+        :returns: dict of variable name -> converted value.
+        """
+        values = get_many(self._vars)
+        for name, binding in self._vars.items():
+            values[name] = binding.kind(values[name])
+            if binding.cached:
+                binding.remember(values[name])
+        return values
+
+    def function(self, name, result=str, args='()', body='', cache=None):
         """Create a new ahk function wrapper.
 
         Wrapped functions are tracked by the instance and can be accessed as
@@ -132,6 +368,9 @@ class Script(object):
         :type args: str (default='()')
         :param body: The body of the function (excluding braces).
         :type body: str (default='')
+        :param cache: Memoize results of a pure function (see
+            :class:`Function`).
+        :type cache: bool, int, Cache or None (default=None)
         :raises: AttributeError if the indicated name is already used.
         :returns: Function wrapper object.
         """
@@ -148,10 +387,27 @@ class Script(object):
             raise AttributeError(
                     "Name: {0} already exists as a variable!".format(name))
 
-        func = Function(name, result, args, body)
+        func = Function(name, result, args, body, engine=self._engine,
+                        cache=cache)
         self._funcs[name] = func
         return func
 
+    def batch(self, size=None):
+        """Queue the commands of wrapper methods into batched engine calls.
+
+        Commands issued by methods like send, click or Control.setText inside
+        the returned context are executed together when it exits::
+
+            with script.batch():
+                script.send("abc")
+                script.click(x=10, y=10)
+
+        :param size: Maximum number of commands per engine call.
+        :type size: int or None (default=all)
+        :returns: ahk.Batch context manager.
+        """
+        return Batch(size, engine=self._engine)
+
     def send(self, keys, mode='SendInput'):
         """Convenience wrapper to send input to the active window.
 
@@ -171,7 +427,22 @@ class Script(object):
 
         :type mode: str
         """
-        execute("{0} {1}".format(mode, keys))
+        execute(_SEND.format(mode, keys))
+
+    def play(self, macro):
+        """Replay a compiled keystroke macro with a single engine call.
+
+        Unlike a series of :meth:`send` calls the whole sequence of text,
+        keys and delays runs in one engine call, see :mod:`ahk.macro`.
+
+        :param macro: The macro, or its steps (see
+            :class:`ahk.macro.Macro`).
+        :type macro: ahk.macro.Macro or iterable
+        :returns: True if successful, else False.
+        """
+        if not isinstance(macro, Macro):
+            macro = Macro(macro)
+        return macro.play()
 
     def click(self, button="", count=1, x=None, y=None):
         """Convenience wrapper to the ahk click function.
@@ -202,13 +473,36 @@ class Script(object):
         :param y: Mouse y-coord.
         :type y: int
         """
-        cmd = "Click {0}".format(button)
-        if x or y: # Could fail for x&y = 0
-            cmd += ", {0}, {1}".format(x, y)
         # Click count must occur "somewhere right of the coordinates"
-        if count != 1:
-            cmd += ", {0}".format(count)
-        execute(cmd+'\n')
+        if x is not None or y is not None:
+            x, y = x or 0, y or 0
+            if count != 1:
+                cmd = _CLICK_AT_COUNT.format(button, x, y, count)
+            else:
+                cmd = _CLICK_AT.format(button, x, y)
+        elif count != 1:
+            cmd = _CLICK_COUNT.format(button, count)
+        else:
+            cmd = _CLICK.format(button)
+        execute(cmd)
+
+    def gesture(self, tolerance=0, interval=0, speed=0):
+        """Start a batch of mouse actions run with one engine call.
+
+        Unlike a series of :meth:`click` calls the moves, presses, releases
+        and clicks of a :class:`ahk.gesture.Gesture` run as one block, e.g.
+        ``script.gesture().move(0, 0).press().path(points).release().play()``.
+
+        :param tolerance: Most pixels the path may change when coalescing
+            moves.
+        :type tolerance: float (default=0)
+        :param interval: Seconds to wait after each move.
+        :type interval: float (default=0)
+        :param speed: Speed of moves from 0 (instant) to 100 (slowest).
+        :type speed: int (default=0)
+        :returns: A new, empty Gesture.
+        """
+        return Gesture(tolerance, interval, speed, engine=self._engine)
 
     def winActivate(self, title="", text="",
                     extitle="", extext="", bottom=False):
@@ -234,10 +528,9 @@ class Script(object):
         if bottom:
             cmd = "WinActivateBottom"
         if ''.join((title, text, extitle, extext)):
-            cmd = '{0}, {1}, {2}, {3}, {4}'.format(
-                cmd, title, text, extitle, extext)
-        #print(cmd)
-        execute(cmd)
+            execute(_WIN.format(cmd, title, text, extitle, extext))
+        else:
+            execute(_WIN_LAST.format(cmd))
 
     def winActive(self, title="", text="", extitle="", extext=""):
         """Convenience wrapper for ahk IfWinActive command.
@@ -257,13 +550,7 @@ class Script(object):
         :type extext: str (default="")
         :returns: The found window's HWND or None.
         """
-        set(self._tmpname, '')
-        execute('{0} := WinActive("{1}", "{2}", "{3}", "{4}")'.format(
-            self._tmpname, title, text, extitle, extext))
-        result = int(get(self._tmpname), 0)
-        if result == 0:
-            return None
-        return result
+        return self._find_window("WinActive", title, text, extitle, extext)
 
     def winExist(self, title="", text="", extitle="", extext=""):
         """Convenience wrapper for ahk IfWinExist command.
@@ -283,14 +570,106 @@ class Script(object):
         :type extext: str (default="")
         :returns: The found window's HWND or None.
         """
+        return self._find_window("WinExist", title, text, extitle, extext)
+
+    def _find_window(self, func, title, text, extitle, extext):
+        """:returns: HWND found by WinExist/WinActive, possibly cached."""
+        cache = self._windows
+        key = (func, title, text, extitle, extext)
+        # Without criteria the `last found` window is meant, don't cache
+        if cache is not None and ''.join(key[1:]):
+            hwnd = cache.get(key)
+            if hwnd is not None:
+                if self._engine.backend.is_window(
+                        hwnd, active=func == "WinActive") is not False:
+                    return hwnd
+                cache.invalidate(key)
+                self._stale += 1
+        else:
+            cache = None
         set(self._tmpname, '')
-        execute('{0} := WinExist("{1}", "{2}", "{3}", "{4}")'.format(
-            self._tmpname, title, text, extitle, extext))
+        execute(_WIN_FIND.format(self._tmpname, func, title, text,
+                                 extitle, extext))
         result = int(get(self._tmpname), 0)
         if result == 0:
             return None
+        if cache is not None:
+            cache.put(key, result)
         return result
 
+    def cache_windows(self, ttl=1.0, size=256):
+        """Cache the windows found by :meth:`winExist` and :meth:`winActive`.
+
+        Found HWNDs are reused for the same (title, text, extitle, extext)
+        criteria for up to `ttl` seconds, also saving the lookups of
+        :class:`ahk.Control` objects created with store=True. Before use a
+        cached window is checked to still exist (or still be active) when
+        the backend can tell without calling into the engine. A window
+        changing e.g. its title is found until the entry expires, and cached
+        lookups don't change the `last found` window.
+
+        :param ttl: Seconds a found window is reused, None to keep it until it
+            closes. Use 0 to disable caching.
+        :type ttl: float or None (default=1.0)
+        :param size: Most criteria cached.
+        :type size: int (default=256)
+        """
+        self._windows = Cache(size, ttl=ttl) if ttl != 0 else None
+        self._stale = 0
+
+    def window_stats(self):
+        """Statistics of the window cache (see :meth:`cache_windows`).
+
+        Adds to :meth:`ahk.cache.Cache.stats`:
+
+        * ``stale`` - Cached windows found closed (or inactive).
+        * ``saved`` - Engine calls saved by the cache.
+
+        :returns: dict of statistic name -> value, or None if not caching.
+        """
+        if self._windows is None:
+            return None
+        stats = self._windows.stats()
+        stats['stale'] = self._stale
+        # Every lookup takes set, execute and get
+        stats['saved'] = 3 * (stats['hits'] - self._stale)
+        return stats
+
+    def windows(self):
+        """Fetch all top level windows with a single engine call.
+
+        Each window's HWND, title, class, PID and geometry are loaded into an
+        indexed table searched in Python, e.g.
+        ``script.windows().find(cls="Notepad")``.
+
+        :returns: A :class:`ahk.windows.WindowTable`, update it with its
+            refresh method.
+        """
+        return WindowTable(self._engine)
+
+    def window_waiter(self, interval=0.05, dispatcher=None):
+        """Get the script's scheduler for non-blocking window waits.
+
+        Unlike :meth:`waitWindow` and :meth:`waitActive`, the waits of a
+        :class:`ahk.windows.WindowWaiter` return futures at once and all
+        pending waits are checked with one engine call per tick, e.g.
+        ``script.window_waiter().wait("Save As", timeout=10).result()``.
+
+        :param interval: Seconds between ticks (applied to the shared
+            waiter).
+        :type interval: float (default=0.05)
+        :param dispatcher: The dispatcher other threads use the engine with,
+            the waiter queries through it (used when first created, default
+            the engine's shared one, see :func:`ahk.dispatch.shared`).
+        :type dispatcher: ahk.dispatch.Dispatcher or None
+        :returns: The script's WindowWaiter, created on first use.
+        """
+        if self._waiter is None:
+            self._waiter = WindowWaiter(interval, engine=self._engine,
+                                        dispatcher=dispatcher)
+        self._waiter.interval = interval
+        return self._waiter
+
     def waitActive(self, title="", text="", timeout=5,
                    extitle="", extext="", deactivate=False):
         """Convenience wrapper for ahk WinWaitActive command.
@@ -319,8 +698,7 @@ class Script(object):
             cmd = "WinWaitNotActive"
         if timeout is None:
             timeout = ""
-        execute("{0}, {1}, {2}, {3}, {4}, {5}".format(
-                cmd, title, text, timeout, extitle, extext))
+        execute(_WIN_WAIT.format(cmd, title, text, timeout, extitle, extext))
         result = self.ErrorLevel
         if result != 0:
             return False
@@ -355,8 +733,7 @@ class Script(object):
             cmd = "WinWaitClose"
         if timeout is None:
             timeout = ""
-        execute("{0}, {1}, {2}, {3}, {4}, {5}".format(
-                cmd, title, text, timeout, extitle, extext))
+        execute(_WIN_WAIT.format(cmd, title, text, timeout, extitle, extext))
         result = self.ErrorLevel
         if result != 0:
             return False
@@ -370,12 +747,7 @@ class Script(object):
 
     def _color_delta(self, c1, c2):
         """Compute the total error between two colors."""
-        err = 0.0
-        for i in range(3):
-            err += abs(c1[i] - c2[i])
-        result = err/float(255*3)
-        #print(c1, c2, result)
-        return result
+        return _color.delta(c1, c2)
 
     def getPixel(self, x=0, y=0, opt='RGB', screen=True):
         """Convenince wrapper around ahk PixelGetColor
@@ -398,10 +770,29 @@ class Script(object):
         else:
             execute("CoordMode, Pixel, Reletive")
 
-        execute("PixelGetColor, {0}, {1}, {2}, {3}".format(
-            self._tmpname, x, y, opt))
+        execute(_PIXEL_GET.format(self._tmpname, x, y, opt))
         return self.convert_color(get(self._tmpname))
 
+    def capture(self, x=0, y=0, width=1, height=1, capturer=None):
+        """Capture a rectangle of the screen at once.
+
+        Unlike :meth:`getPixel` the pixels are read with a single copy, see
+        :mod:`ahk.capture` for the pixel sources.
+
+        :param x: The left x coordinate (relative to screen).
+        :type x: int
+        :param y: The top y coordinate (relative to screen).
+        :type y: int
+        :param width: Width of the rectangle in pixels.
+        :type width: int (default=1)
+        :param height: Height of the rectangle in pixels.
+        :type height: int (default=1)
+        :param capturer: Pixel source (default ahk.capture.get_capturer()).
+        :type capturer: ahk.capture.Capturer or None
+        :returns: An :class:`ahk.capture.Frame` of RGB pixels.
+        """
+        return _capture(x, y, width, height, capturer)
+
     def waitPixel(self, x=0, y=0, color=None,
                   threshold=0.01, interval=0.5, timeout=False):
         """Wait until the pixel at given coords changes color.
@@ -432,11 +823,11 @@ class Script(object):
             color = self.getPixel(x, y)
 
         # Timing loop
-        start = time.time()
+        start = _clock()
         now = start
         while 1:
             # Get new timing for current iteration
-            now = time.time()
+            now = _clock()
             # Handle timeout condition
             if timeout and (now - start) >= timeout:
                 return False
@@ -454,6 +845,58 @@ class Script(object):
             # Pause
             time.sleep(interval)
 
+    def waitPixels(self, conditions, timeout=None, interval=0.05,
+                   capturer=None):
+        """Wait until any of several pixels changes or matches a color.
+
+        All pixels are read at once on every check, and the interval
+        between checks adapts to how often they change, see
+        :class:`ahk.watch.PixelWatcher`.
+
+        :param conditions: Tuples of (x, y[, color[, threshold]]), pixels
+            without a color are waited on to change.
+        :type conditions: iterable
+        :param timeout: How long to wait, None waits forever.
+        :type timeout: float or None
+        :param interval: Initial seconds between checks.
+        :type interval: float (default=0.05)
+        :param capturer: Pixel source (default ahk.capture.get_capturer()).
+        :type capturer: ahk.capture.Capturer or None
+        :returns: ahk.watch.Fired with the index of the condition that fired
+            and when, or None if timeout.
+        """
+        return PixelWatcher(conditions, interval=interval, capturer=capturer,
+                            engine=self._engine).wait(timeout)
+
+    def watcher(self, period=50):
+        """Create a watcher checking conditions inside the engine.
+
+        Add conditions to the :class:`ahk.watch.EngineWatcher` and wait on
+        it, only the condition firing calls back into Python.
+
+        :param period: Milliseconds between checks in the engine.
+        :type period: int (default=50)
+        :returns: A new ahk.watch.EngineWatcher on the script's engine.
+        """
+        return EngineWatcher(period, engine=self._engine)
+
+    def callbacks(self, size=256):
+        """Get the script's registry of Python callbacks.
+
+        Functions registered with it can be called from the script's AHK
+        code, e.g. ``script.callbacks().register(on_saved, "OnSaved")`` makes
+        ``OnSaved(path)`` usable in hotkeys and timers (see
+        :class:`ahk.callbacks.CallbackRegistry`).
+
+        :param size: Most calls queued before new ones are dropped (only
+            used when the registry is created).
+        :type size: int (default=256)
+        :returns: The script's CallbackRegistry, created on first use.
+        """
+        if self._callbacks is None:
+            self._callbacks = CallbackRegistry(size, engine=self._engine)
+        return self._callbacks
+
     def message(self, text="Alert", title="Alert", options=0, timeout=None):
         """Convenience wrapper to the ahk msgbox function.
 
@@ -470,10 +913,10 @@ class Script(object):
         :param timeout: Optional timeout, dialog is closed after timeout.
         :type timeout: int or None (default=None)
         """
-        cmd = 'MsgBox {0}, {1}, {2}'.format(options, title, text)
         if timeout:
-            cmd += ', {0}'.format(timeout)
-        execute(cmd)
+            execute(_MSGBOX_TIMEOUT.format(options, title, text, timeout))
+        else:
+            execute(_MSGBOX.format(options, title, text))
 
     def msgResult(self, name='OK'):
         """Convenience wrapper to the ahk ifMsgBox function.
@@ -487,8 +930,7 @@ class Script(object):
         :returns: True if button was pressed, None if timeout, False otherwise.
         """
         set(self._tmpname, '0')
-        template = 'ifMsgBox, {0}\n\t{1} := 1\nifMsgBox, Timeout\n\t{1} := -1'
-        execute(template.format(name, self._tmpname))
+        execute(_MSG_RESULT.format(name, self._tmpname))
         result = int(get(self._tmpname))
         if result == 1:
             return True
@@ -497,14 +939,13 @@ class Script(object):
         return False
 
     def __getattr__(self, name):
-        """Override attribute lookup to add ahk variable access."""
-        #NOTE __getattr__ is only called on attrs that aren't found normally
-        if name in self._vars:
-            # The clipboard can't be directly read... Others?
-            execute("{0} := {1}".format(self._tmpname, name))
-            return self._vars[name](get(self._tmpname))
-        elif name in self._funcs:
-            return self._funcs[name]
+        """Override attribute lookup to add ahk function access."""
+        #NOTE __getattr__ is only called on attrs that aren't found normally,
+        # variables are read by their _Binding on the class.
+        # Instances being copied or unpickled have no functions yet
+        funcs = self.__dict__.get('_funcs', {})
+        if name in funcs:
+            return funcs[name]
         else:
             raise AttributeError("No variable named {0}!".format(name))
 
@@ -514,7 +955,7 @@ class Script(object):
         if name[0] == '_' or name in self.__dict__:
             super(Script, self).__setattr__(name, value)
         elif name in self._vars:
-            set(name, value)
+            self._vars[name].store(self, value)
         elif name in self._funcs:
             raise AttributeError("Can't assign to function {0}!".format(name))
         else:
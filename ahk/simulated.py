@@ -0,0 +1,2209 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Pure Python stand-in for the AutoHotkey engine.
+
+:class:`SimulatedBackend` implements the :class:`ahk.Backend` interface with a
+small interpreter for the subset of AutoHotkey (v1) used by this package:
+variables, expressions, user defined functions, labels, ErrorLevel and the
+commands issued by :class:`ahk.Script` and :class:`ahk.Control`. Instead of
+real windows and a real screen the commands act on a :class:`Desktop` model
+which tests can populate and inspect.
+
+This allows the whole stack to run, and be profiled or benchmarked, on
+machines without AutoHotkey.dll (e.g. Linux)::
+
+    import ahk
+    from ahk.simulated import SimulatedBackend
+    backend = SimulatedBackend()
+    ahk.set_backend(backend)
+    backend.desktop.add_window("Untitled - Notepad", cls="Notepad")
+    script = ahk.Script()
+    script.winExist("Untitled") # -> HWND of the simulated window
+
+Setting the environment variable ``PYAHK_BACKEND=simulated`` selects a
+simulated backend when the package is first imported.
+"""
+import ctypes, itertools, math, os, re, threading, time
+from collections import deque
+
+from builtins import str
+
+from ahk.backend import Backend, _join_units, _units
+
+class SimulatedError(Exception):
+    """Load or runtime error raised inside the simulated engine."""
+
+class WindowControl(object):
+    """A control (button, edit, listbox...) inside a simulated window."""
+
+    def __init__(self, classnn, text="", choices=None, chosen=0,
+                 checked=False, enabled=True, visible=True):
+        """
+        :param classnn: The ClassNN of the control (e.g. "Edit1").
+        :type classnn: str
+        :param text: The text content of the control.
+        :type text: str (default="")
+        :param choices: Items of a listbox or combobox.
+        :type choices: list of str or None
+        :param chosen: 1-based index of the selected item, 0 if none.
+        :type chosen: int (default=0)
+        :param checked: Checkbox state.
+        :type checked: bool (default=False)
+        """
+        self.classnn = classnn
+        self.text = text
+        self.choices = list(choices or [])
+        self.chosen = chosen
+        self.checked = checked
+        self.enabled = enabled
+        self.visible = visible
+
+class Window(object):
+    """A top level window on the simulated desktop."""
+
+    def __init__(self, title="", cls="", text="", pid=0, process="",
+                 pos=(0, 0, 0, 0), controls=None):
+        """
+        :param title: The window title.
+        :type title: str
+        :param cls: The window class.
+        :type cls: str
+        :param text: Window text not owned by any control.
+        :type text: str
+        :param pid: Id of the owning process.
+        :type pid: int
+        :param process: Name of the owning process executable.
+        :type process: str
+        :param pos: Geometry of the window as (x, y, width, height).
+        :type pos: tuple
+        :param controls: The controls inside the window.
+        :type controls: list of WindowControl or None
+        """
+        self.hwnd = 0 # Assigned by the desktop
+        self.title = title
+        self.cls = cls
+        self.text = text
+        self.pid = pid
+        self.process = process
+        self.pos = tuple(pos)
+        self.controls = list(controls or [])
+
+    def control(self, name):
+        """Find a control by ClassNN, HWND or (partial) text.
+
+        :returns: A WindowControl or None.
+        """
+        for ctl in self.controls:
+            if ctl.classnn.lower() == name.lower():
+                return ctl
+        for ctl in self.controls:
+            if name and name.lower() in ctl.text.lower():
+                return ctl
+        return None
+
+    def all_text(self):
+        """:returns: The window text including the text of all controls."""
+        return "\n".join([self.text] + [ctl.text for ctl in self.controls])
+
+class Desktop(object):
+    """Model of the windowing environment acted on by a simulated engine.
+
+    Windows are kept in z-order with the top-most window first. Everything the
+    engine "does" to the outside world (sending keys, clicking, showing message
+    boxes) is appended to :attr:`events` as a tuple starting with the kind of
+    event. Changes made from other threads should go through the methods so
+    blocked waits (e.g. WinWait) are woken up.
+    """
+
+    def __init__(self, width=1024, height=768, background=(0, 0, 0)):
+        """
+        :param width: Screen width in pixels.
+        :type width: int
+        :param height: Screen height in pixels.
+        :type height: int
+        :param background: Initial color of every pixel.
+        :type background: tuple(int r, int g, int b)
+        """
+        self.width = width
+        self.height = height
+        self.background = tuple(background)
+        self.windows = []
+        self.active = None
+        self.clipboard = ""
+        self.mouse = (0, 0)
+        self.events = []
+        self.messages = []
+        # Button names returned by MsgBox, "OK" when empty
+        self.msgbox_responses = deque()
+        self.changed = threading.Condition()
+        self._framebuffer = None # Allocated on first pixel write
+        self._next_hwnd = 0x10010
+        # Like windows there is always a desktop window
+        self.add_window("Program Manager", cls="Progman", process="explorer.exe",
+                        pos=(0, 0, width, height))
+
+    def _notify(self):
+        """Wake up threads waiting for desktop changes."""
+        with self.changed:
+            self.changed.notify_all()
+
+    def wait(self, predicate, timeout=None):
+        """Block until predicate() is true or timeout seconds pass.
+
+        :returns: The last result of predicate.
+        """
+        with self.changed:
+            return self.changed.wait_for(predicate, timeout)
+
+    def add_window(self, title="", cls="", activate=True, **kwargs):
+        """Open a new window (see :class:`Window` for arguments).
+
+        :returns: The new Window.
+        """
+        win = Window(title, cls, **kwargs)
+        with self.changed:
+            win.hwnd = self._next_hwnd
+            self._next_hwnd += 0x12
+            self.windows.insert(0, win)
+            if activate:
+                self.active = win.hwnd
+            self.changed.notify_all()
+        return win
+
+    def window(self, hwnd):
+        """:returns: The Window with the given HWND, or None."""
+        for win in self.windows:
+            if win.hwnd == hwnd:
+                return win
+        return None
+
+    def close_window(self, hwnd):
+        """Close a window, activating the next one in z-order."""
+        with self.changed:
+            self.windows = [win for win in self.windows if win.hwnd != hwnd]
+            if self.active == hwnd:
+                self.active = self.windows[0].hwnd if self.windows else None
+            self.changed.notify_all()
+
+    def activate(self, hwnd):
+        """Bring a window to the top and make it active."""
+        with self.changed:
+            win = self.window(hwnd)
+            if win is not None:
+                self.windows.remove(win)
+                self.windows.insert(0, win)
+                self.active = hwnd
+            self.changed.notify_all()
+
+    def set_title(self, hwnd, title):
+        """Change the title of a window."""
+        self.window(hwnd).title = title
+        self._notify()
+
+    def set_pixel(self, x, y, color):
+        """Change the color of a single pixel."""
+        self.fill(x, y, 1, 1, color)
+
+    def fill(self, x, y, width, height, color):
+        """Paint a rectangle of the screen with a solid color."""
+        if self._framebuffer is None:
+            self._framebuffer = bytearray(self.background) * (
+                self.width * self.height)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        if x1 <= x0:
+            return
+        row = bytearray(color) * (x1 - x0)
+        for line in range(y0, y1):
+            offset = (line * self.width + x0) * 3
+            self._framebuffer[offset:offset + len(row)] = row
+        self._notify()
+
+    def region(self, x, y, width, height):
+        """Copy a rectangle of the screen, pixels off screen are black.
+
+        :returns: bytearray of width * height RGB triplets, row by row.
+        """
+        out = bytearray(width * height * 3)
+        x0, x1 = max(x, 0), min(x + width, self.width)
+        if x1 <= x0:
+            return out
+        if self._framebuffer is None:
+            row = bytearray(self.background) * (x1 - x0)
+        for line in range(max(y, 0), min(y + height, self.height)):
+            if self._framebuffer is not None:
+                offset = (line * self.width + x0) * 3
+                row = self._framebuffer[offset:offset + (x1 - x0) * 3]
+            start = ((line - y) * width + x0 - x) * 3
+            out[start:start + len(row)] = row
+        return out
+
+    def get_pixel(self, x, y):
+        """:returns: The (r, g, b) color of a pixel."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return (0, 0, 0)
+        if self._framebuffer is None:
+            return self.background
+        offset = (y * self.width + x) * 3
+        return tuple(self._framebuffer[offset:offset + 3])
+
+#---- Value helpers ------------------------------------------------------------
+
+_INT = re.compile(r'^[+-]?\d+$')
+_HEX = re.compile(r'^([+-]?)0[xX]([0-9a-fA-F]+)$')
+_FLOAT = re.compile(r'^[+-]?(\d+\.\d*|\.\d+)([eE][+-]?\d+)?$')
+
+def _to_number(value):
+    """Convert an AHK value to int or float, None if it isn't numeric."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    value = value.strip()
+    if _INT.match(value):
+        return int(value)
+    match = _HEX.match(value)
+    if match:
+        number = int(match.group(2), 16)
+        return -number if match.group(1) == '-' else number
+    if _FLOAT.match(value):
+        return float(value)
+    return None
+
+def _to_str(value):
+    """Convert an AHK value to its string form."""
+    if isinstance(value, float):
+        return "{0:.6f}".format(value)
+    return str(value)
+
+def _truth(value):
+    """AHK truthiness: empty strings and numeric zeros are false."""
+    if isinstance(value, (int, float)):
+        return value != 0
+    if value == "":
+        return False
+    number = _to_number(value)
+    if number is not None:
+        return number != 0
+    return True
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'v': '\v',
+            'a': '\a', 'f': '\f'}
+
+def _unescape(text):
+    """Process backtick escape sequences."""
+    if '`' not in text:
+        return text
+    out = []
+    chars = iter(text)
+    for char in chars:
+        if char == '`':
+            char = next(chars, '`')
+            out.append(_ESCAPES.get(char, char))
+        else:
+            out.append(char)
+    return ''.join(out)
+
+#---- Expressions --------------------------------------------------------------
+
+_TOKEN = re.compile(r'''
+    (?P<ws>\s+)
+   |(?P<num>0[xX][0-9a-fA-F]+|(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?(?![\w#@$]))
+   |(?P<str>"(?:[^"]|"")*")
+   |(?P<name>(?:[\w#@$]|%[\w#@$]+%)+)
+   |(?P<op>:=|\+=|-=|\*=|//=|/=|\.=|\|=|&=|\^=|>>=|<<=|\*\*|//|==|!=|<>|<=|>=
+          |&&|\|\||<<|>>|\+\+|--|[-+*/.<>=!~&|^?:(),])
+''', re.X)
+
+_ASSIGN_OPS = (':=', '+=', '-=', '*=', '/=', '//=', '.=', '|=', '&=', '^=',
+               '>>=', '<<=')
+_BINARY = {
+    '||': 4, 'or': 4, '&&': 5, 'and': 5,
+    '=': 7, '==': 7, '!=': 7, '<>': 7,
+    '<': 8, '>': 8, '<=': 8, '>=': 8,
+    '.': 9, '|': 10, '^': 11, '&': 12, '<<': 13, '>>': 13,
+    '+': 14, '-': 14, '*': 15, '/': 15, '//': 15, '**': 17,
+}
+_CONCAT = 9
+
+class _Token(object):
+    __slots__ = ('kind', 'text', 'space')
+
+    def __init__(self, kind, text, space):
+        self.kind = kind
+        self.text = text
+        self.space = space # Preceded by whitespace
+
+def _tokenize(text):
+    tokens = []
+    pos, space = 0, False
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise SimulatedError("Illegal character in expression: " + text)
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == 'ws':
+            space = True
+            continue
+        value = match.group(kind)
+        if kind == 'name' and value.lower() in ('and', 'or', 'not'):
+            kind, value = 'op', value.lower()
+        tokens.append(_Token(kind, value, space))
+        space = False
+    return tokens
+
+def _name_node(text):
+    """Node for a (possibly dynamic) variable reference."""
+    if '%' not in text:
+        return ('var', text.lower())
+    parts = [part for part in re.split(r'(%[\w#@$]+%)', text) if part]
+    parts = [('var', part[1:-1].lower()) if part[0] == '%' else part
+             for part in parts]
+    return ('dyn', parts)
+
+class _ExprParser(object):
+    """Pratt parser turning an AHK expression into a tuple tree."""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None
+
+    def take(self, text=None):
+        token = self.peek()
+        if token is None or (text is not None and token.text != text):
+            raise SimulatedError("Expected {0!r} in expression: {1}".format(
+                text, self.text))
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.expression(0)
+        if self.peek() is not None:
+            raise SimulatedError("Unexpected {0!r} in expression: {1}".format(
+                self.peek().text, self.text))
+        return node
+
+    def expression(self, rbp):
+        node = self.prefix()
+        while True:
+            token = self.peek()
+            if token is None:
+                return node
+            kind, text = token.kind, token.text
+            if kind == 'op' and text in _ASSIGN_OPS:
+                if rbp >= 2:
+                    return node
+                if node[0] not in ('var', 'dyn'):
+                    raise SimulatedError("Invalid assignment: " + self.text)
+                self.pos += 1
+                node = ('assign', text, node, self.expression(1))
+            elif kind == 'op' and text == ',':
+                if rbp >= 1:
+                    return node
+                self.pos += 1
+                node = ('seq', node, self.expression(1))
+            elif kind == 'op' and text == '?':
+                if rbp >= 3:
+                    return node
+                self.pos += 1
+                then = self.expression(1)
+                self.take(':')
+                node = ('tern', node, then, self.expression(2))
+            elif kind == 'op' and text in ('++', '--') and not token.space:
+                self.pos += 1
+                node = ('post', text, node)
+            elif kind == 'op' and text in _BINARY:
+                bp = _BINARY[text]
+                if bp <= rbp:
+                    return node
+                self.pos += 1
+                # ** is right associative
+                right = self.expression(bp - 1 if text == '**' else bp)
+                if text in ('&&', 'and'):
+                    node = ('and', node, right)
+                elif text in ('||', 'or'):
+                    node = ('or', node, right)
+                else:
+                    node = ('bin', text, node, right)
+            elif kind in ('num', 'str', 'name') or text == '(':
+                # Implicit concatenation of adjacent operands
+                if _CONCAT <= rbp:
+                    return node
+                node = ('bin', '.', node, self.expression(_CONCAT))
+            else:
+                return node
+
+    def prefix(self):
+        token = self.take()
+        kind, text = token.kind, token.text
+        if kind == 'num':
+            return ('const', _to_number(text))
+        if kind == 'str':
+            return ('const', _unescape(text[1:-1].replace('""', '"')))
+        if kind == 'name':
+            nxt = self.peek()
+            if nxt is not None and nxt.text == '(' and not nxt.space:
+                self.pos += 1
+                args = []
+                if self.peek() is not None and self.peek().text == ')':
+                    self.pos += 1
+                else:
+                    while True:
+                        args.append(self.expression(1))
+                        if self.take().text == ')':
+                            break
+                return ('call', text.lower(), args)
+            if text.lower() == 'true':
+                return ('const', 1)
+            if text.lower() == 'false':
+                return ('const', 0)
+            return _name_node(text)
+        if text == '(':
+            node = self.expression(0)
+            self.take(')')
+            return node
+        if text == 'not':
+            return ('not', self.expression(6))
+        if text == '!':
+            return ('not', self.expression(16))
+        if text == '-':
+            return ('neg', self.expression(16))
+        if text == '+':
+            return self.expression(16)
+        if text == '~':
+            return ('bnot', self.expression(16))
+        if text in ('++', '--'):
+            return ('pre', text, self.expression(18))
+        raise SimulatedError("Unexpected {0!r} in expression: {1}".format(
+            text, self.text))
+
+_expr_cache = {}
+def _parse_expression(text):
+    """Parse (and cache) an expression."""
+    node = _expr_cache.get(text)
+    if node is None:
+        node = _ExprParser(text).parse()
+        if len(_expr_cache) > 2048:
+            _expr_cache.clear()
+        _expr_cache[text] = node
+    return node
+
+def _arith(op, left, right):
+    """Apply an arithmetic/bitwise operator following AHK rules."""
+    a, b = _to_number(left), _to_number(right)
+    if a is None or b is None:
+        return "" # Non-numeric input yields an empty result
+    if op == '+':
+        return a + b
+    if op == '-':
+        return a - b
+    if op == '*':
+        return a * b
+    if op == '/':
+        if b == 0:
+            return ""
+        return a / b
+    if op == '//':
+        if b == 0:
+            return ""
+        result = a // b
+        return int(result) if isinstance(a, int) and isinstance(b, int) else result
+    if op == '**':
+        return a ** b
+    a, b = int(a), int(b)
+    if op == '|':
+        return a | b
+    if op == '&':
+        return a & b
+    if op == '^':
+        return a ^ b
+    if op == '<<':
+        return a << b
+    return a >> b
+
+def _compare(op, left, right):
+    """Apply a comparison operator following AHK rules."""
+    a, b = _to_number(left), _to_number(right)
+    if a is None or b is None:
+        a, b = _to_str(left), _to_str(right)
+        if op != '==':
+            a, b = a.lower(), b.lower()
+    if op in ('=', '=='):
+        return int(a == b)
+    if op in ('!=', '<>'):
+        return int(a != b)
+    if op == '<':
+        return int(a < b)
+    if op == '>':
+        return int(a > b)
+    if op == '<=':
+        return int(a <= b)
+    return int(a >= b)
+
+#---- Script lines -------------------------------------------------------------
+
+class _Line(object):
+    """A parsed line of script."""
+    __slots__ = ('kind', 'name', 'args', 'node', 'text')
+
+    def __init__(self, kind, text, name=None, args=None, node=None):
+        self.kind = kind
+        self.text = text
+        self.name = name
+        self.args = args
+        self.node = node
+
+class _Chunk(object):
+    """A list of lines plus the block structure between them."""
+
+    def __init__(self):
+        self.lines = []
+        self.end = [] # Index after the statement starting at each line
+        self.body = [] # Index after the body of if statements
+
+    def extend(self, lines):
+        """Append lines, returning the index of the first one."""
+        first = len(self.lines)
+        self.lines.extend(lines)
+        count = len(self.lines)
+        self.end.extend([0] * len(lines))
+        self.body.extend([0] * len(lines))
+        # Match braces
+        match = {}
+        stack = []
+        for i in range(first, count):
+            if self.lines[i].kind == '{':
+                stack.append(i)
+            elif self.lines[i].kind == '}':
+                if not stack:
+                    raise SimulatedError("Unmatched close brace")
+                match[stack.pop()] = i
+        if stack:
+            raise SimulatedError("Missing close brace")
+        # Statement extents, computed from the bottom up
+        for i in range(count - 1, first - 1, -1):
+            kind = self.lines[i].kind
+            nxt = self.end[i + 1] if i + 1 < count else count
+            if kind == '{':
+                self.end[i] = match[i] + 1
+            elif kind in ('if', 'ifcmd', 'else', 'loop', 'while', 'func'):
+                self.end[i] = self.body[i] = nxt
+                if kind in ('if', 'ifcmd') and nxt < count and \
+                        self.lines[nxt].kind == 'else':
+                    self.end[i] = self.end[nxt]
+            else:
+                self.end[i] = i + 1
+        return first
+
+class _Function(object):
+    """A user defined function."""
+
+    def __init__(self, name, params, chunk, start, stop, address):
+        self.name = name
+        self.params = params # [(name, default_node or None)]
+        self.chunk = chunk
+        self.start = start
+        self.stop = stop
+        self.address = address
+        self.statics = {}
+
+class _Frame(object):
+    """Local variable scope of a running function."""
+
+    def __init__(self, func):
+        self.func = func
+        self.locals = {}
+        self.globals = set()
+        self.assume_global = False
+
+class _Return(Exception):
+    def __init__(self, value=""):
+        Exception.__init__(self)
+        self.value = value
+
+class _Exit(Exception):
+    pass
+
+class _Break(Exception):
+    pass
+
+class _Continue(Exception):
+    pass
+
+# Name: (max parameters, handler method)
+_COMMANDS = {
+    'msgbox': (4, '_cmd_msgbox'),
+    'sort': (2, '_cmd_sort'),
+    'send': (1, '_cmd_send'),
+    'sendraw': (1, '_cmd_send'),
+    'sendinput': (1, '_cmd_send'),
+    'sendplay': (1, '_cmd_send'),
+    'sendevent': (1, '_cmd_send'),
+    'click': (6, '_cmd_click'),
+    'mousemove': (4, '_cmd_mousemove'),
+    'winactivate': (4, '_cmd_winactivate'),
+    'winactivatebottom': (4, '_cmd_winactivate'),
+    'winclose': (5, '_cmd_winclose'),
+    'winwait': (5, '_cmd_winwait'),
+    'winwaitclose': (5, '_cmd_winwait'),
+    'winwaitactive': (5, '_cmd_winwait'),
+    'winwaitnotactive': (5, '_cmd_winwait'),
+    'winget': (6, '_cmd_winget'),
+    'wingettitle': (5, '_cmd_wingettitle'),
+    'wingetclass': (5, '_cmd_wingetclass'),
+    'wingettext': (5, '_cmd_wingettext'),
+    'wingetpos': (8, '_cmd_wingetpos'),
+    'coordmode': (2, '_cmd_coordmode'),
+    'pixelgetcolor': (4, '_cmd_pixelgetcolor'),
+    'controlclick': (8, '_cmd_controlclick'),
+    'controlsend': (6, '_cmd_controlsend'),
+    'controlsendraw': (6, '_cmd_controlsend'),
+    'controlsettext': (6, '_cmd_controlsettext'),
+    'controlgettext': (6, '_cmd_controlgettext'),
+    'controlget': (8, '_cmd_controlget'),
+    'control': (7, '_cmd_control'),
+    'setcontroldelay': (1, '_cmd_setting'),
+    'setkeydelay': (3, '_cmd_setting'),
+    'setmousedelay': (2, '_cmd_setting'),
+    'setwindelay': (1, '_cmd_setting'),
+    'settitlematchmode': (1, '_cmd_setting'),
+    'sendmode': (1, '_cmd_setting'),
+    'sleep': (1, '_cmd_sleep'),
+    'gosub': (1, '_cmd_gosub'),
+    'settimer': (3, '_cmd_settimer'),
+    'exitapp': (1, '_cmd_exit'),
+    'exit': (1, '_cmd_exit'),
+}
+
+# Commands used as the condition of an if statement
+_IF_COMMANDS = {
+    'ifmsgbox': 1,
+    'ifwinexist': 4,
+    'ifwinnotexist': 4,
+    'ifwinactive': 4,
+    'ifwinnotactive': 4,
+    'ifequal': 2,
+    'ifnotequal': 2,
+    'ifinstring': 2,
+    'ifnotinstring': 2,
+}
+
+_LABEL = re.compile(r'^([^\s,:`%(){}]+):$')
+_FUNCDEF = re.compile(r'^([\w#@$]+)\(([^()]*)\)\s*(\{)?$')
+_ASSIGN = re.compile(r'^([\w#@$%]+)\s*(\+\+|--|:=|\+=|-=|\*=|//=|/=|\.=|\|=|&=|\^=|>>=|<<=)')
+_LEGACY = re.compile(r'^([\w#@$%]+)\s*=(?!=)\s*(.*)$', re.S)
+_COMMAND = re.compile(r'^([\w#]+)(?:$|\s*,\s*|\s+)')
+_LEGACY_IF = re.compile(r'^([\w#@$]+)\s*(=|==|<>|!=|>=|<=|>|<)\s*(.*)$')
+
+def _strip_comment(line):
+    """Remove a trailing ; comment (the semicolon must follow whitespace)."""
+    if line.startswith(';'):
+        return ''
+    pos = line.find(';')
+    while pos > 0:
+        if line[pos - 1] in ' \t' and (pos < 2 or line[pos - 2] != '`'):
+            return line[:pos].rstrip()
+        pos = line.find(';', pos + 1)
+    return line
+
+def _split_args(text, count):
+    """Split command arguments at un-escaped commas.
+
+    Commas beyond the command's parameter count belong to the last argument.
+    Forced expressions (``% expr``) may contain commas inside quotes/parens.
+    """
+    args = []
+    current = []
+    depth, quoted, expr = 0, False, None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if expr is None:
+            expr = char == '%' and text[i + 1:i + 2] in (' ', '\t')
+        if char == '`' and not expr:
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if expr:
+            if char == '"':
+                quoted = not quoted
+            elif not quoted and char == '(':
+                depth += 1
+            elif not quoted and char == ')':
+                depth -= 1
+        if char == ',' and depth == 0 and not quoted and len(args) < count - 1:
+            args.append(''.join(current))
+            current, expr = [], None
+        else:
+            current.append(char)
+        i += 1
+    args.append(''.join(current))
+    return args
+
+def _parse_arg(text):
+    """Parse a single command argument.
+
+    :returns: ('expr', node) for forced expressions, else ('text', parts) with
+        parts a list of strings and ('var', name) dereferences.
+    """
+    text = text.strip(' \t')
+    if text[:2] in ('% ', '%\t'):
+        return ('expr', _parse_expression(text[2:]))
+    parts = []
+    current = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '`' and i + 1 < len(text):
+            current.append(_ESCAPES.get(text[i + 1], text[i + 1]))
+            i += 2
+            continue
+        if char == '%':
+            close = text.find('%', i + 1)
+            if close > i + 1:
+                if current:
+                    parts.append(''.join(current))
+                    current = []
+                parts.append(('var', text[i + 1:close].lower()))
+                i = close + 1
+                continue
+        current.append(char)
+        i += 1
+    if current:
+        parts.append(''.join(current))
+    return ('text', parts)
+
+def _parse_params(text):
+    """Parse a function parameter list definition."""
+    params = []
+    for param in text.split(','):
+        param = param.strip()
+        if not param:
+            continue
+        if param.lower().startswith('byref '):
+            param = param[6:].strip()
+        default = None
+        match = re.match(r'^([\w#@$]+)\s*(?::=|=)\s*(.*)$', param)
+        if match:
+            param, default = match.group(1), _parse_expression(match.group(2))
+        params.append((param.rstrip('*').lower(), default))
+    return params
+
+def _logical_lines(text):
+    """Split script text into stripped lines without comments."""
+    lines = []
+    comment = False
+    for line in text.replace('\r\n', '\n').split('\n'):
+        line = line.strip()
+        if comment:
+            if line.startswith('*/'):
+                comment = False
+            continue
+        if line.startswith('/*'):
+            comment = True
+            continue
+        line = _strip_comment(line)
+        if line:
+            lines.append(line)
+    return lines
+
+class _Parser(object):
+    """Parses script text into _Line objects."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def parse(self, text):
+        """:returns: (lines, functions) with functions a list of
+        (name, params, line index of the definition)."""
+        raw = _logical_lines(text)
+        self.lines = []
+        self.funcs = []
+        for i, line in enumerate(raw):
+            nxt = raw[i + 1] if i + 1 < len(raw) else ''
+            self.line(line, nxt)
+        return self.lines, self.funcs
+
+    def emit(self, kind, text, **kwargs):
+        self.lines.append(_Line(kind, text, **kwargs))
+
+    def line(self, text, nxt):
+        # Leading close brace (e.g. "} else {")
+        if text.startswith('}'):
+            self.emit('}', '}')
+            text = text[1:].strip()
+            if not text:
+                return
+        if text == '{':
+            self.emit('{', text)
+            return
+        lower = text.lower()
+        # Function definitions
+        match = _FUNCDEF.match(text)
+        if match and (match.group(3) or nxt.startswith('{')):
+            name = match.group(1).lower()
+            self.funcs.append((name, _parse_params(match.group(2)),
+                               len(self.lines)))
+            self.emit('func', text, name=name)
+            if match.group(3):
+                self.emit('{', '{')
+            return
+        # Open brace at end of line (One True Brace style)
+        brace = False
+        if text.endswith('{') and re.match(r'^(if|else|loop|while)\b', lower):
+            text, brace = text[:-1].rstrip(), True
+            lower = text.lower()
+        self.statement(text, lower)
+        if brace:
+            self.emit('{', '{')
+
+    def statement(self, text, lower):
+        if lower == 'else' or lower.startswith(('else ', 'else,', 'else\t')):
+            self.emit('else', text)
+            rest = text[4:].lstrip(' \t,')
+            if rest:
+                self.statement(rest, rest.lower())
+            return
+        if _LABEL.match(text):
+            self.emit('label', text, name=text[:-1].lower())
+            return
+        if '::' in text or text.startswith('#'):
+            self.emit('nop', text) # Hotkeys and directives are ignored
+            return
+        if lower.startswith('if') and (len(lower) == 2 or lower[2] in ' \t('):
+            self.if_statement(text[2:].strip())
+            return
+        match = _ASSIGN.match(text)
+        if match and match.group(2) in ('++', '--') and match.end(1) < len(text) \
+                and text[match.end(1)] in ' \t':
+            match = None # e.g. "return ++x"
+        if match or text.startswith(('++', '--')):
+            self.emit('expr', text, node=_parse_expression(text))
+            return
+        match = _LEGACY.match(text)
+        if match:
+            self.emit('assign', text, name=_name_node(match.group(1)),
+                      args=_parse_arg(match.group(2)))
+            return
+        match = _COMMAND.match(text)
+        if match:
+            name = match.group(1).lower()
+            rest = text[match.end():]
+            if name in ('return', 'break', 'continue'):
+                node = _parse_expression(rest) if rest.strip() else None
+                self.emit(name, text, node=node)
+                return
+            if name in ('global', 'local', 'static'):
+                self.emit('decl', text, name=name, args=[
+                    arg.strip() for arg in _split_args(rest, 1000)
+                    if arg.strip()])
+                return
+            if name == 'loop':
+                self.loop(text, rest)
+                return
+            if name == 'while':
+                self.emit('while', text, node=_parse_expression(rest))
+                return
+            if name in _IF_COMMANDS:
+                args = _split_args(rest, _IF_COMMANDS[name])
+                self.emit('ifcmd', text, name=name,
+                          args=[_parse_arg(arg) for arg in args])
+                return
+            if name in _COMMANDS:
+                count, handler = _COMMANDS[name]
+                args = _split_args(rest, count) if rest else []
+                self.emit('cmd', text, name=handler,
+                          args=[name] + [_parse_arg(arg) for arg in args])
+                return
+        if re.match(r'^[\w#@$]+\(', text):
+            self.emit('expr', text, node=_parse_expression(text))
+            return
+        raise SimulatedError("Unsupported command or syntax: " + text)
+
+    def if_statement(self, cond):
+        if cond.startswith('('):
+            self.emit('if', cond, node=_parse_expression(cond))
+            return
+        match = _LEGACY_IF.match(cond)
+        if match:
+            node = ('bin', match.group(2), ('var', match.group(1).lower()),
+                    ('text', _parse_arg(match.group(3))))
+            self.emit('if', cond, node=node)
+            return
+        self.emit('if', cond, node=_parse_expression(cond))
+
+    def loop(self, text, rest):
+        args = _split_args(rest, 4) if rest.strip() else []
+        if args and args[0].strip().lower() == 'parse':
+            self.emit('loop', text, name='parse',
+                      args=[_parse_arg(arg) for arg in args[1:]])
+        else:
+            count = _parse_arg(args[0]) if args and args[0].strip() else None
+            self.emit('loop', text, name='count', args=count)
+
+#---- The engine ---------------------------------------------------------------
+
+_LINE_BASE = 0x400000
+_LINE_SIZE = 0x40
+_FUNC_BASE = 0x800000
+
+def _omit_blanks(args):
+    """Like ahkFunction, treat trailing empty parameters as omitted."""
+    args = list(args)
+    while args and args[-1] == "":
+        args.pop()
+    return args
+
+class _Timer(object):
+    """A SetTimer timer, running its label or function on a thread."""
+
+    def __init__(self, engine, target, period):
+        self.period = period
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=engine._timer_loop,
+                                       args=(self, target),
+                                       name="ahk-timer-" + target)
+        self.thread.daemon = True
+        self.thread.start()
+
+class _Event(object):
+    """Python side of an event the engine sets with DllCall("SetEvent")."""
+
+    def __init__(self, backend, handle):
+        self._backend = backend
+        self._event = threading.Event()
+        self.handle = handle
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def set(self):
+        self._event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    def close(self):
+        self._backend._events.pop(self.handle, None)
+
+# Thread handles, unique across backends like real thread handles
+_handles = itertools.count(0x1004, 4)
+
+class SimulatedBackend(Backend):
+    """Pure Python backend simulating an AutoHotkey engine.
+
+    Beyond the :class:`ahk.Backend` interface the following attributes are
+    useful for tests:
+
+        * ``desktop`` - The :class:`Desktop` acted on by commands.
+        * ``startup_delay`` - Seconds between start and ready.
+        * ``crossings`` - Count of calls made into the engine.
+    """
+
+    def __init__(self, desktop=None, startup_delay=0):
+        """
+        :param desktop: The windowing environment to act on.
+        :type desktop: Desktop or None (default creates a new Desktop)
+        :param startup_delay: Seconds after start before the engine is ready.
+        :type startup_delay: float (default=0)
+        """
+        self.desktop = desktop if desktop is not None else Desktop()
+        self.startup_delay = startup_delay
+        self.crossings = 0
+        self._lock = threading.RLock()
+        self._parser = _Parser(self)
+        self._exec_cache = {}
+        self._running = False
+        self._started = 0
+        self._paused = False
+        self._source = ("", None)
+        self._handle = 0
+        self._timers = {}
+        self._events = {}
+        self._next_event = 0x200
+        self._reset()
+
+    def _reset(self):
+        """Clear all script state."""
+        for timer in self._timers.values():
+            timer.stopped.set()
+        self._timers = {}
+        self._globals = {'errorlevel': 0}
+        self._program = _Chunk()
+        self._funcs = {}
+        self._labels = {}
+        self._frame = None
+        self._loops = []
+        self._exec_cache.clear()
+        self._last_found = None
+        self._msgbox_result = ""
+        self._settings = {
+            'setcontroldelay': 20, 'setkeydelay': 10, 'setmousedelay': 10,
+            'setwindelay': 100, 'settitlematchmode': 1, 'sendmode': 'Event',
+            'coordmode': {},
+        }
+
+    #---- Loading
+
+    def _load(self, text, chunk):
+        """Parse text into chunk, registering functions and labels.
+
+        :returns: Index of the first added line.
+        """
+        lines, funcs = self._parser.parse(text)
+        first = chunk.extend(lines)
+        for name, params, index in funcs:
+            start = first + index + 1
+            address = _FUNC_BASE + len(self._funcs) * _LINE_SIZE
+            old = self._funcs.get(name)
+            if old is not None:
+                address = old.address
+            self._funcs[name] = _Function(name, params, chunk, start,
+                                          chunk.end[start], address)
+        if chunk is self._program:
+            for i in range(first, len(chunk.lines)):
+                if chunk.lines[i].kind == 'label':
+                    self._labels.setdefault(chunk.lines[i].name, i)
+        return first
+
+    def _address(self, index):
+        return _LINE_BASE + index * _LINE_SIZE
+
+    def _index(self, address):
+        index, rem = divmod(int(address) - _LINE_BASE, _LINE_SIZE)
+        if rem or not 0 <= index < len(self._program.lines):
+            raise SimulatedError("Invalid line address {0}".format(address))
+        return index
+
+    def _auto_execute(self, first):
+        """Run from first until return/exit."""
+        try:
+            self._run(self._program, first, len(self._program.lines))
+        except (_Return, _Exit):
+            pass
+
+    #---- Backend interface
+
+    def start(self, filename=None, script="", options="", params=""):
+        with self._lock:
+            self.crossings += 1
+            if filename:
+                with open(filename) as src:
+                    script = src.read()
+            self._source = (script, filename)
+            self._reset()
+            self._running = True
+            self._paused = False
+            self._started = time.time()
+            self._handle = next(_handles)
+            # There is always an implicit Exit line at the start
+            self._program.extend([_Line('nop', 'Exit')])
+            try:
+                self._auto_execute(self._load(script, self._program))
+            except SimulatedError:
+                self._running = False
+                return 0
+            return self._handle
+
+    def ready(self):
+        self.crossings += 1
+        if not self._running:
+            return False
+        return time.time() - self._started >= self.startup_delay
+
+    def add_file(self, filename, duplicates, ignore):
+        with self._lock:
+            self.crossings += 1
+            with open(filename) as src:
+                text = src.read()
+            try:
+                return self._address(self._load(text, self._program))
+            except SimulatedError:
+                return 0
+
+    def add_script(self, script):
+        with self._lock:
+            self.crossings += 1
+            if not self._running:
+                return 0
+            try:
+                first = self._load(script, self._program)
+                self._auto_execute(first)
+            except SimulatedError:
+                return 0
+            return self._address(first)
+
+    def execute(self, script):
+        with self._lock:
+            self.crossings += 1
+            if not self._running:
+                return False
+            try:
+                chunk = self._exec_cache.get(script)
+                if chunk is None:
+                    chunk = _Chunk()
+                    self._load(script, chunk)
+                    if len(self._exec_cache) > 512:
+                        self._exec_cache.clear()
+                    self._exec_cache[script] = chunk
+                self._run(chunk, 0, len(chunk.lines))
+            except (_Return, _Exit):
+                pass
+            except SimulatedError:
+                return False
+            return True
+
+    def jump(self, label, nowait):
+        with self._lock:
+            self.crossings += 1
+            index = self._labels.get(label.lower())
+            if not self._running or index is None:
+                return False
+            try:
+                self._auto_execute(index + 1)
+            except SimulatedError:
+                pass
+            return True
+
+    def call(self, func, args):
+        with self._lock:
+            self.crossings += 1
+            if not self._running or func.lower() not in self._funcs:
+                return ""
+            try:
+                return _to_str(self._call(func.lower(), _omit_blanks(args)))
+            except (_Exit, SimulatedError):
+                return ""
+
+    def post(self, func, args):
+        with self._lock:
+            self.crossings += 1
+            if not self._running or func.lower() not in self._funcs:
+                return False
+            try:
+                self._call(func.lower(), _omit_blanks(args))
+            except (_Exit, SimulatedError):
+                pass
+            return True
+
+    def set(self, name, value):
+        with self._lock:
+            self.crossings += 1
+            if not self._running:
+                return False
+            try:
+                self._setvar(name.lower(), value)
+            except SimulatedError:
+                return False
+            return True
+
+    def get(self, name, pointer=False):
+        with self._lock:
+            self.crossings += 1
+            value = ""
+            if self._running:
+                value = _to_str(self._getvar(name.lower()))
+            if pointer:
+                return ctypes.c_wchar_p(value)
+            return value
+
+    def terminate(self, timeout):
+        with self._lock:
+            self.crossings += 1
+            self._running = False
+            self._reset()
+
+    def reload(self):
+        with self._lock:
+            self.crossings += 1
+            script, filename = self._source
+            self.start(filename, script)
+
+    def find_func(self, name):
+        self.crossings += 1
+        func = self._funcs.get(name.lower())
+        if not self._running or func is None:
+            return 0
+        return func.address
+
+    def find_label(self, name):
+        self.crossings += 1
+        index = self._labels.get(name.lower())
+        if not self._running or index is None:
+            return 0
+        return self._address(index)
+
+    def pause(self, state):
+        self.crossings += 1
+        if state != "":
+            self._paused = bool(state)
+        return self._paused
+
+    def is_window(self, hwnd, active=False):
+        # Python side check, not counted as a crossing
+        if active:
+            return self.desktop.active == hwnd
+        return self.desktop.window(hwnd) is not None
+
+    def create_event(self):
+        # Python side, not counted as a crossing
+        with self._lock:
+            event = _Event(self, self._next_event)
+            self._next_event += 4
+            self._events[event.handle] = event
+        return event
+
+    def exec_line(self, line, mode, wait):
+        with self._lock:
+            self.crossings += 1
+            if not self._running:
+                return 0
+            if not line:
+                return self._address(0)
+            program = self._program
+            try:
+                index = self._index(line)
+                stop = program.end[index]
+                if mode == 0:
+                    pass
+                elif mode == 3:
+                    self._run(program, index, stop)
+                else:
+                    stop = len(program.lines)
+                    if mode == 2: # Until the end of the enclosing block
+                        depth = 0
+                        for i in range(index, stop):
+                            kind = program.lines[i].kind
+                            depth += {'{': 1, '}': -1}.get(kind, 0)
+                            if depth < 0:
+                                stop = i
+                                break
+                    self._run(program, index, stop)
+            except (_Return, _Exit):
+                pass
+            except SimulatedError:
+                return 0
+            if stop >= len(program.lines):
+                return 0
+            return self._address(stop)
+
+    #---- Execution
+
+    def _run(self, chunk, i, stop):
+        """Execute the statements of chunk from index i to stop."""
+        lines, end = chunk.lines, chunk.end
+        while i < stop:
+            line = lines[i]
+            kind = line.kind
+            if kind == 'cmd':
+                getattr(self, line.name)(line.args[0], [
+                    self._arg(arg) for arg in line.args[1:]])
+                i += 1
+            elif kind == 'expr':
+                self._eval(line.node)
+                i += 1
+            elif kind == 'assign':
+                self._assign(line.name, self._arg(line.args).strip())
+                i += 1
+            elif kind in ('if', 'ifcmd'):
+                body = chunk.body[i]
+                if kind == 'if':
+                    taken = _truth(self._eval(line.node))
+                else:
+                    taken = self._if_command(line.name, [
+                        self._arg(arg) for arg in line.args])
+                if taken:
+                    self._run(chunk, i + 1, body)
+                elif body < end[i]: # else branch
+                    self._run(chunk, body + 1, end[i])
+                i = end[i]
+            elif kind in ('else', 'func'):
+                i = end[i]
+            elif kind in ('loop', 'while'):
+                self._loop(chunk, line, i + 1, end[i])
+                i = end[i]
+            elif kind == 'return':
+                value = ""
+                if line.node is not None:
+                    value = self._eval(line.node)
+                raise _Return(value)
+            elif kind == 'break':
+                raise _Break()
+            elif kind == 'continue':
+                raise _Continue()
+            elif kind == 'decl':
+                self._declare(line.name, line.args)
+                i += 1
+            else:
+                i += 1
+
+    def _loop(self, chunk, line, start, stop):
+        """Run a Loop or While statement."""
+        fields = None
+        count = None
+        if line.kind == 'loop' and line.name == 'parse':
+            args = [self._arg(arg) for arg in line.args] + ['', '']
+            value = _to_str(self._getvar(args[0].strip().lower()))
+            delims, omit = args[1], args[2]
+            if delims.lower() == 'csv':
+                fields = value.split(',')
+            elif delims:
+                fields = re.split('[' + re.escape(delims) + ']', value)
+            else:
+                fields = list(value)
+            fields = [field.strip(omit) for field in fields] if omit else fields
+            count = len(fields)
+        elif line.kind == 'loop' and line.args is not None:
+            count = _to_number(self._arg(line.args))
+            if count is None:
+                count = 0
+        state = [0, ""]
+        self._loops.append(state)
+        try:
+            while True:
+                state[0] += 1
+                if count is not None and state[0] > count:
+                    break
+                if fields is not None:
+                    state[1] = fields[state[0] - 1]
+                if line.kind == 'while' and not _truth(self._eval(line.node)):
+                    break
+                try:
+                    self._run(chunk, start, stop)
+                except _Break:
+                    break
+                except _Continue:
+                    continue
+        finally:
+            self._loops.pop()
+
+    def _declare(self, kind, names):
+        """Handle global/local/static declarations."""
+        frame = self._frame
+        if frame is None:
+            return
+        if not names and kind == 'global':
+            frame.assume_global = True
+            return
+        for decl in names:
+            match = re.match(r'^([\w#@$]+)\s*(?::=\s*(.*))?$', decl)
+            if not match:
+                raise SimulatedError("Invalid declaration: " + decl)
+            name = match.group(1).lower()
+            if kind == 'global':
+                frame.globals.add(name)
+            elif kind == 'static':
+                frame.func.statics.setdefault(name, "")
+            else:
+                frame.locals.setdefault(name, "")
+            if match.group(2) is not None:
+                if kind == 'static' and frame.func.statics[name] != "":
+                    continue
+                self._setvar(name, self._eval(_parse_expression(match.group(2))))
+
+    def _arg(self, arg):
+        """Evaluate a parsed command argument to a string."""
+        if arg[0] == 'expr':
+            return _to_str(self._eval(arg[1]))
+        parts = arg[1]
+        if len(parts) == 1 and not isinstance(parts[0], tuple):
+            return parts[0]
+        return ''.join(_to_str(self._getvar(part[1])) if isinstance(part, tuple)
+                       else part for part in parts)
+
+    #---- Variables
+
+    def _scope(self, name):
+        """:returns: The dict holding variable name."""
+        frame = self._frame
+        if frame is None or name in frame.locals:
+            return self._globals if frame is None else frame.locals
+        if name in frame.func.statics:
+            return frame.func.statics
+        if frame.assume_global or name in frame.globals or name == 'errorlevel':
+            return self._globals
+        return frame.locals
+
+    def _getvar(self, name):
+        if name.startswith('a_') or name == 'clipboard':
+            return self._builtin(name)
+        return self._scope(name).get(name, "")
+
+    def _setvar(self, name, value):
+        if name == 'clipboard':
+            self.desktop.clipboard = _to_str(value)
+            return
+        if name.startswith('a_'):
+            raise SimulatedError("Read-only variable: " + name)
+        if not name or not re.match(r'^[\w#@$]+$', name):
+            raise SimulatedError("Invalid variable name: " + name)
+        self._scope(name)[name] = value
+
+    def _builtin(self, name):
+        """Value of built-in A_ variables."""
+        if name == 'clipboard':
+            return self.desktop.clipboard
+        if name == 'a_index':
+            return self._loops[-1][0] if self._loops else 0
+        if name == 'a_loopfield':
+            return self._loops[-1][1] if self._loops else ""
+        if name == 'a_tickcount':
+            return int(time.time() * 1000) & 0xFFFFFFFF
+        if name == 'a_controldelay':
+            return self._settings['setcontroldelay']
+        if name == 'a_keydelay':
+            return self._settings['setkeydelay']
+        if name == 'a_mousedelay':
+            return self._settings['setmousedelay']
+        if name == 'a_windelay':
+            return self._settings['setwindelay']
+        if name == 'a_titlematchmode':
+            return self._settings['settitlematchmode']
+        if name == 'a_screenwidth':
+            return self.desktop.width
+        if name == 'a_screenheight':
+            return self.desktop.height
+        if name == 'a_space':
+            return " "
+        if name == 'a_tab':
+            return "\t"
+        if name == 'a_isunicode':
+            return 1
+        if name == 'a_ptrsize':
+            return ctypes.sizeof(ctypes.c_void_p)
+        if name == 'a_ahkversion':
+            return "1.1.8.1"
+        if name == 'a_thisfunc':
+            return self._frame.func.name if self._frame else ""
+        return ""
+
+    def _target(self, node):
+        """Resolve a var/dyn node to a variable name."""
+        if node[0] == 'var':
+            return node[1]
+        return ''.join(_to_str(self._getvar(part[1])) if isinstance(part, tuple)
+                       else part for part in node[1]).lower()
+
+    def _assign(self, node, value):
+        self._setvar(self._target(node), value)
+
+    #---- Expressions
+
+    def _eval(self, node):
+        kind = node[0]
+        if kind == 'const':
+            return node[1]
+        if kind == 'var':
+            return self._getvar(node[1])
+        if kind == 'bin':
+            op = node[1]
+            left, right = self._eval(node[2]), self._eval(node[3])
+            if op == '.':
+                return _to_str(left) + _to_str(right)
+            if op in ('=', '==', '!=', '<>', '<', '>', '<=', '>='):
+                return _compare(op, left, right)
+            return _arith(op, left, right)
+        if kind == 'call':
+            return self._call(node[1], [self._eval(arg) for arg in node[2]])
+        if kind == 'assign':
+            op, target = node[1], self._target(node[2])
+            value = self._eval(node[3])
+            if op != ':=':
+                current = self._getvar(target)
+                if op == '.=':
+                    value = _to_str(current) + _to_str(value)
+                else:
+                    if current == "" and op in ('+=', '-='):
+                        current = 0 # Blank counts as zero here
+                    value = _arith(op[:-1], current, value)
+            self._setvar(target, value)
+            return value
+        if kind == 'and':
+            return int(_truth(self._eval(node[1])) and
+                       _truth(self._eval(node[2])))
+        if kind == 'or':
+            return int(_truth(self._eval(node[1])) or
+                       _truth(self._eval(node[2])))
+        if kind == 'not':
+            return int(not _truth(self._eval(node[1])))
+        if kind == 'neg':
+            value = _to_number(self._eval(node[1]))
+            return "" if value is None else -value
+        if kind == 'bnot':
+            value = _to_number(self._eval(node[1]))
+            return "" if value is None else ~int(value)
+        if kind == 'tern':
+            if _truth(self._eval(node[1])):
+                return self._eval(node[2])
+            return self._eval(node[3])
+        if kind in ('pre', 'post'):
+            target = self._target(node[2])
+            old = self._getvar(target)
+            new = _arith(node[1][0], 0 if old == "" else old, 1)
+            self._setvar(target, new)
+            return new if kind == 'pre' else old
+        if kind == 'dyn':
+            return self._getvar(self._target(node))
+        if kind == 'seq':
+            self._eval(node[1])
+            return self._eval(node[2])
+        if kind == 'text': # Literal operand of a legacy if
+            return self._arg(node[1])
+        raise SimulatedError("Bad expression node {0}".format(kind))
+
+    def _call(self, name, args):
+        """Call a user defined or built-in function."""
+        func = self._funcs.get(name)
+        if func is None:
+            builtin = _BUILTINS.get(name)
+            if builtin is None:
+                raise SimulatedError("Call to nonexistent function: " + name)
+            return builtin(self, *args)
+        frame = _Frame(func)
+        for i, (param, default) in enumerate(func.params):
+            if i < len(args):
+                frame.locals[param] = args[i]
+            elif default is not None:
+                frame.locals[param] = self._eval(default)
+            else:
+                frame.locals[param] = ""
+        saved, loops = self._frame, self._loops
+        self._frame, self._loops = frame, []
+        try:
+            self._run(func.chunk, func.start, func.stop)
+        except _Return as ret:
+            return ret.value
+        finally:
+            self._frame, self._loops = saved, loops
+        return ""
+
+    #---- Windows
+
+    def _criteria(self, title, text, extitle, extext):
+        """:returns: List of windows matching the criteria, in z-order."""
+        desktop = self.desktop
+        if not (title or text or extitle or extext):
+            win = desktop.window(self._last_found)
+            return [win] if win is not None else []
+        if title == 'A':
+            win = desktop.window(desktop.active)
+            return [win] if win is not None else []
+        filters = {}
+        def keep(match):
+            filters[match.group(1).lower()] = match.group(2)
+            return ''
+        title = re.sub(r'ahk_(id|class|pid|exe)\s+(\S+)', keep, title,
+                       flags=re.I).strip()
+        mode = _to_str(self._settings['settitlematchmode']).lower()
+        found = []
+        for win in desktop.windows:
+            if 'id' in filters and win.hwnd != _to_number(filters['id']):
+                continue
+            if 'class' in filters and win.cls != filters['class']:
+                continue
+            if 'pid' in filters and win.pid != _to_number(filters['pid']):
+                continue
+            if 'exe' in filters and \
+                    win.process.lower() != filters['exe'].lower():
+                continue
+            if title and not self._title_match(mode, title, win.title):
+                continue
+            if extitle and self._title_match(mode, extitle, win.title):
+                continue
+            if text and text not in win.all_text():
+                continue
+            if extext and extext in win.all_text():
+                continue
+            found.append(win)
+        return found
+
+    def _title_match(self, mode, pattern, title):
+        if mode == '1':
+            return title.startswith(pattern)
+        if mode == '2':
+            return pattern in title
+        if mode == '3':
+            return title == pattern
+        if mode == 'regex':
+            return re.search(pattern, title) is not None
+        return title.startswith(pattern)
+
+    def _find(self, title="", text="", extitle="", extext=""):
+        """:returns: First matching window (updating last found) or None."""
+        found = self._criteria(title, text, extitle, extext)
+        if found:
+            self._last_found = found[0].hwnd
+            return found[0]
+        return None
+
+    def _control(self, control, title, text, extitle, extext):
+        """:returns: (window, control) or raise SimulatedError."""
+        win = self._find(title, text, extitle, extext)
+        if win is None:
+            return None, None
+        if not control:
+            return win, None
+        number = _to_number(control)
+        for ctl in win.controls:
+            if number is not None and id(ctl) == number:
+                return win, ctl
+        return win, win.control(control)
+
+    #---- Commands
+
+    def _if_command(self, name, args):
+        args = args + [''] * 4
+        if name == 'ifmsgbox':
+            return self._msgbox_result.lower() == args[0].strip().lower()
+        if name in ('ifwinexist', 'ifwinnotexist'):
+            found = self._find(*args[:4]) is not None
+            return found if name == 'ifwinexist' else not found
+        if name in ('ifwinactive', 'ifwinnotactive'):
+            win = self._find(*args[:4])
+            active = win is not None and win.hwnd == self.desktop.active
+            return active if name == 'ifwinactive' else not active
+        value = _to_str(self._getvar(args[0].strip().lower()))
+        if name == 'ifequal':
+            return _compare('=', value, args[1])
+        if name == 'ifnotequal':
+            return not _compare('=', value, args[1])
+        contained = args[1].lower() in value.lower()
+        return contained if name == 'ifinstring' else not contained
+
+    def _cmd_msgbox(self, name, args):
+        if len(args) == 1 or _to_number(args[0]) is None:
+            options, title, text, timeout = 0, "", ",".join(args), ""
+        else:
+            options, title, text, timeout = (args + ['', '', ''])[:4]
+        self.desktop.messages.append((text, title, options, timeout))
+        self.desktop.events.append(('msgbox', text, title, options, timeout))
+        if self.desktop.msgbox_responses:
+            self._msgbox_result = self.desktop.msgbox_responses.popleft()
+        else:
+            self._msgbox_result = "OK"
+
+    def _cmd_sort(self, name, args):
+        var = args[0].strip().lower()
+        options = args[1] if len(args) > 1 else ""
+        delim, numeric, reverse, unique, case = '\n', False, False, False, False
+        i = 0
+        while i < len(options):
+            opt = options[i].upper()
+            if opt == 'D':
+                delim = options[i + 1] if i + 1 < len(options) else ','
+                i += 1
+            elif opt == 'N':
+                numeric = True
+            elif opt == 'R':
+                reverse = True
+            elif opt == 'U':
+                unique = True
+            elif opt == 'C':
+                case = True
+            i += 1
+        items = _to_str(self._getvar(var)).split(delim)
+        if numeric:
+            key = lambda item: _to_number(item) or 0
+        elif case:
+            key = None
+        else:
+            key = lambda item: item.lower()
+        items.sort(key=key, reverse=reverse)
+        if unique:
+            seen, kept = set(), []
+            for item in items:
+                if item not in seen:
+                    seen.add(item)
+                    kept.append(item)
+            items = kept
+        self._setvar(var, delim.join(items))
+
+    def _cmd_send(self, name, args):
+        keys = args[0] if args else ""
+        self.desktop.events.append(('send', name, keys, self.desktop.active))
+
+    def _cmd_click(self, name, args):
+        words = " ".join(args).replace(',', ' ').split()
+        button, numbers, flags = "left", [], []
+        for word in words:
+            number = _to_number(word)
+            if number is not None:
+                numbers.append(number)
+            elif word.lower() in ('left', 'l', 'right', 'r', 'middle', 'm',
+                                  'x1', 'x2', 'wheelup', 'wu', 'wheeldown',
+                                  'wd', 'wheelleft', 'wl', 'wheelright', 'wr'):
+                button = word.lower()
+            else:
+                flags.append(word.lower())
+        x, y = self.desktop.mouse
+        if len(numbers) >= 2:
+            x, y = numbers[0], numbers[1]
+            if 'rel' in flags or 'relative' in flags:
+                x, y = self.desktop.mouse[0] + x, self.desktop.mouse[1] + y
+            numbers = numbers[2:]
+        count = numbers[0] if numbers else 1
+        self.desktop.mouse = (x, y)
+        state = 'down' if ('down' in flags or 'd' in flags) else (
+            'up' if ('up' in flags or 'u' in flags) else '')
+        self.desktop.events.append(('click', button, x, y, count, state))
+
+    def _cmd_mousemove(self, name, args):
+        args = args + ['', '', '']
+        x, y = _to_number(args[0]) or 0, _to_number(args[1]) or 0
+        if args[3].strip().upper() == 'R':
+            x, y = self.desktop.mouse[0] + x, self.desktop.mouse[1] + y
+        self.desktop.mouse = (x, y)
+        self.desktop.events.append(('move', x, y))
+
+    def _cmd_winactivate(self, name, args):
+        found = self._criteria(*(args + [''] * 4)[:4])
+        if found:
+            win = found[-1] if name == 'winactivatebottom' else found[0]
+            self._last_found = win.hwnd
+            self.desktop.activate(win.hwnd)
+
+    def _cmd_winclose(self, name, args):
+        args = args + [''] * 5
+        win = self._find(args[0], args[1], args[3], args[4])
+        if win is not None:
+            self.desktop.close_window(win.hwnd)
+
+    def _cmd_winwait(self, name, args):
+        title, text, timeout, extitle, extext = (args + [''] * 5)[:5]
+        criteria = (title, text, extitle, extext)
+        desktop = self.desktop
+        def check():
+            found = self._criteria(*criteria)
+            if name == 'winwait':
+                return bool(found)
+            if name == 'winwaitclose':
+                return not found
+            active = any(win.hwnd == desktop.active for win in found)
+            return active if name == 'winwaitactive' else not active
+        timeout = _to_number(timeout)
+        if timeout is not None:
+            timeout = max(timeout, 0)
+        ok = desktop.wait(check, timeout)
+        if ok and name != 'winwaitclose':
+            found = self._criteria(*criteria)
+            if found:
+                self._last_found = found[0].hwnd
+        self._globals['errorlevel'] = 0 if ok else 1
+
+    def _cmd_winget(self, name, args):
+        out, cmd, title, text, extitle, extext = (args + [''] * 6)[:6]
+        out, cmd = out.strip().lower(), cmd.strip().lower()
+        if cmd in ('list', 'count'):
+            if not (title or text or extitle or extext):
+                found = list(self.desktop.windows)
+            else:
+                found = self._criteria(title, text, extitle, extext)
+            if cmd == 'count':
+                self._setvar(out, len(found))
+                return
+            self._setvar(out, len(found))
+            for i, win in enumerate(found):
+                self._setvar(out + str(i + 1), "0x{0:x}".format(win.hwnd))
+            return
+        win = self._find(title, text, extitle, extext)
+        if win is None:
+            self._setvar(out, "")
+        elif cmd in ('', 'id'):
+            self._setvar(out, "0x{0:x}".format(win.hwnd))
+        elif cmd == 'pid':
+            self._setvar(out, win.pid)
+        elif cmd == 'processname':
+            self._setvar(out, win.process)
+        else:
+            raise SimulatedError("Unsupported WinGet command " + cmd)
+
+    def _cmd_wingettitle(self, name, args):
+        win = self._find(*(args[1:] + [''] * 4)[:4])
+        self._setvar(args[0].strip().lower(), win.title if win else "")
+
+    def _cmd_wingetclass(self, name, args):
+        win = self._find(*(args[1:] + [''] * 4)[:4])
+        self._setvar(args[0].strip().lower(), win.cls if win else "")
+
+    def _cmd_wingettext(self, name, args):
+        win = self._find(*(args[1:] + [''] * 4)[:4])
+        self._setvar(args[0].strip().lower(), win.all_text() if win else "")
+        self._globals['errorlevel'] = 0 if win else 1
+
+    def _cmd_wingetpos(self, name, args):
+        args = args + [''] * 8
+        win = self._find(*args[4:8])
+        pos = win.pos if win else ("", "", "", "")
+        for var, value in zip(args[:4], pos):
+            if var.strip():
+                self._setvar(var.strip().lower(), value)
+
+    def _cmd_coordmode(self, name, args):
+        args = args + ['']
+        self._settings['coordmode'][args[0].strip().lower()] = \
+            args[1].strip().lower() or 'screen'
+
+    def _origin(self, kind):
+        """Offset of coordinates for the given CoordMode target."""
+        mode = self._settings['coordmode'].get(kind, 'relative')
+        if mode == 'screen':
+            return 0, 0
+        win = self.desktop.window(self.desktop.active)
+        if win is None:
+            return 0, 0
+        return win.pos[0], win.pos[1]
+
+    def _cmd_pixelgetcolor(self, name, args):
+        out, x, y, opts = (args + [''] * 4)[:4]
+        dx, dy = self._origin('pixel')
+        r, g, b = self.desktop.get_pixel(int(_to_number(x) or 0) + dx,
+                                         int(_to_number(y) or 0) + dy)
+        if 'rgb' in opts.lower():
+            value = "0x{0:02X}{1:02X}{2:02X}".format(r, g, b)
+        else:
+            value = "0x{0:02X}{1:02X}{2:02X}".format(b, g, r)
+        self._setvar(out.strip().lower(), value)
+        self._globals['errorlevel'] = 0
+
+    def _cmd_controlclick(self, name, args):
+        control, title, text, button, count, options, extitle, extext = (
+            args + [''] * 8)[:8]
+        win = self._find(title, text, extitle, extext)
+        if win is None:
+            self._globals['errorlevel'] = 1
+            return
+        ctl = None if 'pos' in options.lower() else win.control(control)
+        self.desktop.events.append(('controlclick', win.hwnd,
+                                    ctl.classnn if ctl else control,
+                                    button or 'left', _to_number(count) or 1,
+                                    options.strip()))
+        self._globals['errorlevel'] = 0
+
+    def _cmd_controlsend(self, name, args):
+        control, keys, title, text, extitle, extext = (args + [''] * 6)[:6]
+        win, ctl = self._control(control, title, text, extitle, extext)
+        if win is None or (control and ctl is None):
+            self._globals['errorlevel'] = 1
+            return
+        self.desktop.events.append(('controlsend', win.hwnd,
+                                    ctl.classnn if ctl else "", keys,
+                                    name == 'controlsendraw'))
+        self._globals['errorlevel'] = 0
+
+    def _cmd_controlsettext(self, name, args):
+        control, value, title, text, extitle, extext = (args + [''] * 6)[:6]
+        win, ctl = self._control(control, title, text, extitle, extext)
+        if ctl is None:
+            self._globals['errorlevel'] = 1
+            return
+        ctl.text = value
+        self.desktop._notify()
+        self._globals['errorlevel'] = 0
+
+    def _cmd_controlgettext(self, name, args):
+        out, control, title, text, extitle, extext = (args + [''] * 6)[:6]
+        win, ctl = self._control(control, title, text, extitle, extext)
+        self._setvar(out.strip().lower(), ctl.text if ctl else "")
+        self._globals['errorlevel'] = 0 if ctl else 1
+
+    def _cmd_controlget(self, name, args):
+        out, cmd, value, control, title, text, extitle, extext = (
+            args + [''] * 8)[:8]
+        win, ctl = self._control(control, title, text, extitle, extext)
+        out, cmd = out.strip().lower(), cmd.strip().lower()
+        if ctl is None:
+            self._setvar(out, "")
+            self._globals['errorlevel'] = 1
+            return
+        if cmd == 'list':
+            result = "\n".join(ctl.choices)
+        elif cmd == 'choice':
+            result = ctl.choices[ctl.chosen - 1] if ctl.chosen else ""
+        elif cmd == 'checked':
+            result = int(ctl.checked)
+        elif cmd == 'enabled':
+            result = int(ctl.enabled)
+        elif cmd == 'visible':
+            result = int(ctl.visible)
+        elif cmd == 'hwnd':
+            result = "0x{0:x}".format(id(ctl))
+        else:
+            raise SimulatedError("Unsupported ControlGet command " + cmd)
+        self._setvar(out, result)
+        self._globals['errorlevel'] = 0
+
+    def _cmd_control(self, name, args):
+        cmd, value, control, title, text, extitle, extext = (
+            args + [''] * 7)[:7]
+        win, ctl = self._control(control, title, text, extitle, extext)
+        cmd = cmd.strip().lower()
+        if ctl is None:
+            self._globals['errorlevel'] = 1
+            return
+        if cmd in ('check', 'uncheck'):
+            ctl.checked = cmd == 'check'
+        elif cmd in ('enable', 'disable'):
+            ctl.enabled = cmd == 'enable'
+        elif cmd in ('show', 'hide'):
+            ctl.visible = cmd == 'show'
+        elif cmd == 'choose':
+            index = int(_to_number(value) or 0)
+            if not 0 < index <= len(ctl.choices):
+                self._globals['errorlevel'] = 1
+                return
+            ctl.chosen = index
+        elif cmd == 'choosestring':
+            for i, choice in enumerate(ctl.choices):
+                if choice.lower().startswith(value.lower()):
+                    ctl.chosen = i + 1
+                    break
+            else:
+                self._globals['errorlevel'] = 1
+                return
+        else:
+            raise SimulatedError("Unsupported Control command " + cmd)
+        self.desktop._notify()
+        self._globals['errorlevel'] = 0
+
+    def _cmd_setting(self, name, args):
+        value = args[0].strip() if args else ""
+        number = _to_number(value)
+        self._settings[name] = value if number is None else number
+
+    def _cmd_sleep(self, name, args):
+        delay = _to_number(args[0]) if args else 0
+        if delay:
+            time.sleep(delay / 1000.0)
+
+    def _cmd_gosub(self, name, args):
+        index = self._labels.get(args[0].strip().lower())
+        if index is None:
+            raise SimulatedError("Target label does not exist: " + args[0])
+        try:
+            self._run(self._program, index + 1, len(self._program.lines))
+        except _Return:
+            pass
+
+    def _cmd_settimer(self, name, args):
+        target, period = (args + ['', ''])[:2]
+        target, period = target.strip().lower(), period.strip().lower()
+        if target not in self._labels and target not in self._funcs:
+            raise SimulatedError("Target label does not exist: " + target)
+        old = self._timers.pop(target, None)
+        if old is not None:
+            old.stopped.set()
+        if period in ('off', 'delete'):
+            return
+        if period in ('', 'on'):
+            period = old.period if old is not None else 250
+        else:
+            period = int(_to_number(period) or 0) or 250
+        self._timers[target] = _Timer(self, target, period)
+
+    def _timer_loop(self, timer, target):
+        """Run a timer's label or function every period, on its thread."""
+        while not timer.stopped.wait(abs(timer.period) / 1000.0):
+            with self._lock:
+                if timer.stopped.is_set() or not self._running:
+                    return
+                if timer.period < 0: # Run only once
+                    timer.stopped.set()
+                    if self._timers.get(target) is timer:
+                        del self._timers[target]
+                if self._paused:
+                    continue
+                saved, loops = self._frame, self._loops
+                self._frame, self._loops = None, []
+                try:
+                    if target in self._labels:
+                        self._run(self._program, self._labels[target] + 1,
+                                  len(self._program.lines))
+                    else:
+                        self._call(target, [])
+                except (_Return, _Exit, SimulatedError):
+                    pass
+                finally:
+                    self._frame, self._loops = saved, loops
+
+    def _cmd_exit(self, name, args):
+        raise _Exit()
+
+#---- Built-in functions -------------------------------------------------------
+
+def _fn_strlen(engine, text):
+    return len(_units(_to_str(text)))
+
+def _fn_substr(engine, text, start=1, length=None):
+    text = _units(_to_str(text))
+    start = int(_to_number(start) or 0)
+    index = start - 1 if start >= 1 else max(len(text) + start - 1, 0)
+    if length is None or length == "":
+        return _join_units(text[index:])
+    length = int(_to_number(length) or 0)
+    if length < 0:
+        return _join_units(text[index:len(text) + length])
+    return _join_units(text[index:index + length])
+
+def _fn_instr(engine, haystack, needle, case=0, start=1, occurrence=1):
+    haystack, needle = _units(_to_str(haystack)), _units(_to_str(needle))
+    if not _truth(case):
+        haystack, needle = haystack.lower(), needle.lower()
+    start = int(_to_number(start) or 1)
+    pos = -1
+    if start > 0:
+        index = start - 1
+        for _ in range(int(_to_number(occurrence) or 1)):
+            pos = haystack.find(needle, index)
+            if pos < 0:
+                break
+            index = pos + 1
+    else:
+        index = len(haystack) + start
+        pos = haystack.rfind(needle, 0, index + len(needle))
+    return pos + 1
+
+def _fn_strreplace(engine, haystack, search, replace="", limit=-1):
+    limit = int(_to_number(limit) if limit != "" else -1)
+    return _to_str(haystack).replace(_to_str(search), _to_str(replace), limit)
+
+def _fn_round(engine, number, places=0):
+    number = _to_number(number)
+    if number is None:
+        return ""
+    places = int(_to_number(places) or 0)
+    # Halves are rounded away from zero, unlike Python's round
+    scale = 10 ** places
+    rounded = math.floor(abs(number) * scale + 0.5) / scale
+    rounded = -rounded if number < 0 else rounded
+    if places <= 0:
+        return int(rounded)
+    return rounded
+
+def _fn_format(engine, fmt, *args):
+    def field(match):
+        index = match.group(1)
+        spec = match.group(2) or ""
+        if index:
+            field.next = int(index)
+        value = args[field.next - 1] if field.next <= len(args) else ""
+        field.next += 1
+        if spec and spec[-1] in 'dixXeEfgGc':
+            number = _to_number(value)
+            if spec[-1] in 'di':
+                return ("{0:" + spec[:-1] + "d}").format(int(number or 0))
+            return ("{0:" + spec + "}").format(number or 0)
+        return ("{0:" + spec + "}").format(_to_str(value))
+    field.next = 1
+    return re.sub(r'\{(\d*)(?::([^}]*))?\}', field, _to_str(fmt))
+
+def _fn_regexmatch(engine, haystack, pattern, var=None, start=1):
+    flags = 0
+    match = re.match(r'^([imsx]*)\)', _to_str(pattern))
+    pattern = _to_str(pattern)
+    if match:
+        for opt in match.group(1):
+            flags |= {'i': re.I, 'm': re.M, 's': re.S, 'x': re.X}[opt]
+        pattern = pattern[match.end():]
+    found = re.compile(pattern, flags).search(_to_str(haystack),
+                                              int(_to_number(start) or 1) - 1)
+    return found.start() + 1 if found else 0
+
+def _fn_winexist(engine, title="", text="", extitle="", extext=""):
+    win = engine._find(_to_str(title), _to_str(text), _to_str(extitle),
+                       _to_str(extext))
+    return "0x{0:x}".format(win.hwnd if win else 0)
+
+def _fn_winactive(engine, title="", text="", extitle="", extext=""):
+    win = engine._find(_to_str(title), _to_str(text), _to_str(extitle),
+                       _to_str(extext))
+    if win is None or win.hwnd != engine.desktop.active:
+        return "0x0"
+    return "0x{0:x}".format(win.hwnd)
+
+def _number_fn(func):
+    def wrapper(engine, *args):
+        numbers = [_to_number(arg) for arg in args]
+        if None in numbers:
+            return ""
+        return func(*numbers)
+    return wrapper
+
+# DllCall type names -> ctypes types
+_DLL_TYPES = {
+    'int': ctypes.c_int, 'uint': ctypes.c_uint, 'int64': ctypes.c_int64,
+    'short': ctypes.c_short, 'ushort': ctypes.c_ushort,
+    'char': ctypes.c_byte, 'uchar': ctypes.c_ubyte,
+    'ptr': ctypes.c_void_p, 'uptr': ctypes.c_void_p,
+    'str': ctypes.c_wchar_p, 'wstr': ctypes.c_wchar_p,
+    'double': ctypes.c_double, 'float': ctypes.c_float,
+}
+
+def _dll_type(name):
+    name = _to_str(name).strip().lower()
+    if name.startswith('cdecl'):
+        name = name[5:].strip() or 'int'
+    if name not in _DLL_TYPES:
+        raise SimulatedError("Unsupported DllCall type: " + name)
+    return _DLL_TYPES[name]
+
+def _fn_dllcall(engine, func, *args):
+    # Calls to function addresses (e.g. ctypes callbacks) go through ctypes,
+    # of the named functions only the event signalling of
+    # ahk.watch.EngineWatcher is supported.
+    address = _to_number(func)
+    if address is None:
+        name = _to_str(func).split("\\")[-1].lower()
+        if name != 'setevent':
+            raise SimulatedError("Unsupported DllCall: " + _to_str(func))
+        event = engine._events.get(int(_to_number(args[-1]) or 0))
+        if event is None:
+            return 0
+        event._event.set()
+        return 1
+    args = list(args)
+    restype = _dll_type(args.pop()) if len(args) % 2 else ctypes.c_int
+    types = [_dll_type(kind) for kind in args[0::2]]
+    values = []
+    for kind, value in zip(types, args[1::2]):
+        if kind is ctypes.c_wchar_p:
+            values.append(_to_str(value))
+        elif kind in (ctypes.c_double, ctypes.c_float):
+            values.append(float(_to_number(value) or 0))
+        else:
+            values.append(int(_to_number(value) or 0))
+    result = ctypes.CFUNCTYPE(restype, *types)(int(address))(*values)
+    if result is None: # NULL
+        return "" if restype is ctypes.c_wchar_p else 0
+    return result
+
+_BUILTINS = {
+    'strlen': _fn_strlen,
+    'substr': _fn_substr,
+    'instr': _fn_instr,
+    'strreplace': _fn_strreplace,
+    'trim': lambda engine, text, chars=" \t": _to_str(text).strip(chars),
+    'ltrim': lambda engine, text, chars=" \t": _to_str(text).lstrip(chars),
+    'rtrim': lambda engine, text, chars=" \t": _to_str(text).rstrip(chars),
+    'chr': lambda engine, code: chr(int(_to_number(code) or 0)),
+    'ord': lambda engine, text: ord(_to_str(text)[0]) if _to_str(text) else 0,
+    'asc': lambda engine, text: ord(_to_str(text)[0]) if _to_str(text) else 0,
+    'format': _fn_format,
+    'regexmatch': _fn_regexmatch,
+    'isfunc': lambda engine, name: int(_to_str(name).lower() in engine._funcs),
+    'abs': _number_fn(abs),
+    'floor': _number_fn(lambda n: int(n // 1)),
+    'ceil': _number_fn(lambda n: int(-(-n // 1))),
+    'mod': _number_fn(lambda a, b: a - b * int(a / b) if b else ""),
+    'min': _number_fn(min),
+    'max': _number_fn(max),
+    'round': _fn_round,
+    'winexist': _fn_winexist,
+    'winactive': _fn_winactive,
+    'dllcall': _fn_dllcall,
+}
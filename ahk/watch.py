@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Watch many pixels at once.
+
+:meth:`ahk.Script.waitPixel` watches a single pixel. A :class:`PixelWatcher`
+watches any number of conditions, reading all their pixels with one batched
+read per tick (see :meth:`ahk.capture.Capturer.pixels`)::
+
+    watcher = PixelWatcher()
+    ok = watcher.add(100, 200, (0, 255, 0))  # Wait for green
+    busy = watcher.add(300, 10)              # Wait for any change
+    fired = watcher.wait(timeout=30)
+    if fired is not None and fired.index == ok:
+        ...
+
+The poll interval adapts to the screen: it shrinks while the watched
+pixels change and grows while they are still. Times are taken from a
+monotonic clock.
+
+An :class:`EngineWatcher` moves the polling into the engine instead. Its
+conditions are compiled to a function run by ``SetTimer``, which signals
+Python once one fires, so waiting costs no engine calls::
+
+    with EngineWatcher(period=50) as watcher:
+        watcher.window("Save As")
+        watcher.variable("done", 1)
+        fired = watcher.wait(timeout=30)
+"""
+import collections, itertools, time
+
+from ahk import ahk as _ahk
+from ahk import capture as _capture
+from ahk import color as _color
+
+Condition = collections.namedtuple('Condition', ('x', 'y', 'color',
+                                                 'threshold'))
+Condition.__doc__ = """A watched pixel.
+
+The condition fires when the pixel matches `color`, or when it no longer
+matches the color it had when waiting started if `color` is None.
+"""
+
+Fired = collections.namedtuple('Fired', ('index', 'condition', 'color',
+                                         'time', 'elapsed'))
+Fired.__doc__ = """A condition that fired.
+
+`color` is the pixel color read, `time` the monotonic clock time of the read
+and `elapsed` the seconds since waiting started.
+"""
+
+class PixelWatcher(object):
+    """Wait for any of several pixel conditions."""
+
+    def __init__(self, conditions=(), interval=0.05, min_interval=0.01,
+                 max_interval=0.5, capturer=None, engine=None):
+        """
+        :param conditions: Initial conditions, tuples of
+            (x, y[, color[, threshold]]).
+        :type conditions: iterable
+        :param interval: Seconds between the first ticks.
+        :type interval: float (default=0.05)
+        :param min_interval: Shortest interval while pixels change.
+        :type min_interval: float (default=0.01)
+        :param max_interval: Longest interval while pixels are still.
+        :type max_interval: float (default=0.5)
+        :param capturer: Pixel source (default ahk.capture.get_capturer()).
+        :type capturer: ahk.capture.Capturer or None
+        :param engine: The engine to read from (default current).
+        :type engine: ahk.Engine or None
+        """
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.capturer = capturer
+        self._engine = engine or _ahk.current_engine()
+        self.conditions = []
+        self._baseline = []
+        self._previous = None
+        self.ticks = 0
+        for condition in conditions:
+            self.add(*condition)
+
+    def add(self, x, y, color=None, threshold=0.01):
+        """Watch another pixel.
+
+        :param x: The pixel x coordinate (relative to screen).
+        :type x: int
+        :param y: The pixel y coordinate (relative to screen).
+        :type y: int
+        :param color: The color to wait for, None to wait for a change.
+        :type color: tuple(int r, int g, int b) or None
+        :param threshold: Error factor allowed for determining color match.
+        :type threshold: float (default=0.01)
+        :returns: Index of the condition, as reported by :class:`Fired`.
+        """
+        self.conditions.append(Condition(x, y, color and tuple(color),
+                                         threshold))
+        self._baseline.append(None)
+        return len(self.conditions) - 1
+
+    def sample(self):
+        """Read the colors of all watched pixels with one batched read.
+
+        :returns: List of (r, g, b) in the order of the conditions.
+        """
+        with self._engine:
+            capturer = self.capturer or _capture.get_capturer()
+            return capturer.pixels([(c.x, c.y) for c in self.conditions])
+
+    def reset(self):
+        """Take the colors which conditions without a color wait to change
+        from."""
+        colors = self.sample()
+        self._baseline = [color if condition.color is None else None
+                          for condition, color in zip(self.conditions, colors)]
+        self._previous = colors
+
+    def check(self, start=None):
+        """Sample the pixels once and adapt the interval.
+
+        :param start: Clock time waiting started, for :attr:`Fired.elapsed`.
+        :type start: float or None
+        :returns: List of the conditions that fired, as :class:`Fired`.
+        """
+        colors = self.sample()
+        now = _ahk._clock()
+        self.ticks += 1
+        if self._previous is not None and colors != self._previous:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        self._previous = colors
+        fired = []
+        for index, (condition, color) in enumerate(zip(self.conditions,
+                                                       colors)):
+            if condition.color is not None:
+                hit = (_color.delta(condition.color, color) <=
+                       condition.threshold)
+            else:
+                baseline = self._baseline[index]
+                hit = (baseline is not None and
+                       _color.delta(baseline, color) > condition.threshold)
+            if hit:
+                fired.append(Fired(index, condition, color, now,
+                                   now - (now if start is None else start)))
+        return fired
+
+    def wait(self, timeout=None):
+        """Block until a condition fires.
+
+        :param timeout: Seconds to wait, None waits forever.
+        :type timeout: float or None
+        :returns: :class:`Fired` of the first condition that fired (the
+            lowest index if several did at once), None if timed out.
+        """
+        start = _ahk._clock()
+        self.reset()
+        while True:
+            fired = self.check(start)
+            if fired:
+                return fired[0]
+            remaining = None if timeout is None else \
+                start + timeout - _ahk._clock()
+            if remaining is not None and remaining <= 0:
+                return None
+            time.sleep(self.interval if remaining is None else
+                       min(self.interval, remaining))
+
+# Engine side check function of an EngineWatcher, the fire function stops
+# the timer and reports the index of the condition (and the pixel color).
+_WATCH_FUNCS = """
+{name}() {{
+    global
+    local _pyahk_c, _pyahk_t
+    CoordMode, Pixel, Screen
+{checks}
+    return 0
+}}
+{name}_fire(_pyahk_index, _pyahk_value) {{
+    global
+    SetTimer, {name}, Off
+    {name}_fired := _pyahk_index "|" _pyahk_value
+{signal}
+    return 1
+}}
+"""
+
+_OPERATORS = ('=', '==', '!=', '<>', '<', '>', '<=', '>=')
+
+class EngineWatcher(object):
+    """Wait for conditions checked by a timer inside the engine.
+
+    Conditions are added with :meth:`window`, :meth:`pixel`,
+    :meth:`variable`, :meth:`control` and :meth:`expression`, which return
+    the condition index reported by :class:`Fired`. They are installed by
+    :meth:`start` (or the first :meth:`wait`) and can't be changed after.
+
+    Backends supporting events (see :meth:`ahk.Backend.create_event`) wake
+    Python up when a condition fires. Others are polled for the result,
+    still a single engine call per period.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, period=50, engine=None):
+        """
+        :param period: Milliseconds between checks in the engine.
+        :type period: int (default=50)
+        :param engine: The engine to check in (default current).
+        :type engine: ahk.Engine or None
+        """
+        self.period = period
+        self.name = "_pyahk_watch{0}".format(next(self._ids))
+        self.conditions = []
+        self._checks = []
+        self._bases = [] # Colors pixel changes are checked against
+        self._engine = engine or _ahk.current_engine()
+        self._event = None
+        self._installed = False
+        self.started = None
+
+    def _add(self, condition, test, setup=(), value='""'):
+        if self._installed:
+            raise RuntimeError("Watcher conditions are already installed!")
+        index = len(self.conditions)
+        lines = list(setup) + ["if ({0})".format(test),
+                               "    return {0}_fire({1}, {2})".format(
+                                   self.name, index, value)]
+        self._checks.append("\n".join("    " + line for line in lines))
+        self.conditions.append(condition)
+        return index
+
+    def window(self, title="", text="", active=False, exists=True,
+               extitle="", extext=""):
+        """Fire when a window exists, or is active.
+
+        :param title: Window title (see :meth:`ahk.Script.winExist`).
+        :type title: str
+        :param active: Wait for the window to be active.
+        :type active: bool (default=False)
+        :param exists: Wait for the window to exist (or be active), False to
+            wait for it to be gone (or inactive).
+        :type exists: bool (default=True)
+        :returns: Index of the condition.
+        """
+        test = "{0}{1}({2})".format(
+            "" if exists else "!", "WinActive" if active else "WinExist",
+            ", ".join(_ahk._quote(arg) for arg in
+                      (title, text, extitle, extext)))
+        return self._add(('window', title, text, active, exists), test)
+
+    def pixel(self, x, y, color=None, threshold=0.01):
+        """Fire when a pixel matches a color, or changes.
+
+        :param color: The color to wait for, None to wait for a change from
+            the color at the first check.
+        :type color: tuple(int r, int g, int b) or None
+        :param threshold: Error factor allowed for determining color match.
+        :type threshold: float (default=0.01)
+        :returns: Index of the condition.
+        """
+        index = len(self.conditions)
+        setup = ["PixelGetColor, _pyahk_c, {0}, {1}, RGB".format(x, y)]
+        if color is None:
+            base = "{0}_base{1}".format(self.name, index)
+            self._bases.append(base)
+            setup.append('if ({0} = "")'.format(base))
+            setup.append("    {0} := _pyahk_c".format(base))
+            reference = ("({0} >> 16)".format(base),
+                         "(({0} >> 8) & 0xFF)".format(base),
+                         "({0} & 0xFF)".format(base))
+            compare = ">"
+        else:
+            reference = [str(int(c)) for c in color]
+            compare = "<="
+        delta = " + ".join("Abs({0} - {1})".format(current, ref)
+                           for current, ref in zip(
+                               ("(_pyahk_c >> 16)", "((_pyahk_c >> 8) & 0xFF)",
+                                "(_pyahk_c & 0xFF)"), reference))
+        test = "{0} {1} {2}".format(delta, compare, _color._limit(threshold))
+        return self._add(Condition(x, y, color and tuple(color), threshold),
+                         test, setup, "_pyahk_c")
+
+    def variable(self, name, value, op="="):
+        """Fire when a global variable compares to a value.
+
+        :param op: The AHK comparison operator, "=" is case insensitive.
+        :type op: str (default="=")
+        :returns: Index of the condition.
+        """
+        if op not in _OPERATORS:
+            raise ValueError("Unsupported operator {0!r}!".format(op))
+        return self._add(('variable', name, value, op), "{0} {1} {2}".format(
+            name, op, _ahk._quote(value)))
+
+    def control(self, control, title="", text="", contains=""):
+        """Fire when a control exists and its text contains a string.
+
+        :param control: ClassNN or text of the control.
+        :type control: str
+        :param title: Title of the window holding the control.
+        :type title: str
+        :param contains: Text the control text must contain, "" for any.
+        :type contains: str
+        :returns: Index of the condition.
+        """
+        setup = ["ControlGetText, _pyahk_t, % {0}, % {1}, % {2}".format(
+            _ahk._quote(control), _ahk._quote(title), _ahk._quote(text))]
+        test = "!ErrorLevel"
+        if contains:
+            test += " && InStr(_pyahk_t, {0}, true)".format(
+                _ahk._quote(contains))
+        return self._add(('control', control, title, text, contains),
+                         test, setup)
+
+    def expression(self, expression):
+        """Fire when an AHK expression is true (global variables only).
+
+        :returns: Index of the condition.
+        """
+        return self._add(('expression', expression), expression)
+
+    def start(self):
+        """Install the conditions and start the engine timer.
+
+        Starting again re-arms a fired or stopped watcher.
+        """
+        if not self.conditions:
+            raise ValueError("Watcher has no conditions!")
+        with self._engine:
+            _ahk._flush()
+            if not self._installed:
+                self._event = self._engine.backend.create_event()
+                signal = "" if self._event is None else \
+                    '    DllCall("SetEvent", "Ptr", {0})'.format(
+                        self._event.handle)
+                _ahk.add_lines(_WATCH_FUNCS.format(
+                    name=self.name, checks="\n".join(self._checks),
+                    signal=signal))
+                self._installed = True
+            if self._event is not None:
+                self._event.clear()
+            _ahk.execute("".join('{0} := ""\n'.format(name) for name in
+                                 [self.name + "_fired"] + self._bases) +
+                         "SetTimer, {0}, {1}".format(self.name, self.period))
+        self.started = _ahk._clock()
+
+    def stop(self):
+        """Stop the engine timer."""
+        if self._installed:
+            with self._engine:
+                _ahk.execute("SetTimer, {0}, Off".format(self.name))
+
+    def close(self):
+        """Stop the timer and release the event."""
+        self.stop()
+        if self._event is not None:
+            self._event.close()
+            self._event = None
+
+    def fired(self):
+        """:returns: :class:`Fired` if a condition fired, else None."""
+        with self._engine:
+            _ahk._flush()
+            result = _ahk.get(self.name + "_fired")
+        if not result:
+            return None
+        now = _ahk._clock()
+        index, value = result.split("|", 1)
+        index = int(index)
+        color = None
+        if value.startswith("0x"):
+            color = tuple(bytearray.fromhex(value[2:].zfill(6)))
+        return Fired(index, self.conditions[index], color, now,
+                     now - (self.started or now))
+
+    def wait(self, timeout=None):
+        """Block until a condition fires, starting the watcher if needed.
+
+        :param timeout: Seconds to wait, None waits forever.
+        :type timeout: float or None
+        :returns: :class:`Fired` of the condition that fired, None if timed
+            out (the timer is stopped then).
+        """
+        if self.started is None:
+            self.start()
+        if self._event is not None:
+            fired = self.fired() if self._event.wait(timeout) else None
+        else:
+            deadline = None if timeout is None else _ahk._clock() + timeout
+            while True:
+                fired = self.fired()
+                if fired is not None or (deadline is not None and
+                                         _ahk._clock() >= deadline):
+                    break
+                time.sleep(self.period / 1000.0)
+        if fired is None:
+            self.stop()
+        self.started = None
+        return fired
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
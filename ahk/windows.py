@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""In-Python table of the top level windows.
+
+Instead of a :meth:`ahk.Script.winExist` round trip per lookup, the whole
+window list is fetched with a single engine call and searched in Python::
+
+    table = script.windows()
+    editors = table.find(cls="Notepad")
+    mail = table.first(regex=r"Inbox \\(\\d+\\)")
+    table.refresh() # Only fetches details of windows opened meanwhile
+
+Waiting for windows doesn't need to block either, a :class:`WindowWaiter`
+serves any number of waits from one scheduler thread, checking all of them
+with a single engine call per tick::
+
+    waiter = script.window_waiter()
+    save = waiter.wait("Save As", timeout=10)
+    gone = waiter.wait("Progress", state="closed")
+    save.result() # HWND, or False if timed out
+
+The lookups of the scheduler run on the engine's shared
+:class:`ahk.dispatch.Dispatcher` (see :func:`ahk.dispatch.shared`), other
+threads using the engine while waits are pending must go through it too.
+"""
+import collections, re, threading
+from concurrent.futures import Future
+
+from ahk import ahk as _ahk
+from ahk.dispatch import shared
+
+# Engine side helper listing the windows. Windows in the comma separated
+# list of known ids are only reported by id ("=id,"), details of others are
+# sent as "+id,pid,x,y,w,h," followed by the length prefixed class and title.
+_WINDOW_FUNCS = """
+_pyahk_windows(_pyahk_known) {
+    global
+    local _pyahk_out := "#", _pyahk_id, _pyahk_title, _pyahk_class, _pyahk_pid
+    local _pyahk_x, _pyahk_y, _pyahk_w, _pyahk_h
+    WinGet, _pyahk_list, List
+    Loop, %_pyahk_list%
+    {
+        _pyahk_id := _pyahk_list%A_Index%
+        if InStr(_pyahk_known, "," _pyahk_id ",")
+        {
+            _pyahk_out .= "=" _pyahk_id ","
+            continue
+        }
+        WinGetTitle, _pyahk_title, ahk_id %_pyahk_id%
+        WinGetClass, _pyahk_class, ahk_id %_pyahk_id%
+        WinGet, _pyahk_pid, PID, ahk_id %_pyahk_id%
+        WinGetPos, _pyahk_x, _pyahk_y, _pyahk_w, _pyahk_h, ahk_id %_pyahk_id%
+        _pyahk_out .= "+" _pyahk_id "," _pyahk_pid "," _pyahk_x "," _pyahk_y "," _pyahk_w "," _pyahk_h ","
+        _pyahk_out .= StrLen(_pyahk_class) ":" _pyahk_class StrLen(_pyahk_title) ":" _pyahk_title
+    }
+    return _pyahk_out
+}
+"""
+
+WindowInfo = collections.namedtuple('WindowInfo', (
+    'hwnd', 'title', 'cls', 'pid', 'x', 'y', 'width', 'height'))
+WindowInfo.__doc__ = "A row of a :class:`WindowTable`."
+
+def _int(text):
+    """:returns: int value of text, 0 if blank."""
+    return int(text, 0) if text else 0
+
+def _parse(data):
+    """Parse the helper result.
+
+    :returns: List of (id, WindowInfo or None) in z-order, None for known ids.
+    """
+    # Lengths count UTF-16 units, slice in those if the text has astral chars
+    data = _ahk._units(data)
+    rows, pos = [], 1
+    while pos < len(data):
+        kind = data[pos]
+        if kind == "=":
+            end = data.index(",", pos)
+            rows.append((data[pos + 1:end], None))
+            pos = end + 1
+            continue
+        fields = []
+        for i in range(6):
+            end = data.index(",", pos + 1)
+            fields.append(data[pos + 1:end])
+            pos = end
+        pos += 1
+        texts = []
+        for i in range(2):
+            sep = data.index(":", pos)
+            end = sep + 1 + int(data[pos:sep])
+            texts.append(_ahk._join_units(data[sep + 1:end]))
+            pos = end
+        ident = fields[0]
+        rows.append((ident, WindowInfo(_int(ident), texts[1], texts[0],
+                                       *[_int(field) for field in fields[1:]])))
+    return rows
+
+class WindowTable(object):
+    """Indexed snapshot of the top level windows, see :meth:`ahk.Script.windows`.
+
+    Rows are :class:`WindowInfo` tuples, iteration is in z-order (top-most
+    first). Tables act on the engine of the script they were created with.
+    """
+
+    def __init__(self, engine=None):
+        """
+        :param engine: The engine to query (default current).
+        :type engine: ahk.Engine or None
+        """
+        self._engine = engine or _ahk.current_engine()
+        self._rows = collections.OrderedDict() # engine id -> WindowInfo
+        self._by_hwnd = {}
+        self._by_class = {}
+        self.refresh(full=True)
+
+    def refresh(self, full=False):
+        """Update the table with a single engine call.
+
+        Only windows that appeared are queried for their details, windows that
+        disappeared are dropped. Known windows keep their title and geometry
+        unless `full` is set.
+
+        :param full: Re-query the details of all windows.
+        :type full: bool (default=False)
+        :returns: Tuple of the (added, removed) HWND lists.
+        """
+        known = "," if full else ",{0},".format(",".join(self._rows))
+        with self._engine:
+            _ahk._flush()
+            data = _ahk._call_many("_pyahk_windows", [known], _WINDOW_FUNCS)
+        old, rows = self._rows, collections.OrderedDict()
+        for ident, info in _parse(data):
+            rows[ident] = old[ident] if info is None else info
+        added = [info.hwnd for ident, info in rows.items() if ident not in old]
+        removed = [info.hwnd for ident, info in old.items()
+                   if ident not in rows]
+        self._rows = rows
+        self._by_hwnd = dict((info.hwnd, info) for info in rows.values())
+        self._by_class = {}
+        for info in rows.values():
+            self._by_class.setdefault(info.cls.lower(), []).append(info)
+        return added, removed
+
+    def find(self, title=None, cls=None, regex=None, pid=None):
+        """Find windows matching all the given criteria.
+
+        :param title: Text the title must contain (case sensitive).
+        :type title: str or None
+        :param cls: The window class (case insensitive).
+        :type cls: str or None
+        :param regex: Pattern searched for in the title.
+        :type regex: str or compiled pattern or None
+        :param pid: Id of the owning process.
+        :type pid: int or None
+        :returns: List of matching WindowInfo in z-order.
+        """
+        rows = (self._by_class.get(cls.lower(), []) if cls is not None
+                else self._rows.values())
+        if regex is not None and not hasattr(regex, 'search'):
+            regex = re.compile(regex)
+        return [info for info in rows
+                if (title is None or title in info.title) and
+                   (regex is None or regex.search(info.title)) and
+                   (pid is None or info.pid == pid)]
+
+    def first(self, **criteria):
+        """:returns: The top-most window matching :meth:`find` criteria, or
+            None."""
+        found = self.find(**criteria)
+        return found[0] if found else None
+
+    def get(self, hwnd, default=None):
+        """:returns: The WindowInfo of a HWND, or default."""
+        return self._by_hwnd.get(hwnd, default)
+
+    def __getitem__(self, hwnd):
+        return self._by_hwnd[hwnd]
+
+    def __contains__(self, hwnd):
+        return hwnd in self._by_hwnd
+
+    def __iter__(self):
+        return iter(list(self._rows.values()))
+
+    def __len__(self):
+        return len(self._rows)
+
+# Engine side helper looking up several windows. Queries are a kind ("E" for
+# WinExist, "A" for WinActive) and four length prefixed criteria, results
+# are the comma separated HWNDs (0 if not found).
+_FIND_FUNCS = """
+_pyahk_find_many(_pyahk_data) {
+    local out := "#", pos := 1, end := StrLen(_pyahk_data)
+    local kind, sep, len, value, title, text, extitle, extext
+    while (pos <= end) {
+        kind := SubStr(_pyahk_data, pos, 1)
+        pos += 1
+        Loop, 4
+        {
+            sep := InStr(_pyahk_data, ":", true, pos)
+            len := SubStr(_pyahk_data, pos, sep - pos)
+            value := SubStr(_pyahk_data, sep + 1, len)
+            pos := sep + 1 + len
+            if (A_Index = 1)
+                title := value
+            else if (A_Index = 2)
+                text := value
+            else if (A_Index = 3)
+                extitle := value
+            else
+                extext := value
+        }
+        if (kind = "A")
+            out .= WinActive(title, text, extitle, extext) ","
+        else
+            out .= WinExist(title, text, extitle, extext) ","
+    }
+    return out
+}
+"""
+
+# Wait state -> (query kind, fires when found)
+_STATES = {
+    'exists': ("E", True),
+    'closed': ("E", False),
+    'active': ("A", True),
+    'inactive': ("A", False),
+}
+
+class _Wait(object):
+    """A pending wait of a WindowWaiter."""
+    __slots__ = ('future', 'query', 'found', 'deadline')
+
+    def __init__(self, query, found, deadline):
+        self.future = Future()
+        self.query = query
+        self.found = found
+        self.deadline = deadline
+
+class WindowWaiter(object):
+    """Non-blocking window waits, multiplexed on one scheduler thread.
+
+    Every tick the scheduler looks up the criteria of all pending waits with
+    a single engine call (waits sharing criteria share the lookup) and
+    resolves the futures of those that are satisfied or timed out. The
+    thread only exists while waits are pending.
+
+    The engine calls are made on the thread of :attr:`dispatcher`, by
+    default the engine's shared one (see :func:`ahk.dispatch.shared`). The
+    engine must only be used through it while waits are pending.
+    """
+
+    def __init__(self, interval=0.05, engine=None, dispatcher=None):
+        """
+        :param interval: Seconds between ticks.
+        :type interval: float (default=0.05)
+        :param engine: The engine to query (default current), ignored if a
+            dispatcher is given.
+        :type engine: ahk.Engine or None
+        :param dispatcher: The dispatcher to query the engine with (default
+            the engine's shared one).
+        :type dispatcher: ahk.dispatch.Dispatcher or None
+        """
+        self.interval = interval
+        self.dispatcher = dispatcher or shared(engine)
+        self._engine = self.dispatcher.engine
+        self._cond = threading.Condition()
+        self._waits = []
+        self._thread = None
+        self._closed = False
+        self._stats = dict(ticks=0, resolved=0, timeouts=0, cancelled=0,
+                           failed=0, queries=0)
+
+    def wait(self, title="", text="", extitle="", extext="", state="exists",
+             timeout=None):
+        """Wait for a window without blocking.
+
+        :param title: Partial window title text to match.
+        :type title: str (default="")
+        :param text: Partial window text to match.
+        :type text: str (default="")
+        :param extitle: Partial window title text to avoid.
+        :type extitle: str (default="")
+        :param extext: Partial window text to avoid.
+        :type extext: str (default="")
+        :param state: Wait until a matching window "exists", is "active",
+            or until none exists ("closed") or is active ("inactive").
+        :type state: str (default="exists")
+        :param timeout: Seconds to wait, None waits forever.
+        :type timeout: float or None
+        :returns: concurrent.futures.Future resolving to the HWND of the
+            window ("exists" and "active"), True ("closed" and "inactive"),
+            or False if timed out.
+        """
+        if state not in _STATES:
+            raise ValueError("Unknown window state {0!r}!".format(state))
+        kind, found = _STATES[state]
+        deadline = None if timeout is None else _ahk._clock() + timeout
+        pending = _Wait((kind, title, text, extitle, extext), found, deadline)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Waiter has been shut down!")
+            self._waits.append(pending)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work,
+                                                name="ahk-window-waiter")
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+        return pending.future
+
+    def pending(self):
+        """:returns: Number of waits not resolved yet."""
+        with self._cond:
+            return len(self._waits)
+
+    def metrics(self):
+        """Snapshot of the scheduler statistics.
+
+        * ``ticks`` - Engine calls made, one per tick.
+        * ``queries`` - Window lookups made in those calls.
+        * ``resolved``/``timeouts``/``cancelled`` - Finished waits.
+        * ``failed`` - Waits whose lookup the engine didn't answer.
+        * ``pending`` - Waits not resolved yet.
+
+        :returns: dict of metric name -> value.
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._waits)
+        return stats
+
+    def shutdown(self, wait=True):
+        """Cancel pending waits and stop the scheduler, the dispatcher is
+        left running.
+
+        :param wait: Whether to wait for the scheduler thread to exit.
+        :type wait: bool (default=True)
+        """
+        with self._cond:
+            self._closed = True
+            waits, self._waits = self._waits, []
+            thread = self._thread
+            self._cond.notify()
+        for pending in waits:
+            pending.future.cancel()
+        if wait and thread is not None and \
+                thread is not threading.current_thread():
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def tick(self):
+        """Check all pending waits once, with a single engine call.
+
+        Called by the scheduler thread, only call it yourself to drive a
+        waiter without its thread. Waits whose criteria the engine didn't
+        answer for, e.g. as it was terminated, fail with a RuntimeError.
+
+        :returns: Number of waits resolved or failed.
+        """
+        with self._cond:
+            waits = [pending for pending in self._waits
+                     if not pending.future.cancelled()]
+            self._stats['cancelled'] += len(self._waits) - len(waits)
+            # Waits added meanwhile are left for the next tick
+            self._waits = list(waits)
+        if not waits:
+            return 0
+        queries = list(collections.OrderedDict.fromkeys(
+            pending.query for pending in waits))
+        data = []
+        for query in queries:
+            data.append(query[0])
+            for value in query[1:]:
+                data.append("{0}:{1}".format(len(_ahk._units(value)), value))
+        if threading.current_thread() is self.dispatcher.thread:
+            result = self._find("".join(data))
+        else:
+            result = self.dispatcher.submit(self._find, "".join(data)).result()
+        now = _ahk._clock()
+        # A field ended by a comma per query, a short result leaves the last
+        # queries unanswered
+        fields = result[1:].split(",")[:-1]
+        hwnds = dict(zip(queries, [_int(field) for field in fields]))
+        done, timeouts, failed = [], 0, []
+        for pending in waits:
+            hwnd = hwnds.get(pending.query)
+            if hwnd is None:
+                failed.append(pending)
+            elif bool(hwnd) == pending.found:
+                done.append((pending, hwnd or True))
+            elif pending.deadline is not None and now >= pending.deadline:
+                done.append((pending, False))
+                timeouts += 1
+        with self._cond:
+            finished = set(id(pending) for pending, value in done)
+            finished.update(id(pending) for pending in failed)
+            self._waits = [pending for pending in self._waits
+                           if id(pending) not in finished]
+            self._stats['ticks'] += 1
+            self._stats['queries'] += len(queries)
+            self._stats['resolved'] += len(done) - timeouts
+            self._stats['timeouts'] += timeouts
+            self._stats['failed'] += len(failed)
+        for pending, value in done:
+            if pending.future.set_running_or_notify_cancel():
+                pending.future.set_result(value)
+        for pending in failed:
+            if pending.future.set_running_or_notify_cancel():
+                pending.future.set_exception(RuntimeError(
+                    "Window lookup {0!r} not answered, the engine returned "
+                    "{1!r}!".format(pending.query, result)))
+        return len(done) + len(failed)
+
+    def _find(self, data):
+        """Look up the encoded criteria, on the dispatcher thread."""
+        with self._engine:
+            _ahk._flush()
+            return _ahk._call_many("_pyahk_find_many", [data], _FIND_FUNCS)
+
+    def _work(self):
+        """Scheduler thread main loop."""
+        while True:
+            with self._cond:
+                if self._closed or not self._waits:
+                    self._thread = None
+                    return
+            try:
+                self.tick()
+            except Exception as exc:
+                # Don't leave the waits hanging if the engine fails
+                with self._cond:
+                    waits, self._waits = self._waits, []
+                    self._thread = None
+                for pending in waits:
+                    if pending.future.set_running_or_notify_cancel():
+                        pending.future.set_exception(exc)
+                return
+            with self._cond:
+                if self._waits and not self._closed:
+                    self._cond.wait(self.interval)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark per-variable get/set loops against get_many/set_many.
+
+Each variable read or written with :func:`ahk.get`/:func:`ahk.set` crosses
+into the engine once, :func:`ahk.get_many`/:func:`ahk.set_many` cross once
+for the whole group. Times are reported for 10, 100 and 1000 variables along
+with the number of engine calls when the backend counts them (the simulated
+backend does). The simulated backend interprets the engine side helpers in
+Python while its per-call overhead is close to zero, so there only the call
+counts are representative of AutoHotkey.dll.
+
+Run from the repository root::
+
+    python bench/bulk.py
+    PYAHK_BACKEND=simulated python bench/bulk.py
+"""
+import os, sys, timeit
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+
+SIZES = (10, 100, 1000)
+REPEAT = 5
+
+def crossings():
+    """:returns: Engine calls made so far, or None if not counted."""
+    return getattr(ahk.get_backend(), 'crossings', None)
+
+def measure(func):
+    """:returns: Best time in seconds and engine calls of one func() run."""
+    func() # Warm up, installs the bulk helpers
+    before = crossings()
+    func()
+    calls = None if before is None else crossings() - before
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)), calls
+
+def run():
+    print("{0:>6} {1:<5}{2:>12}{3:>12}{4:>9}{5:>8}{6:>8}".format(
+        "vars", "op", "loop ms", "bulk ms", "speedup", "calls", "bulk"))
+    for size in SIZES:
+        values = dict(("bench{0}".format(i), "value {0}".format(i))
+                      for i in range(size))
+        names = list(values)
+        def set_loop():
+            for name, value in values.items():
+                ahk.set(name, value)
+        def get_loop():
+            return dict((name, ahk.get(name)) for name in names)
+        cases = (
+            ("set", set_loop, lambda: ahk.set_many(values)),
+            ("get", get_loop, lambda: ahk.get_many(names)),
+        )
+        for label, loop, bulk in cases:
+            assert loop() in (None, values) and bulk() in (True, values)
+            slow, slow_calls = measure(loop)
+            fast, fast_calls = measure(bulk)
+            print("{0:>6} {1:<5}{2:>12.3f}{3:>12.3f}{4:>8.1f}x{5:>8}{6:>8}".format(
+                size, label, slow * 1e3, fast * 1e3, slow / fast,
+                "-" if slow_calls is None else slow_calls,
+                "-" if fast_calls is None else fast_calls))
+
+if __name__ == "__main__":
+    ahk.start()
+    ahk.ready()
+    print("Backend: {0}".format(type(ahk.get_backend()).__name__))
+    run()
+    ahk.terminate()
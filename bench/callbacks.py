@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark engine to Python callbacks.
+
+An AHK loop calls a registered Python callback `--calls` times, for several
+queue sizes. Reported are the upcalls per second seen by the engine, the
+calls dropped because the handler (taking `--work` seconds) fell behind, and
+the mean/max delay from the engine call to the handler starting.
+
+Run from the repository root::
+
+    python bench/callbacks.py
+    PYAHK_BACKEND=simulated python bench/callbacks.py --work 0.0001
+"""
+import argparse, os, sys, time
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+from ahk.callbacks import CallbackRegistry
+
+def run(calls, work, sizes):
+    print("{0:>6}{1:>12}{2:>9}{3:>12}{4:>12}".format(
+        "queue", "calls/sec", "dropped", "mean ms", "max ms"))
+    for size in sizes:
+        registry = CallbackRegistry(size)
+        registry.register(lambda value: time.sleep(work) if work else None,
+                          "BenchTick")
+        start = time.perf_counter()
+        ahk.execute("Loop, {0}\n    BenchTick(A_Index)".format(calls))
+        elapsed = time.perf_counter() - start
+        registry.shutdown()
+        metrics = registry.metrics()
+        print("{0:>6}{1:>12.0f}{2:>9}{3:>12.3f}{4:>12.3f}".format(
+            size, calls / elapsed, metrics['dropped'],
+            metrics['latency_mean'] * 1000, metrics['latency_max'] * 1000))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark engine to Python callbacks.")
+    parser.add_argument('--calls', type=int, default=5000,
+                        help="Callbacks made by the engine.")
+    parser.add_argument('--work', type=float, default=0.0,
+                        help="Seconds each handler takes.")
+    options = parser.parse_args()
+    ahk.start()
+    ahk.ready()
+    print("Backend: {0}".format(type(ahk.get_backend()).__name__))
+    run(options.calls, options.work, (16, 256, 4096))
+    ahk.terminate()
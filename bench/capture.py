@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark reading a screen region pixel by pixel against capture().
+
+:meth:`ahk.Script.getPixel` costs three engine calls per pixel, reading a
+100x100 region that way is 30000 engine calls. :meth:`ahk.Script.capture`
+copies the region once, with the default capturer of the backend and with
+the :class:`ahk.capture.EngineCapturer` (one engine call). Engine calls are
+reported when the backend counts them (the simulated backend does).
+
+Run from the repository root::
+
+    python bench/capture.py
+    PYAHK_BACKEND=simulated python bench/capture.py --size 50
+"""
+import argparse, os, sys, timeit
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+from ahk import capture
+
+def crossings():
+    """:returns: Engine calls made so far, or None if not counted."""
+    return getattr(ahk.get_backend(), 'crossings', None)
+
+def pixel_loop(script, size):
+    """Read a size x size region one getPixel at a time."""
+    return [script.getPixel(x, y) for y in range(size) for x in range(size)]
+
+def measure(call, number):
+    """:returns: Seconds per call and engine calls per call of call()."""
+    call() # Warm up, installs engine helpers
+    before = crossings()
+    call()
+    calls = None if before is None else crossings() - before
+    return min(timeit.repeat(call, number=number, repeat=3)) / number, calls
+
+def run(size):
+    script = ahk.Script()
+    engine = capture.EngineCapturer()
+    print("{0:<10}{1:>14}{2:>8}".format("path", "ms/region", "calls"))
+    results = []
+    for label, call, number in (
+            ("getPixel", lambda: pixel_loop(script, size), 1),
+            ("engine", lambda: script.capture(0, 0, size, size, engine), 10),
+            ("capture", lambda: script.capture(0, 0, size, size), 100)):
+        seconds, calls = measure(call, number)
+        results.append(seconds)
+        print("{0:<10}{1:>14.2f}{2:>8}".format(
+            label, seconds * 1000, "-" if calls is None else calls))
+    print("speedup {0:.0f}x ({1})".format(
+        results[0] / results[2], type(capture.get_capturer()).__name__))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark getPixel loops against capture().")
+    parser.add_argument('--size', type=int, default=100,
+                        help="Side of the square region in pixels.")
+    options = parser.parse_args()
+    ahk.start()
+    ahk.ready()
+    print("Backend: {0}".format(type(ahk.get_backend()).__name__))
+    run(options.size)
+    ahk.terminate()
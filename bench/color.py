@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark color search on a captured frame.
+
+Searching a frame for colors used to mean calling
+:meth:`ahk.Script._color_delta` on every pixel, as :meth:`ahk.Script.waitPixel`
+does for one. This times that loop against :func:`ahk.color.find` and
+:func:`ahk.color.matches`, which compare the whole frame at once, on a frame
+of random pixels without any match (the worst case for a first match).
+
+Run from the repository root::
+
+    python bench/color.py
+    python bench/color.py --size 1000 --colors 3
+"""
+import argparse, os, random, sys, timeit
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+from ahk import color
+from ahk.capture import Frame
+from ahk.script import Script
+
+def loop_find(frame, targets, threshold):
+    """First match comparing pixel by pixel with Script._color_delta."""
+    delta, data = Script._color_delta, frame.data
+    for i in range(frame.width * frame.height):
+        pixel = tuple(data[3 * i:3 * i + 3])
+        for target in targets:
+            if delta(None, target, pixel) <= threshold:
+                return (frame.x + i % frame.width, frame.y + i // frame.width)
+    return None
+
+def run(size, count, threshold):
+    rand = random.Random(0)
+    data = bytearray(rand.getrandbits(7) for i in range(size * size * 3))
+    frame = Frame(data, 0, 0, size, size)
+    targets = [(255, 255 - 40 * i, 255) for i in range(count)]
+    assert loop_find(frame, targets, threshold) is None
+    assert color.find(frame, targets, threshold) is None
+    print("{0}x{0} frame, {1} colors, {2}".format(
+        size, count, "NumPy" if color.numpy is not None else "no NumPy"))
+    print("{0:<10}{1:>14}".format("path", "ms/frame"))
+    results = []
+    for label, call, number in (
+            ("loop", lambda: loop_find(frame, targets, threshold), 1),
+            ("find", lambda: color.find(frame, targets, threshold), 20),
+            ("matches", lambda: color.matches(frame, targets, threshold), 20)):
+        seconds = min(timeit.repeat(call, number=number, repeat=3)) / number
+        results.append(seconds)
+        print("{0:<10}{1:>14.2f}".format(label, seconds * 1000))
+    print("speedup {0:.0f}x".format(results[0] / results[1]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark per pixel color loops against ahk.color.")
+    parser.add_argument('--size', type=int, default=200,
+                        help="Side of the square frame in pixels.")
+    parser.add_argument('--colors', type=int, default=2,
+                        help="Number of colors searched for.")
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help="Error factor allowed for a match.")
+    options = parser.parse_args()
+    run(options.size, options.colors, options.threshold)
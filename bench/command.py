@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark building wrapper commands with str.format against templates.
+
+The wrappers of :mod:`ahk.script` and :mod:`ahk.control` used to format
+their values into the command at every call, unescaped. They now use
+:class:`ahk.command.Command` templates, which escape the values and
+memoize commands formatted from strings. Both are timed for commands
+repeated with the same values (the usual case) and with new values at every
+call. No engine is needed.
+
+Run from the repository root::
+
+    python bench/command.py
+    python bench/command.py --number 500000
+"""
+import argparse, os, sys, timeit
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+from ahk.command import command
+
+# ControlSetText as built before and after
+ADHOC = "ControlSetText, {0}, {1}, {2}, {3}, {4}, {5}"
+TEMPLATE = command("ControlSetText, {control}, {value}, {title}, {text}, "
+                   "{extitle}, {extext}")
+
+def run(number):
+    values = ("Edit1", "hello world", "ahk_id 0x1004", "", "", "")
+    unique = [("Edit1", "value {0}".format(i), "ahk_id 0x1004", "", "", "")
+              for i in range(number)]
+    cases = (
+        ("adhoc", "repeated", lambda: ADHOC.format(*values)),
+        ("template", "repeated", lambda: TEMPLATE.format(*values)),
+        ("adhoc", "unique", lambda: [ADHOC.format(*v) for v in unique]),
+        ("template", "unique", lambda: [TEMPLATE.format(*v) for v in unique]))
+    print("{0:<10}{1:<10}{2:>12}".format("path", "values", "ns/command"))
+    results = {}
+    for label, kind, call in cases:
+        runs = number if kind == "repeated" else 1
+        seconds = min(timeit.repeat(call, number=runs, repeat=3)) / number
+        results[label, kind] = seconds
+        print("{0:<10}{1:<10}{2:>12.0f}".format(label, kind, seconds * 1e9))
+    for kind in ("repeated", "unique"):
+        print("{0} speedup {1:.2f}x".format(
+            kind, results["adhoc", kind] / results["template", kind]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark str.format commands against templates.")
+    parser.add_argument('--number', type=int, default=200000,
+                        help="Commands built per run.")
+    run(parser.parse_args().number)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark Function calls before and after the single-call path.
+
+The previous :class:`ahk.Function` implementation ran every call as three
+engine calls, ``execute("tmp := f(args)")``, ``get(tmp)`` and
+``set(tmp, "")``, formatting and parsing a new expression each time. It is
+reproduced here as `legacy_call` and timed against the current Function,
+which passes the arguments to ahkFunction through a cached handle. Engine
+calls per function call are reported when the backend counts them (the
+simulated backend does).
+
+Run from the repository root::
+
+    python bench/function.py
+    PYAHK_BACKEND=simulated python bench/function.py
+"""
+import os, sys, timeit
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+
+NUMBER = 2000
+REPEAT = 5
+
+def legacy_call(func, *args):
+    """Function.__call__ as it was, three engine calls per call."""
+    ahk.execute("{0} := {1}({2})".format(
+        func.tmpname, func.name, ",".join(str(i) for i in args)))
+    result = func.result(ahk.get(func.tmpname))
+    ahk.set(func.tmpname, "")
+    return result
+
+def crossings():
+    """:returns: Engine calls made so far, or None if not counted."""
+    return getattr(ahk.get_backend(), 'crossings', None)
+
+def measure(call):
+    """:returns: Calls per second and engine calls per call of call()."""
+    call() # Warm up, resolves the function
+    before = crossings()
+    call()
+    calls = None if before is None else crossings() - before
+    best = min(timeit.repeat(call, number=NUMBER, repeat=REPEAT))
+    return NUMBER / best, calls
+
+def run():
+    add = ahk.Function('benchadd', int, '(x, y)', 'return x + y')
+    assert legacy_call(add, 2, 3) == add(2, 3) == 5
+    print("{0:<8}{1:>14}{2:>8}".format("path", "calls/sec", "calls"))
+    results = []
+    for label, call in (("before", lambda: legacy_call(add, 2, 3)),
+                        ("after", lambda: add(2, 3))):
+        rate, calls = measure(call)
+        results.append(rate)
+        print("{0:<8}{1:>14.0f}{2:>8}".format(
+            label, rate, "-" if calls is None else calls))
+    print("speedup {0:.1f}x".format(results[1] / results[0]))
+
+if __name__ == "__main__":
+    ahk.start()
+    ahk.ready()
+    print("Backend: {0}".format(type(ahk.get_backend()).__name__))
+    run()
+    ahk.terminate()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark a drag made of click() calls against a Gesture.
+
+A drag along a path with :meth:`ahk.Script.click` costs an engine call per
+point. :meth:`ahk.Script.gesture` runs the same drag as one block, with
+moves coalesced. Engine calls are reported when the backend counts them
+(the simulated backend does).
+
+Run from the repository root::
+
+    python bench/gesture.py
+    PYAHK_BACKEND=simulated python bench/gesture.py --points 500
+"""
+import argparse, math, os, sys, timeit
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+
+def crossings():
+    """:returns: Engine calls made so far, or None if not counted."""
+    return getattr(ahk.get_backend(), 'crossings', None)
+
+def measure(call, number):
+    """:returns: Seconds per call and engine calls per call of call()."""
+    before = crossings()
+    call()
+    calls = None if before is None else crossings() - before
+    return min(timeit.repeat(call, number=number, repeat=3)) / number, calls
+
+def run(points, tolerance):
+    script = ahk.Script()
+    # A straight stroke then an arc
+    path = [(100 + i, 100) for i in range(points // 2)]
+    path += [(int(300 + 100 * math.cos(i / points * math.pi)),
+              int(100 + 100 * math.sin(i / points * math.pi)))
+             for i in range(points - len(path))]
+    def click_loop():
+        script.click("down", x=path[0][0], y=path[0][1])
+        for x, y in path[1:]:
+            script.click(count=0, x=x, y=y)
+        script.click("up")
+    def gesture():
+        script.gesture(tolerance).path(path[:1]).press().path(
+            path[1:]).release().play()
+    print("{0:<10}{1:>14}{2:>8}".format("path", "ms/drag", "calls"))
+    results = []
+    for label, call in (("click", click_loop), ("gesture", gesture)):
+        seconds, calls = measure(call, 5)
+        results.append(seconds)
+        print("{0:<10}{1:>14.3f}{2:>8}".format(
+            label, seconds * 1000, "-" if calls is None else calls))
+    moves = sum(line.startswith("MouseMove") for line in script.gesture(
+        tolerance).path(path).compile())
+    print("speedup {0:.1f}x, {1} of {2} moves sent".format(
+        results[0] / results[1], moves, len(path)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark click() loops against gestures.")
+    parser.add_argument('--points', type=int, default=200,
+                        help="Points on the dragged path.")
+    parser.add_argument('--tolerance', type=float, default=1,
+                        help="Pixels moves may be coalesced within.")
+    options = parser.parse_args()
+    ahk.start()
+    ahk.ready()
+    print("Backend: {0}".format(type(ahk.get_backend()).__name__))
+    run(options.points, options.tolerance)
+    ahk.terminate()
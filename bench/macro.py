@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark a series of send() calls against replaying a Macro.
+
+Filling a form with :meth:`ahk.Script.send` costs an engine call per field
+and key. :meth:`ahk.Script.play` replays a compiled
+:class:`ahk.macro.Macro` of the same keys with one engine call. Engine calls
+are reported when the backend counts them (the simulated backend does).
+
+Run from the repository root::
+
+    python bench/macro.py
+    PYAHK_BACKEND=simulated python bench/macro.py --fields 50
+"""
+import argparse, os, sys, timeit
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+from ahk.macro import Keys, Macro, escape
+
+def crossings():
+    """:returns: Engine calls made so far, or None if not counted."""
+    return getattr(ahk.get_backend(), 'crossings', None)
+
+def measure(call, number):
+    """:returns: Seconds per call and engine calls per call of call()."""
+    # Warm up, macros are installed when played a second time
+    call()
+    call()
+    before = crossings()
+    call()
+    calls = None if before is None else crossings() - before
+    return min(timeit.repeat(call, number=number, repeat=3)) / number, calls
+
+def run(fields):
+    script = ahk.Script()
+    # Tabbing through a form, with characters Send would interpret
+    steps = []
+    for field in range(fields):
+        steps += ["value {0}, {{x}}!".format(field), Keys("{Tab}")]
+    form = Macro(steps)
+    def send_loop():
+        for step in steps:
+            script.send(step if isinstance(step, Keys) else escape(step))
+    print("{0:<10}{1:>14}{2:>8}".format("path", "ms/form", "calls"))
+    results = []
+    for label, call in (("send", send_loop),
+                        ("play", lambda: script.play(form))):
+        seconds, calls = measure(call, 20)
+        results.append(seconds)
+        print("{0:<10}{1:>14.3f}{2:>8}".format(
+            label, seconds * 1000, "-" if calls is None else calls))
+    print("speedup {0:.1f}x".format(results[0] / results[1]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark send() loops against Macro playback.")
+    parser.add_argument('--fields', type=int, default=20,
+                        help="Form fields typed per run.")
+    options = parser.parse_args()
+    ahk.start()
+    ahk.ready()
+    print("Backend: {0}".format(type(ahk.get_backend()).__name__))
+    run(options.fields)
+    ahk.terminate()
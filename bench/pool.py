@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark job throughput of :class:`ahk.pool.Pool` by worker count.
+
+A fixed set of jobs, each running a small script loop on its worker engine,
+is spread over 1, 2, 4, ... worker processes up to the number of cores. The
+workers use the simulated backend by default so the scaling can be measured
+on any platform, pass ``--dll`` to load AutoHotkey.dll instead.
+
+Run from the repository root::
+
+    python bench/pool.py
+    python bench/pool.py --jobs 400 --dll
+"""
+import argparse, os, sys, time
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+from ahk.pool import Pool
+from ahk.simulated import SimulatedBackend
+
+def job(n):
+    """A job of roughly constant cost running on the worker engine."""
+    ahk.execute("total := 0\nLoop, 200\n    total += A_Index * {0}".format(n))
+    return ahk.get("total")
+
+def counts(limit):
+    """:returns: 1, 2, 4, ... up to limit, limit included."""
+    count = 1
+    while count < limit:
+        yield count
+        count *= 2
+    yield limit
+
+def run(jobs, backend, processes):
+    print("{0:>8}{1:>12}{2:>12}{3:>9}".format(
+        "workers", "seconds", "jobs/sec", "scaling"))
+    base = None
+    for size in counts(processes):
+        with Pool(size, backend=backend, health_interval=None) as pool:
+            pool.health() # Wait for all engines to be up
+            start = time.perf_counter()
+            results = pool.map(job, range(jobs))
+            elapsed = time.perf_counter() - start
+        assert results[1] == str(200 * 201 // 2)
+        rate = jobs / elapsed
+        base = base or rate
+        print("{0:>8}{1:>12.3f}{2:>12.1f}{3:>8.2f}x".format(
+            size, elapsed, rate, rate / base))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark ahk.pool job throughput by worker count")
+    parser.add_argument("--jobs", type=int, default=200,
+                        help="Number of jobs per run (default 200)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Most workers (default the number of cores)")
+    parser.add_argument("--dll", action="store_true",
+                        help="Use AutoHotkey.dll instead of the simulator")
+    args = parser.parse_args()
+    run(args.jobs, None if args.dll else SimulatedBackend, args.processes)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark untyped vs. prototyped ctypes calls on the execute/get/set path.
+
+With AutoHotkey.dll available the real exports are timed, otherwise libc
+wide string functions with the same call shapes stand in for them:
+
+    * ahkExec(text) -> int              ~ wcslen(text)
+    * ahkgetvar(text, uint) -> text     ~ wcsstr(text, text)
+    * ahkassign(text, text) -> int      ~ wcscmp(text, text)
+
+Run from the repository root::
+
+    python bench/prototypes.py
+"""
+import ctypes, ctypes.util, os, sys, timeit
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+from ahk.backend import prototypes
+
+NUMBER = 200000
+
+def standin_exports():
+    """:returns: Untyped and typed (exec, getvar, assign) libc stand-ins."""
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or
+                       ctypes.util.find_library('msvcrt'))
+    untyped = (libc['wcslen'], libc['wcsstr'], libc['wcscmp'])
+    # An untyped wcsstr truncates the returned pointer on 64 bit builds
+    # (exactly the ahkgetvar bug), keep it pointer wide to time only the cast.
+    untyped[1].restype = ctypes.c_void_p
+    typed = (libc['wcslen'], libc['wcsstr'], libc['wcscmp'])
+    table = prototypes()
+    for func, name in zip(typed, ('ahkExec', 'ahkgetvar', 'ahkassign')):
+        func.restype = table[name][0]
+    typed[0].argtypes = (ctypes.c_wchar_p,)
+    typed[1].argtypes = (ctypes.c_wchar_p, ctypes.c_wchar_p)
+    typed[2].argtypes = (ctypes.c_wchar_p, ctypes.c_wchar_p)
+    # Like ahkgetvar the result must point into memory that outlives the call
+    buf = ctypes.create_unicode_buffer("a variable value")
+    return untyped, typed, (lambda name: (buf, buf))
+
+def dll_exports(dll):
+    """:returns: Untyped and typed (exec, getvar, assign) dll exports."""
+    untyped = (dll['ahkExec'], dll['ahkgetvar'], dll['ahkassign'])
+    typed = (dll['ahkExec'], dll['ahkgetvar'], dll['ahkassign'])
+    table = prototypes()
+    for func, name in zip(typed, ('ahkExec', 'ahkgetvar', 'ahkassign')):
+        func.restype, func.argtypes = table[name]
+    return untyped, typed, (lambda name: (name, 0))
+
+def run(untyped, typed, getargs):
+    exec_u, getvar_u, assign_u = untyped
+    exec_t, getvar_t, assign_t = typed
+    name, value = "benchvar", "some value"
+    args = getargs(name)
+    cases = (
+        ("execute", lambda: exec_u(name) == 1,
+                    lambda: exec_t(name) == 1),
+        ("get", lambda: ctypes.cast(int(getvar_u(*args)),
+                                    ctypes.c_wchar_p).value,
+                lambda: getvar_t(*args)),
+        ("set", lambda: assign_u(name, value) == 0,
+                lambda: assign_t(name, value) == 0),
+    )
+    print("{0:<10}{1:>14}{2:>14}{3:>10}".format(
+        "call", "untyped us", "typed us", "speedup"))
+    for label, slow, fast in cases:
+        assert slow() == fast()
+        before = min(timeit.repeat(slow, number=NUMBER, repeat=3))
+        after = min(timeit.repeat(fast, number=NUMBER, repeat=3))
+        print("{0:<10}{1:>14.3f}{2:>14.3f}{3:>9.2f}x".format(
+            label, before / NUMBER * 1e6, after / NUMBER * 1e6,
+            before / after))
+
+if __name__ == "__main__":
+    backend = ahk.get_backend()
+    if isinstance(backend, ahk.DllBackend):
+        ahk.start()
+        ahk.ready()
+        print("Timing AutoHotkey.dll exports")
+        run(*dll_exports(backend.dll))
+        ahk.terminate()
+    else:
+        print("AutoHotkey.dll not loaded, timing libc stand-ins")
+        run(*standin_exports())
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Benchmark Script variable attribute reads and writes.
+
+Script variables used to be looked up in a name -> kind dict by
+``__getattr__``/``__setattr__``, formatting the read command on every access.
+That dispatch is reproduced here by the `Legacy` class and timed
+against the bindings created by :meth:`ahk.Script.variable`, uncached and
+with ``cache=True``. Each case runs 100k accesses.
+
+Run from the repository root::
+
+    python bench/variables.py
+    PYAHK_BACKEND=simulated python bench/variables.py
+"""
+import os, sys, time
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    sys.path = [os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))] + sys.path
+    import ahk
+
+NUMBER = 100000
+
+class Legacy(object):
+    """Variable access of Script as it was, on top of a Script's engine."""
+
+    def __init__(self, script, kinds):
+        self._engine = script.engine
+        self._tmpname = script._tmpname
+        self._vars = kinds # name -> kind
+        self._funcs = {}
+
+    def __getattr__(self, name):
+        if name in self._vars:
+            with self._engine:
+                ahk.execute("{0} := {1}".format(self._tmpname, name))
+                return self._vars[name](ahk.get(self._tmpname))
+        elif name in self._funcs:
+            return self._funcs[name]
+        else:
+            raise AttributeError("No variable named {0}!".format(name))
+
+    def __setattr__(self, name, value):
+        if name[0] == '_' or name in self.__dict__:
+            super(Legacy, self).__setattr__(name, value)
+        elif name in self._vars:
+            with self._engine:
+                ahk.set(name, value)
+        elif name in self._funcs:
+            raise AttributeError("Can't assign to function {0}!".format(name))
+        else:
+            raise AttributeError("No variable named {0}!".format(name))
+
+def timed(func):
+    """:returns: Accesses per second of NUMBER func() calls."""
+    start = time.perf_counter()
+    for i in range(NUMBER):
+        func()
+    return NUMBER / (time.perf_counter() - start)
+
+def run():
+    script = ahk.Script()
+    script.variable('plain', int, 1)
+    script.variable('cached', int, 1, cache=True)
+    legacy = Legacy(script, {'plain': int})
+    cases = (
+        ("legacy read", lambda: legacy.plain),
+        ("read", lambda: script.plain),
+        ("cached read", lambda: script.cached),
+        ("legacy write", lambda: setattr(legacy, 'plain', 5)),
+        ("write", lambda: setattr(script, 'plain', 5)),
+        ("cached write", lambda: setattr(script, 'cached', 5)),
+    )
+    print("{0:<14}{1:>14}".format("access", "per sec"))
+    for label, func in cases:
+        print("{0:<14}{1:>14.0f}".format(label, timed(func)))
+
+if __name__ == "__main__":
+    print("Backend: {0}".format(type(ahk.get_backend()).__name__))
+    run()
+    ahk.terminate()
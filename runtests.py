@@ -9,8 +9,10 @@ cwd = os.getcwd()
 # Append the inner package folder to the path so test can access internals
 sys.path.append(os.path.join(cwd, 'ahk'))
 
-# Gather tests
-from test import all_tests
+# Process pool workers import this module again, they must not run the tests
+if __name__ == "__main__":
+    # Gather tests
+    from test import all_tests
 
-# Run tests
-unittest.TextTestRunner(verbosity=2).run(all_tests)
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
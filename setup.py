@@ -20,6 +20,7 @@ setup(name='pyahk',
 					'LICENSE_pyahk.txt',
                     'runtests.py'
                    ])],
+      python_requires='>=3.4',
       keywords=['Windows','Automation','AutoHotKey'],
       classifiers=[
           'Development Status :: 3 - Alpha',
@@ -28,9 +29,9 @@ setup(name='pyahk',
           'License :: OSI Approved :: BSD License',
           'Operating System :: Microsoft :: Windows',
           'Programming Language :: Python',
-          'Programming Language :: Python :: 2.7',
 		  'Programming Language :: Python :: 3',
-		  'Programming Language :: Python :: 3.3',
+		  'Programming Language :: Python :: 3 :: Only',
+		  'Programming Language :: Python :: 3.4',
           'Topic :: Software Development :: Testing',
           'Topic :: Software Development :: Libraries :: Python Modules',
           'Topic :: Utilities',
@@ -3,11 +3,23 @@ from __future__ import absolute_import, print_function, division, unicode_litera
 
 """Bundle tests as a module."""
 import unittest
-import test.ahk, test.script, test.control
+import test.ahk, test.script, test.control, test.simulated, test.aio, test.dispatch, test.pool, test.cache, test.capture, test.color, test.watch, test.callbacks, test.macro, test.gesture, test.command
 
 # Gather all sub-tests into one suite
 all_tests = unittest.TestSuite([
     test.ahk.all_tests,
     test.script.all_tests,
     test.control.all_tests,
+    test.simulated.all_tests,
+    test.aio.all_tests,
+    test.dispatch.all_tests,
+    test.pool.all_tests,
+    test.cache.all_tests,
+    test.capture.all_tests,
+    test.color.all_tests,
+    test.watch.all_tests,
+    test.callbacks.all_tests,
+    test.macro.all_tests,
+    test.gesture.all_tests,
+    test.command.all_tests,
 ])
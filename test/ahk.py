@@ -2,8 +2,14 @@
 from __future__ import absolute_import, print_function, division, unicode_literals
 
 """Test AutoHotKey low-level wrappers."""
-import os, time, ctypes
+import os, time, ctypes, gc, tempfile
 import unittest
+try:
+    # The mock library was accepted as part of the Python Std. Library in V3.3
+    from unittest import mock
+except ImportError:
+    # Fall back to the back-ported version
+    import mock
 try:
     import ahk
 except ImportError:
@@ -285,6 +291,157 @@ class Test_lowlevel(unittest.TestCase):
         self.assertEqual(res, "10",
                          msg="Value={0}, line not executed?".format(res))
 
+    def test_13_execute_many(self):
+        """Testing batched execution with per-line status."""
+        ahk.start()
+        ahk.ready()
+        backend = ahk.get_backend()
+        before = getattr(backend, 'crossings', 0)
+        lines = ["test{0} := {0}".format(i) for i in range(50)]
+        results = ahk.execute_many(lines)
+        self.assertEqual(results, [True]*50,
+                         msg="Unexpected batch results {0}!".format(results))
+        if hasattr(backend, 'crossings'):
+            self.assertEqual(backend.crossings - before, 2,
+                             msg="Batch used more than two engine calls!")
+        self.assertEqual(ahk.get("test49"), "49", msg="Batch not executed?")
+        # A line that fails to load stops execution before it
+        results = ahk.execute_many(["a := 1", "b := (", "c := 3"])
+        self.assertEqual(results, [True, False, None],
+                         msg="Unexpected batch results {0}!".format(results))
+        self.assertEqual((ahk.get("a"), ahk.get("c")), ("1", ""),
+                         msg="Wrong lines executed around failure!")
+        # Grouping into several engine calls
+        results = ahk.execute_many(["x := 1", "x += 1", "x += 1"], size=2)
+        self.assertEqual(results, [True]*3, msg="Grouped batch failed!")
+        self.assertEqual(ahk.get("x"), "3", msg="Grouped batch not executed?")
+
+    def test_14_batch(self):
+        """Testing the Batch context manager."""
+        ahk.start()
+        ahk.ready()
+        ahk.set("test", 0)
+        with ahk.Batch() as batch:
+            for i in range(10):
+                self.assertTrue(ahk.execute("test := test+1"),
+                                msg="Queued execute reported failure!")
+            self.assertEqual(len(batch.lines), 10, msg="Commands not queued!")
+            # Reading flushes queued commands first
+            self.assertEqual(ahk.get("test"), "10", msg="Read before flush!")
+            ahk.execute("test := test+1")
+            ahk.execute("nonexistent_function()")
+        self.assertEqual(ahk.get("test"), "11", msg="Batch not flushed on exit!")
+        self.assertEqual(batch.failed, 11,
+                         msg="Failed line {0} not reported!".format(batch.failed))
+        self.assertEqual(len(batch.results), 12, msg="Missing line results!")
+
+    def test_15_setget_many(self):
+        """Testing bulk variable access with set_many/get_many."""
+        ahk.start()
+        ahk.ready()
+        values = {
+            "plain": "value",
+            "lines": "one\ntwo\r\nthree",
+            "colons": "3:abc:#",
+            "hashes": "#1#",
+            "digits": "12",
+            "empty": "",
+            "emoji": "\U0001F600 smile \U0001F600",
+        }
+        self.assertTrue(ahk.set_many(values), msg="set_many failed!")
+        for name, value in values.items():
+            self.assertEqual(ahk.get(name), value,
+                msg="set_many stored {0!r} for {1}!".format(
+                    ahk.get(name), name))
+        self.assertEqual(ahk.get_many(values), values,
+                         msg="get_many values don't match!")
+        self.assertEqual(ahk.get_many(["missing"]), {"missing": ""},
+                         msg="Unset variable not empty!")
+        self.assertEqual(ahk.get_many([]), {}, msg="Empty get_many failed!")
+        # Helpers are re-installed after a restart
+        ahk.reload()
+        ahk.ready()
+        self.assertTrue(ahk.set_many([("plain", 5)]),
+                        msg="set_many failed after reload!")
+        self.assertEqual(ahk.get_many(["plain"]), {"plain": "5"},
+                         msg="get_many failed after reload!")
+        # Failing installed helpers aren't installed again
+        backend = ahk.get_backend()
+        installs = []
+        add_script = backend.add_script
+        backend.add_script = lambda script: (installs.append(script) or
+                                             add_script(script))
+        try:
+            self.assertFalse(ahk.set_many({"bad name": 1}),
+                             msg="set_many of a bad name succeeded!")
+        finally:
+            del backend.add_script
+        self.assertEqual(installs, [], msg="Installed helpers reinstalled!")
+        self.assertEqual(ahk.get_many(["plain"]), {"plain": "5"},
+                         msg="get_many failed after a failed set_many!")
+
+    def test_16_backoff(self):
+        """Testing the readiness backoff policy and deadline."""
+        delays = list(ahk.Backoff(0.001, 2, 0.004).delays(retries=6))
+        self.assertEqual(delays, [0.001, 0.002, 0.004, 0.004, 0.004],
+                         msg="Wrong backoff delays {0}!".format(delays))
+        start = time.time()
+        self.assertFalse(ahk.ready(timeout=0.05),
+                         msg="Un-initialized library reports ready?")
+        elapsed = time.time() - start
+        self.assertTrue(0.05 <= elapsed < 0.5,
+                        msg="Deadline missed, waited {0}s!".format(elapsed))
+        ahk.start()
+        self.assertTrue(ahk.ready(timeout=5),
+                        msg="Library Un-initialized after 5 seconds?")
+        self.assertTrue(0 <= ahk.startup_time() < 5,
+                        msg="Startup time not recorded!")
+
+    def test_17_resolve_func(self):
+        """Testing cached function handles."""
+        ahk.start()
+        ahk.ready()
+        ahk.add_lines("""
+                      Add(x, y=1) {
+                          return (x + y)
+                      }
+                      Sum(a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11, a12) {
+                          return a1+a2+a3+a4+a5+a6+a7+a8+a9+a10+a11+a12
+                      }
+                      """)
+        self.assertIsNone(ahk.resolve_func("nonexistent"),
+                          msg="Handle returned for missing function!")
+        add = ahk.resolve_func("Add")
+        self.assertIs(ahk.resolve_func("Add"), add, msg="Handle not cached!")
+        self.assertEqual(add(2, 3), "5", msg="Wrong handle call result!")
+        self.assertEqual(add(2), "3", msg="Default argument not used!")
+        self.assertEqual(ahk.call("Add", 4, 4), "8",
+                         msg="Wrong call result through cached handle!")
+        self.assertTrue(add.post(1), msg="Posting to handle failed!")
+        # Overlapping calls each keep their own arguments
+        backend = ahk.current_engine().backend
+        call = backend.call
+        def reenter(func, params):
+            if params[0] == "1":
+                add(7, 7)
+            return call(func, params)
+        with mock.patch.object(backend, 'call', side_effect=reenter):
+            self.assertEqual(add(1, 2), "3",
+                             msg="Arguments clobbered by an overlapping call!")
+        # More than 10 arguments
+        self.assertEqual(ahk.call("Sum", *range(1, 13)), "78",
+                         msg="Call with 12 arguments failed!")
+        self.assertEqual(ahk.resolve_func("Sum")(*range(12)), "66",
+                         msg="Handle call with 12 arguments failed!")
+        self.assertEqual(ahk.call("nonexistent", *range(12)), "",
+                         msg="Call to missing function returned a value!")
+        # Handles are dropped on reload
+        ahk.reload()
+        ahk.ready()
+        self.assertFalse(add.valid, msg="Handle valid after reload!")
+        self.assertIsNone(ahk.resolve_func("Add"),
+                          msg="Function resolved after reload!")
+
     def tearDown(self):
         """Clean test environment."""
         # This fails if the terminate function fails.
@@ -292,10 +449,108 @@ class Test_lowlevel(unittest.TestCase):
         if os.path.exists(self.tempfilename):
             os.remove(self.tempfilename)
 
+class Test_prototypes(unittest.TestCase):
+    """Test the dll export binding table."""
+
+    def test_00_bind(self):
+        """Testing prototypes are applied to dll exports."""
+        class Export(object):
+            """Stand-in for a ctypes function pointer."""
+        class Dll(object):
+            """Stand-in for a loaded dll missing some exports."""
+            ahkExec = Export()
+            ahkgetvar = Export()
+            ahkExecuteLine = Export()
+
+        bound = ahk.backend.bind(Dll)
+        self.assertEqual(sorted(bound), ['ahkExec', 'ahkExecuteLine', 'ahkgetvar'],
+                         msg="Unexpected exports bound: {0}!".format(bound))
+        self.assertEqual(Dll.ahkExec.argtypes, (ctypes.c_wchar_p,),
+                         msg="Wrong ahkExec argtypes!")
+        self.assertEqual(Dll.ahkgetvar.restype, ctypes.c_wchar_p,
+                         msg="ahkgetvar doesn't return text!")
+
+    def test_01_pointer_width(self):
+        """Testing pointer results aren't truncated."""
+        table = ahk.backend.prototypes()
+        for name in ('ahkdll', 'ahktextdll', 'addFile', 'addScript',
+                     'ahkFindFunc', 'ahkFindLabel', 'ahkExecuteLine'):
+            restype = table[name][0]
+            self.assertEqual(ctypes.sizeof(restype),
+                             ctypes.sizeof(ctypes.c_void_p),
+                             msg="{0} result isn't pointer sized!".format(name))
+        self.assertEqual(ctypes.sizeof(table['ahkExecuteLine'][1][0]),
+                         ctypes.sizeof(ctypes.c_void_p),
+                         msg="Line address argument isn't pointer sized!")
+
+    def test_02_ansi(self):
+        """Testing text arguments of ANSI builds are encoded."""
+        table = ahk.backend.prototypes(unicode=False)
+        text = table['ahkExec'][1][0]
+        param = text.from_param("x := 1")
+        self.assertEqual(param._obj, b"x := 1",
+                         msg="Text not encoded for ANSI dll!")
+
+class Test_copies(unittest.TestCase):
+    """Test the dll copies loaded for new engines."""
+
+    def setUp(self):
+        """Stand in for the dll, a copy of a dummy file is loaded."""
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "AutoHotkey.dll")
+        with open(self.path, "w") as dll:
+            dll.write("MZ")
+        self.patches = [mock.patch("ctypes.cdll.LoadLibrary"),
+                        mock.patch("ahk.ahk.DllBackend"),
+                        mock.patch("ahk.ahk._unload_dll")]
+        self.load, self.backend, self.unload = [patch.start()
+                                                for patch in self.patches]
+
+    def test_00_close(self):
+        """Testing Engine.close removes the dll copy."""
+        engine = ahk.Engine(path=self.path)
+        copy = self.load.call_args[0][0]
+        self.assertTrue(os.path.exists(copy), msg="Dll not copied!")
+        engine.close()
+        self.assertFalse(os.path.exists(os.path.dirname(copy)),
+                         msg="Copy folder left after close!")
+        self.unload.assert_called_once_with(self.backend.return_value.dll)
+        engine.close()
+        self.assertEqual(self.unload.call_count, 1, msg="Copy unloaded twice!")
+
+    def test_01_collect(self):
+        """Testing a collected Engine removes its dll copy."""
+        engine = ahk.Engine(path=self.path)
+        copy = self.load.call_args[0][0]
+        del engine
+        gc.collect()
+        self.assertFalse(os.path.exists(os.path.dirname(copy)),
+                         msg="Copy folder left after collection!")
+        self.assertEqual(self.unload.call_count, 1, msg="Copy not unloaded!")
+
+    def test_02_failed_load(self):
+        """Testing the copy of a dll failing to load is removed."""
+        self.load.side_effect = OSError("Not a dll")
+        self.assertRaises(OSError, ahk.Engine, path=self.path)
+        copy = self.load.call_args[0][0]
+        self.assertFalse(os.path.exists(os.path.dirname(copy)),
+                         msg="Copy folder left after failed load!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        for patch in self.patches:
+            patch.stop()
+        os.remove(self.path)
+        os.rmdir(self.folder)
+
 # Assemble test suites
 lowlevel_suite = unittest.TestLoader().loadTestsFromTestCase(Test_lowlevel)
+prototypes_suite = unittest.TestLoader().loadTestsFromTestCase(Test_prototypes)
+copies_suite = unittest.TestLoader().loadTestsFromTestCase(Test_copies)
 all_tests = unittest.TestSuite([
                                 lowlevel_suite, 
+                                prototypes_suite,
+                                copies_suite,
                               ])
 if __name__ == "__main__":
     # Run tests
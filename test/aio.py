@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test the asyncio front end against the simulated engine."""
+import asyncio, os, threading
+import unittest
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk import aio
+from ahk.simulated import SimulatedBackend, WindowControl
+
+class Test_aio(unittest.TestCase):
+    """Test awaitable wrappers run on the engine thread."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.backend = SimulatedBackend()
+        self.previous = ahk.set_backend(self.backend)
+
+    def test_00_wrappers(self):
+        """Testing awaitable low-level wrappers."""
+        async def main():
+            await aio.start()
+            self.assertTrue(await aio.ready(timeout=5),
+                            msg="Engine not ready!")
+            thread = await aio.run(threading.current_thread)
+            self.assertNotEqual(thread, threading.current_thread(),
+                                msg="Engine call ran on the event loop!")
+            self.assertIs(await aio.run(threading.current_thread), thread,
+                          msg="Engine calls moved between threads!")
+            self.assertTrue(await aio.execute("x := 6 * 7"),
+                            msg="Execute failed!")
+            self.assertEqual(await aio.get("x"), "42", msg="Wrong value!")
+            self.assertTrue(await aio.set_many({"a": 1, "b": 2}),
+                            msg="set_many failed!")
+            self.assertEqual(await aio.get_many(["a", "b"]),
+                             {"a": "1", "b": "2"}, msg="get_many failed!")
+            # Calls from concurrent tasks are serialized on the engine thread
+            await asyncio.gather(*[aio.execute("x += 1") for i in range(20)])
+            self.assertEqual(await aio.get("x"), "62", msg="Lost updates!")
+        asyncio.run(main())
+
+    def test_01_script(self):
+        """Testing awaitable Script and Control methods."""
+        desktop = self.backend.desktop
+        desktop.add_window("Form", controls=[WindowControl("Edit1")])
+        async def main():
+            script = await aio.Script.create(timeout=5)
+            await script.send("abc")
+            self.assertEqual(desktop.events[-1][:3],
+                             ('send', 'sendinput', 'abc'),
+                             msg="Send not executed!")
+            self.assertTrue(await script.winExist("Form"),
+                            msg="Window not found!")
+            await script.setvar("Clipboard", "copied")
+            self.assertEqual(await script.getvar("Clipboard"), "copied",
+                             msg="Variable access failed!")
+            ctl = await aio.Control.create(script, "Form")
+            await ctl.setText("Edit1", "hello")
+            form = desktop.window(ctl.wrapped.hwnd)
+            self.assertEqual(form.control("Edit1").text, "hello",
+                             msg="ControlSetText failed!")
+            with self.assertRaises(AttributeError):
+                script.bogus
+        asyncio.run(main())
+
+    def test_02_waits(self):
+        """Testing waits don't block the loop and can be cancelled."""
+        desktop = self.backend.desktop
+        async def main():
+            script = await aio.Script.create(timeout=5)
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, desktop.add_window, "Later")
+            self.assertTrue(await script.waitWindow("Later", timeout=5),
+                            msg="Window never appeared!")
+            self.assertFalse(await script.waitActive("Missing", timeout=0.05),
+                             msg="Missing window reported active!")
+            task = loop.create_task(script.waitWindow("Missing", timeout=None))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            loop.call_later(0.05, desktop.fill, 0, 0, 2, 2, (255, 0, 0))
+            self.assertTrue(await script.waitPixel(1, 1, interval=0.01,
+                                                   timeout=5),
+                            msg="Pixel change not seen!")
+        asyncio.run(main())
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        aio.shutdown()
+        ahk.set_backend(self.previous)
+
+# Assemble test suites
+aio_suite = unittest.TestLoader().loadTestsFromTestCase(Test_aio)
+all_tests = unittest.TestSuite([
+                                aio_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test bounded caches and memoized functions."""
+import os
+import unittest
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk.cache import Cache
+
+class Test_Cache(unittest.TestCase):
+    """Test LRU and TTL eviction."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.now = 0.0
+        self.cache = Cache(3, ttl=10, clock=lambda: self.now)
+
+    def test_00_lru(self):
+        """Testing least recently used entries are evicted."""
+        for key in "abc":
+            self.cache.put(key, key.upper())
+        self.assertEqual(self.cache.get("a"), "A", msg="Entry missing!")
+        self.cache.put("d", "D")
+        self.assertNotIn("b", self.cache, msg="LRU entry not evicted!")
+        self.assertEqual([self.cache.get(key) for key in "acd"],
+                         ["A", "C", "D"], msg="Wrong entry evicted!")
+        self.assertEqual(self.cache.get("b", "missing"), "missing",
+                         msg="Default not returned!")
+        self.assertEqual(self.cache.stats(),
+                         dict(hits=4, misses=1, evictions=1, expirations=0,
+                              entries=3), msg="Wrong statistics!")
+
+    def test_01_ttl(self):
+        """Testing entries expire."""
+        self.cache.put("a", None)
+        self.now = 5.0
+        self.cache.put("b", 2)
+        self.assertIsNone(self.cache.get("a", 0), msg="Entry expired early!")
+        self.now = 12.0
+        self.assertEqual((self.cache.get("a", 0), self.cache.get("b", 0)),
+                         (0, 2), msg="Entry not expired!")
+        self.assertEqual(self.cache.stats()['expirations'], 1,
+                         msg="Expiry not counted!")
+
+    def test_02_invalidate(self):
+        """Testing explicit invalidation."""
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.assertTrue(self.cache.invalidate("a"), msg="Entry not dropped!")
+        self.assertFalse(self.cache.invalidate("a"),
+                         msg="Missing entry reported dropped!")
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0, msg="Cache not cleared!")
+
+class Test_Memoize(unittest.TestCase):
+    """Test memoized Function calls."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.script = ahk.Script()
+        ahk.set("calls", 0)
+
+    def test_00_function(self):
+        """Testing memoized calls don't reach the engine."""
+        twice = self.script.function('Twice', int, '(x)',
+                                     'global calls\ncalls += 1\nreturn x * 2',
+                                     cache=2)
+        self.assertEqual([twice(1), twice('1'), twice(2), twice(1)],
+                         [2, 2, 4, 2], msg="Wrong results!")
+        self.assertEqual(ahk.get("calls"), "2", msg="Calls not memoized!")
+        twice(3) # Evicts 2
+        self.assertEqual(twice(2), 4, msg="Wrong result after eviction!")
+        self.assertEqual(ahk.get("calls"), "4", msg="Entry not evicted!")
+        twice.invalidate(2)
+        twice(2)
+        self.assertEqual(ahk.get("calls"), "5", msg="Entry not invalidated!")
+        twice.invalidate()
+        self.assertEqual(len(twice.cache), 0, msg="Cache not cleared!")
+        self.assertEqual(twice.cache.stats()['hits'], 2,
+                         msg="Wrong hit count!")
+
+    def test_01_uncached(self):
+        """Testing functions aren't memoized by default."""
+        count = self.script.function('Count', int, '()',
+                                     'global calls\nreturn ++calls')
+        self.assertIsNone(count.cache, msg="Function memoized by default!")
+        self.assertEqual([count(), count()], [1, 2], msg="Call memoized!")
+        self.assertRaises(ValueError, self.script.function('Bad', int,
+                          '()', 'return "x"', cache=True))
+        self.assertEqual(self.script.Bad.cache.stats()['entries'], 0,
+                         msg="Failed conversion cached!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+
+# Assemble test suites
+cache_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Cache)
+memoize_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Memoize)
+all_tests = unittest.TestSuite([
+                                cache_suite,
+                                memoize_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test calling Python from AHK code."""
+import os
+import threading
+import unittest
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk.callbacks import CallbackRegistry
+from ahk.simulated import SimulatedBackend
+
+class Test_Callbacks(unittest.TestCase):
+    """Test CallbackRegistry trampolines on the simulated engine."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.previous = ahk.set_backend(SimulatedBackend())
+        self.script = ahk.Script()
+        self.calls = []
+        self.called = threading.Event()
+
+    def handler(self, *args):
+        self.calls.append(args)
+        self.called.set()
+
+    def test_00_call(self):
+        """Testing AHK code calls Python."""
+        registry = self.script.callbacks()
+        self.assertIs(self.script.callbacks(), registry,
+                      msg="Registry not shared!")
+        def saved(path, size):
+            self.handler(path, size)
+        self.assertEqual(registry.register(saved, "OnSaved"), "OnSaved",
+                         msg="Wrong function name!")
+        ahk.execute('queued := OnSaved("C:\\a;b.txt", 3 * 4)')
+        self.assertTrue(self.called.wait(5), msg="Callback not run!")
+        self.assertEqual(self.calls, [("C:\\a;b.txt", "12")],
+                         msg="Wrong arguments!")
+        self.assertEqual(ahk.get("queued"), "1", msg="Call not queued!")
+        # Missing arguments are blank, text is passed unchanged
+        self.called.clear()
+        ahk.execute('OnSaved("line`nbreak ""quoted"" \u263a")')
+        self.assertTrue(self.called.wait(5), msg="Callback not run!")
+        self.assertEqual(self.calls[-1], ('line\nbreak "quoted" \u263a', ""),
+                         msg="Text changed in transit!")
+        registry.shutdown()
+        metrics = registry.metrics()
+        self.assertEqual((metrics['calls'], metrics['delivered'],
+                          metrics['handlers']), (2, 2, {'OnSaved': 2}),
+                         msg="Wrong metrics {0}!".format(metrics))
+        self.assertTrue(0 <= metrics['latency_mean'] <= metrics['latency_max'],
+                        msg="Wrong latencies!")
+
+    def test_01_bounded(self):
+        """Testing slow handlers don't block the engine."""
+        release = threading.Event()
+        def slow():
+            self.called.set()
+            release.wait(5)
+        with CallbackRegistry(size=2) as registry:
+            registry.register(slow, "Slow")
+            ahk.execute("queued := Slow()")
+            results = [ahk.get("queued")]
+            self.assertTrue(self.called.wait(5), msg="Callback not run!")
+            for i in range(5):
+                ahk.execute("queued := Slow()")
+                results.append(ahk.get("queued"))
+            # One call is being handled, two are queued
+            self.assertEqual(results.count("1"), 3, msg="Wrong queue bound!")
+            metrics = registry.metrics()
+            self.assertEqual((metrics['dropped'], metrics['max_depth']), (3, 2),
+                             msg="Wrong metrics {0}!".format(metrics))
+            release.set()
+        self.assertEqual(registry.metrics()['delivered'], 3,
+                         msg="Queued calls not handled!")
+
+    def test_02_errors(self):
+        """Testing handler errors are counted."""
+        registry = CallbackRegistry()
+        def broken(value):
+            self.called.set()
+            raise ValueError(value)
+        registry.register(broken)
+        ahk.execute('broken("oops")')
+        registry.shutdown()
+        self.assertEqual(registry.metrics()['errors'], 1,
+                         msg="Error not counted!")
+        self.assertEqual(str(registry.last_error), "oops",
+                         msg="Wrong error kept!")
+        self.assertRaises(RuntimeError, registry.register, broken)
+
+    def test_03_shared_engine(self):
+        """Testing registries sharing an engine keep their calls apart."""
+        first, second = CallbackRegistry(), CallbackRegistry()
+        self.addCleanup(first.shutdown)
+        self.addCleanup(second.shutdown)
+        other = []
+        first.register(lambda value: self.handler(value), "First")
+        second.register(lambda value: other.append(value), "Second")
+        ahk.execute('First("one")')
+        self.assertTrue(self.called.wait(5), msg="First callback not run!")
+        ahk.execute('Second("two")')
+        first.shutdown()
+        second.shutdown()
+        self.assertEqual((self.calls, other), ([("one",)], ["two"]),
+                         msg="Calls crossed registries!")
+        self.assertEqual((first.metrics()['calls'], second.metrics()['calls']),
+                         (1, 1), msg="Calls routed to the wrong trampoline!")
+
+    def test_04_full_shutdown(self):
+        """Testing shutdown doesn't block on a full queue."""
+        release = threading.Event()
+        def slow():
+            self.called.set()
+            release.wait(5)
+        registry = CallbackRegistry(size=1, workers=2)
+        registry.register(slow, "Slow")
+        for i in range(2):
+            ahk.execute("Slow()")
+            self.assertTrue(self.called.wait(5), msg="Callback not run!")
+            self.called.clear()
+        ahk.execute("Slow()")
+        self.assertEqual(registry.metrics()['depth'], 1, msg="Queue not full!")
+        stopper = threading.Thread(target=registry.shutdown,
+                                   kwargs=dict(wait=False))
+        stopper.start()
+        stopper.join(5)
+        self.assertFalse(stopper.is_alive(), msg="Shutdown blocked!")
+        release.set()
+        for thread in registry._threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive(), msg="Worker not stopped!")
+        self.assertEqual(registry.metrics()['delivered'], 3,
+                         msg="Queued calls not handled!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        ahk.set_backend(self.previous)
+
+# Assemble test suites
+callbacks_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Callbacks)
+all_tests = unittest.TestSuite([
+                                callbacks_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test screen region capture."""
+import os
+import unittest
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk import capture
+from ahk.simulated import Desktop, SimulatedBackend
+
+class Test_Capture(unittest.TestCase):
+    """Test capturing from the synthetic and engine pixel sources."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.backend = SimulatedBackend(Desktop(width=64, height=48))
+        self.previous = ahk.set_backend(self.backend)
+        self.desktop = self.backend.desktop
+        self.desktop.fill(10, 5, 4, 3, (200, 100, 50))
+        self.desktop.set_pixel(0, 0, (1, 2, 3))
+        self.script = ahk.Script()
+
+    def test_00_frame(self):
+        """Testing frames of the synthetic desktop."""
+        frame = self.script.capture(8, 4, 8, 6)
+        self.assertIsInstance(frame.data, bytearray, msg="Not a buffer!")
+        self.assertEqual(len(frame.data), 8 * 6 * 3, msg="Wrong size!")
+        self.assertEqual(frame.pixel(10, 5), (200, 100, 50),
+                         msg="Wrong pixel color!")
+        self.assertEqual(frame.pixel(9, 5), self.desktop.background,
+                         msg="Wrong background color!")
+        view = frame.view
+        self.assertEqual(view.shape, (6, 8, 3), msg="Wrong view shape!")
+        self.assertEqual((view[1, 2, 0], view[1, 2, 1], view[1, 2, 2]),
+                         (200, 100, 50), msg="Wrong view contents!")
+        self.assertRaises(IndexError, frame.pixel, 0, 0)
+        # Pixels off screen are black
+        edge = self.script.capture(-2, -1, 4, 2)
+        self.assertEqual((edge.pixel(-1, -1), edge.pixel(0, 0)),
+                         ((0, 0, 0), (1, 2, 3)), msg="Wrong edge pixels!")
+
+    def test_01_engine(self):
+        """Testing engine captures match in a single engine call."""
+        engine = capture.EngineCapturer()
+        self.script.capture(0, 0, 1, 1, engine) # Installs the helper
+        before = self.backend.crossings
+        frame = self.script.capture(-2, -1, 20, 10, engine)
+        self.assertEqual(self.backend.crossings - before, 1,
+                         msg="Capture took several engine calls!")
+        self.assertEqual(frame.data, self.script.capture(-2, -1, 20, 10).data,
+                         msg="Engine and synthetic captures differ!")
+        self.assertEqual(frame.pixel(11, 6), self.script.getPixel(11, 6),
+                         msg="Capture differs from getPixel!")
+
+    def test_02_swap(self):
+        """Testing the capturer can be swapped."""
+        other = Desktop(width=4, height=4, background=(9, 9, 9))
+        previous = capture.set_capturer(capture.SyntheticCapturer(other))
+        try:
+            self.assertEqual(self.script.capture(1, 1).pixel(1, 1),
+                             (9, 9, 9), msg="Capturer not used!")
+        finally:
+            capture.set_capturer(previous)
+        self.assertEqual(self.script.capture(0, 0).pixel(0, 0), (1, 2, 3),
+                         msg="Capturer not restored!")
+
+    @unittest.skipIf(capture.numpy is None, "NumPy not installed")
+    def test_03_numpy(self):
+        """Testing frames as NumPy arrays."""
+        frame = self.script.capture(8, 4, 8, 6)
+        array = frame.array()
+        self.assertEqual(array.shape, (6, 8, 3), msg="Wrong array shape!")
+        self.assertEqual(tuple(array[1, 2]), (200, 100, 50),
+                         msg="Wrong array contents!")
+        array[0, 0] = (7, 7, 7)
+        self.assertEqual(frame.pixel(8, 4), (7, 7, 7),
+                         msg="Array doesn't share the frame memory!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        ahk.set_backend(self.previous)
+
+# Assemble test suites
+capture_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Capture)
+all_tests = unittest.TestSuite([
+                                capture_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test color matching on captured frames."""
+import os
+import random
+import unittest
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk import color
+from ahk.capture import Frame
+
+class Test_Color(unittest.TestCase):
+    """Test color search against per pixel comparisons."""
+
+    def setUp(self):
+        """Configure test environment."""
+        rand = random.Random(7)
+        self.width, self.height = 40, 30
+        self.data = bytearray(rand.getrandbits(8)
+                              for i in range(self.width * self.height * 3))
+        self.data[3 * 75:3 * 76] = bytearray((200, 100, 50))
+        self.frame = Frame(self.data, 10, 20, self.width, self.height)
+
+    def pixels(self):
+        """:returns: Iterator of (x, y, (r, g, b)) of the frame."""
+        for i in range(self.width * self.height):
+            yield (10 + i % self.width, 20 + i // self.width,
+                   tuple(self.data[3 * i:3 * i + 3]))
+
+    def test_00_delta(self):
+        """Testing color errors."""
+        self.assertEqual(color.delta((0, 0, 0), (255, 255, 255)), 1.0,
+                         msg="Wrong maximal error!")
+        self.assertEqual(color.delta((1, 2, 3), (1, 2, 3)), 0.0,
+                         msg="Wrong error of equal colors!")
+        target = (200, 100, 50)
+        values = color.distances(self.frame, target)
+        self.assertEqual(list(values),
+                         [int(round(color.delta(rgb, target) * 765))
+                          for x, y, rgb in self.pixels()],
+                         msg="Wrong distances!")
+
+    def test_01_matches(self):
+        """Testing matches agree with comparing every pixel."""
+        targets = [(200, 100, 50), (0, 255, 0)]
+        for threshold in (0, 0.01, 0.1, 0.3, 1.0):
+            expected = [(x, y) for x, y, rgb in self.pixels()
+                        if any(color.delta(rgb, target) <= threshold
+                               for target in targets)]
+            self.assertEqual(self.frame.matches(targets, threshold), expected,
+                             msg="Wrong matches at {0}!".format(threshold))
+            self.assertEqual(self.frame.find(targets, threshold),
+                             expected[0] if expected else None,
+                             msg="Wrong first match at {0}!".format(threshold))
+            self.assertEqual(sum(color.mask(self.frame, targets, threshold)),
+                             len(expected), msg="Wrong mask!")
+
+    def test_02_exact(self):
+        """Testing exact and missing colors."""
+        self.assertEqual(self.frame.find((200, 100, 50), 0), (45, 21),
+                         msg="Exact color not found!")
+        # Threshold exactly on an error factor boundary
+        self.assertEqual(self.frame.find((200, 100, 53), 3 / 765.0), (45, 21),
+                         msg="Boundary color not found!")
+        self.assertEqual(self.frame.find((200, 100, 54), 3 / 765.0), None,
+                         msg="Color beyond the threshold found!")
+        self.assertEqual(self.frame.matches([], 1.0), [],
+                         msg="Matches without colors!")
+
+# Assemble test suites
+color_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Color)
+all_tests = unittest.TestSuite([
+                                color_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test escape-safe command templates."""
+import os
+import unittest
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk.command import Command, command, text
+from ahk.simulated import SimulatedBackend, WindowControl
+
+# Values which used to corrupt the commands of the wrappers
+ADVERSARIAL = ['a,b', '50% off', '%A_ScriptDir%', 'x ; comment', 'semi;colon',
+               'back`tick`n', 'quote "q" \'s\'', 'line1\nline2\r\nline3',
+               '  padded  ', '\ttab', ', leading comma', 'trailing comma,',
+               '% forced', '`', 'ahk_class, "x"', '☺ unicode']
+
+class Test_Command(unittest.TestCase):
+    """Test Command templates and the wrappers built on them."""
+
+    def test_00_text(self):
+        """Testing command arguments are escaped."""
+        self.assertEqual(text("plain words"), "plain words",
+                         msg="Plain text changed!")
+        self.assertEqual(text("a,b%c;d`e\nf\rg"), "a`,b`%c`;d``e`nf`rg",
+                         msg="Special characters not escaped!")
+        self.assertEqual(text(" a\"b "), '% " a""b "',
+                         msg="Blanks not kept with an expression!")
+        self.assertEqual((text(12), text(True), text(1.5)), ("12", "1", "1.5"),
+                         msg="Numbers not converted!")
+
+    def test_01_template(self):
+        """Testing templates are parsed once and memoized."""
+        cmd = command("Get, {var:name}, {0}, {title:expr}, {0}")
+        self.assertIs(command(cmd.template), cmd, msg="Template not cached!")
+        self.assertEqual(cmd.fields, ("_0", "var", "title"),
+                         msg="Wrong fields!")
+        self.assertEqual(cmd.format("a,b", "out", 'say "hi"'),
+                         'Get, out, a`,b, "say ""hi""", a`,b',
+                         msg="Wrong command!")
+        self.assertEqual(cmd.format("x", title="t", var="v"),
+                         'Get, v, x, "t", x', msg="Keywords not accepted!")
+        self.assertIs(cmd.format("a,b", "out", 'say "hi"'),
+                      cmd.format("a,b", "out", 'say "hi"'),
+                      msg="Command not memoized!")
+        self.assertRaises(TypeError, cmd.format, "x", "v")
+        self.assertRaises(TypeError, cmd.format, "x", "v", "t", title="t")
+        echo = command("Echo {}")
+        self.assertEqual([echo.format(value) for value in (1, 1.0, True, 0.0)],
+                         ["Echo 1", "Echo 1.0", "Echo 1", "Echo 0.0"],
+                         msg="Equal values of other types mixed up!")
+        self.assertEqual(command("Echo {}").format(["a", 1]), "Echo ['a'`, 1]",
+                         msg="Unhashable value failed!")
+        self.assertEqual(command("Plain").format(), "Plain",
+                         msg="Template without fields failed!")
+        for template in ("Bad {0:upper}", "Bad {0!r}", "Bad {1}",
+                         "Bad {_key}", "Bad {class}", "Bad {a.b}", "Bad {"):
+            self.assertRaises(ValueError, Command, template)
+
+class Test_Wrappers(unittest.TestCase):
+    """Test the wrappers built on Command templates."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.backend = SimulatedBackend()
+        self.previous = ahk.set_backend(self.backend)
+        self.script = ahk.Script()
+
+    def test_00_adversarial(self):
+        """Testing wrappers pass adversarial values unchanged."""
+        desktop = self.backend.desktop
+        script = self.script
+        ctl = ahk.Control(script, store=False, title="Form")
+        for value in ADVERSARIAL:
+            expected = value.replace("\r\n", "\n")
+            win = desktop.add_window(value)
+            form = desktop.add_window("Form", controls=[WindowControl("Edit1")])
+            script.send(value)
+            self.assertEqual(desktop.events[-1][2], value,
+                             msg="Send changed {0!r}!".format(value))
+            script.message(value, value)
+            self.assertEqual(desktop.messages[-1][:2], (value, value),
+                             msg="MsgBox changed {0!r}!".format(value))
+            # Window criteria are matched without surrounding blanks
+            if value == value.strip():
+                self.assertEqual(script.winExist(value), win.hwnd,
+                                 msg="WinExist failed {0!r}!".format(value))
+            ctl.setText("Edit1", value)
+            self.assertIn(form.control("Edit1").text, (value, expected),
+                          msg="ControlSetText changed {0!r}!".format(value))
+            desktop.close_window(form.hwnd)
+            desktop.close_window(win.hwnd)
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        ahk.set_backend(self.previous)
+
+# Assemble test suites
+command_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Command)
+wrappers_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Wrappers)
+all_tests = unittest.TestSuite([
+                                command_suite,
+                                wrappers_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test the thread-safe engine dispatcher."""
+import os, threading
+import unittest
+try:
+    # The mock library was accepted as part of the Python Std. Library in V3.3
+    from unittest import mock
+except ImportError:
+    # Fall back to the back-ported version
+    import mock
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk import dispatch
+from ahk.dispatch import Dispatcher
+from ahk.simulated import SimulatedBackend
+
+class Test_Dispatcher(unittest.TestCase):
+    """Test requests from many threads are serialized and coalesced."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.dispatcher = Dispatcher(batch_size=32)
+        self.dispatcher.submit(ahk.start).result()
+        self.assertTrue(self.dispatcher.submit(ahk.ready).result(),
+                        msg="Engine not ready!")
+
+    def hold(self):
+        """Block the worker until the returned event is set."""
+        release = threading.Event()
+        self.dispatcher.submit(release.wait, 5)
+        return release
+
+    def test_00_producers(self):
+        """Testing concurrent producers are serialized."""
+        self.dispatcher.set("x", 0).result()
+        release = self.hold()
+        futures = []
+        def produce():
+            futures.extend(self.dispatcher.execute("x += 1")
+                           for i in range(50))
+        threads = [threading.Thread(target=produce) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.dispatcher.metrics()['depth'], 400,
+                         msg="Requests not queued while the worker is busy!")
+        release.set()
+        self.assertTrue(all(future.result() for future in futures),
+                        msg="Execute request failed!")
+        self.assertEqual(self.dispatcher.get("x").result(), "400",
+                         msg="Lost updates!")
+        metrics = self.dispatcher.metrics()
+        self.assertEqual(metrics['coalesced'], 400 - 400 // 32 - 1,
+                         msg="Executes not coalesced: {0}".format(metrics))
+        self.assertEqual(metrics['max_depth'], 400, msg="Wrong max depth!")
+        self.assertEqual(metrics['depth'], 0, msg="Queue not drained!")
+        self.assertTrue(metrics['wait_max'] >= metrics['wait_mean'] > 0,
+                        msg="Wait times not recorded: {0}".format(metrics))
+
+    def test_01_failures(self):
+        """Testing failures are reported to their own future only."""
+        release = self.hold()
+        first = self.dispatcher.execute("a := 1")
+        bad = self.dispatcher.execute("Bogus(")
+        last = self.dispatcher.execute("b := 2")
+        error = self.dispatcher.submit(int, "not a number")
+        cancelled = self.dispatcher.execute("c := 3")
+        self.assertTrue(cancelled.cancel(), msg="Queued request not cancelled!")
+        release.set()
+        self.assertEqual((first.result(), bad.result(), last.result()),
+                         (True, False, True), msg="Wrong execute results!")
+        self.assertRaises(ValueError, error.result)
+        self.assertEqual(self.dispatcher.get("b").result(), "2",
+                         msg="Request after a failure not executed!")
+        self.assertEqual(self.dispatcher.get("c").result(), "",
+                         msg="Cancelled request executed!")
+
+    def test_02_scripts(self):
+        """Testing Script methods from several threads."""
+        scripts = [self.dispatcher.submit(ahk.Script).result()
+                   for i in range(4)]
+        self.assertEqual(len(set(script._tmpname for script in scripts)), 4,
+                         msg="Scripts share scratch variables!")
+        for script in scripts:
+            self.dispatcher.submit(script.function, 'Twice', int, '(x)',
+                                   'return x * 2').result()
+        results = {}
+        def produce(index, script):
+            results[index] = [self.dispatcher.submit(script.Twice, i)
+                              for i in range(20)]
+        threads = [threading.Thread(target=produce, args=(i, script))
+                   for i, script in enumerate(scripts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for index, futures in results.items():
+            self.assertEqual([future.result() for future in futures],
+                             [i * 2 for i in range(20)],
+                             msg="Wrong results for script {0}!".format(index))
+
+    def test_03_raising(self):
+        """Testing an execute raising doesn't stop the worker."""
+        execute = ahk.ahk.execute
+        def fragile(script):
+            if script == "raise":
+                raise RuntimeError("engine gone")
+            return execute(script)
+        with mock.patch.object(ahk.ahk, 'execute', side_effect=fragile):
+            bad = self.dispatcher.execute("raise")
+            self.assertIsInstance(bad.exception(5), RuntimeError,
+                                  msg="Error not reported to the request!")
+            self.assertTrue(self.dispatcher.execute("y := 5").result(5),
+                            msg="Request after an error not run!")
+        self.assertEqual(self.dispatcher.get("y").result(5), "5",
+                         msg="Wrong value!")
+
+    def test_04_engine_calls(self):
+        """Testing batched executes count their engine calls."""
+        before = self.dispatcher.metrics()['engine_calls']
+        release = self.hold()
+        futures = [self.dispatcher.execute("z := {0}".format(i))
+                   for i in range(3)]
+        release.set()
+        self.assertTrue(all(future.result(5) for future in futures),
+                        msg="Execute request failed!")
+        # The hold, then running the batch and reading its progress marker
+        self.assertEqual(self.dispatcher.metrics()['engine_calls'] - before, 3,
+                         msg="Wrong engine call count!")
+
+    def test_05_shared(self):
+        """Testing engines share one dispatcher until closed."""
+        engine = ahk.Engine(SimulatedBackend())
+        shared = dispatch.shared(engine)
+        self.assertIs(dispatch.shared(engine), shared,
+                      msg="Dispatcher not shared!")
+        self.assertIsNot(dispatch.shared(), shared,
+                         msg="Dispatcher shared between engines!")
+        self.assertIs(shared.engine, engine, msg="Wrong engine!")
+        engine.close()
+        self.assertFalse(shared.thread.is_alive(),
+                         msg="Dispatcher left running by close!")
+        self.assertIsNot(dispatch.shared(engine), shared,
+                         msg="Shut down dispatcher reused!")
+        dispatch.shared(engine).shutdown()
+
+    def tearDown(self):
+        """Clean test environment."""
+        self.dispatcher.submit(ahk.terminate).result()
+        self.dispatcher.shutdown()
+        self.assertRaises(RuntimeError, self.dispatcher.execute, "x := 1")
+
+# Assemble test suites
+dispatch_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Dispatcher)
+all_tests = unittest.TestSuite([
+                                dispatch_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
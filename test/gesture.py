@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test batched mouse gestures."""
+import os
+import unittest
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk.gesture import coalesce
+from ahk.simulated import SimulatedBackend
+
+class Test_Gesture(unittest.TestCase):
+    """Test Gesture compilation and playback on the simulated engine."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.backend = SimulatedBackend()
+        self.previous = ahk.set_backend(self.backend)
+        self.script = ahk.Script()
+
+    def test_00_coalesce(self):
+        """Testing redundant moves are dropped within tolerance."""
+        line = [(i, 2 * i) for i in range(10)]
+        self.assertEqual(coalesce(line), [(0, 0), (9, 18)],
+                         msg="Collinear points kept!")
+        self.assertEqual(coalesce([(1, 1), (1, 1), (1, 1)]), [(1, 1), (1, 1)],
+                         msg="Repeated points kept!")
+        corner = [(0, 0), (5, 0), (10, 0), (10, 5), (10, 10)]
+        self.assertEqual(coalesce(corner), [(0, 0), (10, 0), (10, 10)],
+                         msg="Corner dropped!")
+        wobble = [(0, 0), (5, 1), (10, 0), (15, -1), (20, 0)]
+        self.assertEqual(coalesce(wobble, 2), [(0, 0), (20, 0)],
+                         msg="Points within tolerance kept!")
+        self.assertEqual(coalesce(wobble, 0.5),
+                         [(0, 0), (5, 1), (15, -1), (20, 0)],
+                         msg="Wrong points kept!")
+
+    def test_01_play(self):
+        """Testing a drag runs with one engine call."""
+        gesture = self.script.gesture(tolerance=1)
+        gesture.move(0, 0).press().path([(i, i) for i in range(1, 100)])
+        gesture.move(99, 120).release().click(5, 6, "right", 2)
+        before = self.backend.crossings
+        self.assertTrue(gesture.play(), msg="Gesture failed!")
+        self.assertEqual(self.backend.crossings - before, 1,
+                         msg="Gesture not a single engine call!")
+        self.assertEqual(self.backend.desktop.events, [
+            ('move', 0, 0), ('click', 'left', 0, 0, 1, 'down'),
+            ('move', 99, 99), ('move', 99, 120),
+            ('click', 'left', 99, 120, 1, 'up'),
+            ('click', 'right', 5, 6, 2, '')], msg="Wrong mouse events!")
+
+    def test_02_timing(self):
+        """Testing delays and relative moves split coalesced runs."""
+        gesture = self.script.gesture(interval=0.01, speed=5)
+        gesture.move(1, 1).move(2, 2).sleep(0.02).move(3, 3).move(2, 0, True)
+        self.assertEqual(gesture.compile(), [
+            "MouseMove, 1, 1, 5", "Sleep, 10", "MouseMove, 2, 2, 5",
+            "Sleep, 10", "Sleep, 20", "MouseMove, 3, 3, 5", "Sleep, 10",
+            "MouseMove, 2, 0, 5, R", "Sleep, 10"], msg="Wrong commands!")
+        self.assertTrue(gesture.play(), msg="Gesture failed!")
+        self.assertEqual(self.backend.desktop.mouse, (5, 3),
+                         msg="Relative move not applied!")
+        self.assertTrue(self.script.gesture().play(),
+                        msg="Empty gesture failed!")
+
+    def test_03_escape(self):
+        """Testing buttons and coordinates are escaped."""
+        gesture = self.script.gesture()
+        gesture.move("10%", 5).press("right, Up").release("x1;")
+        self.assertEqual(gesture.compile(), [
+            "MouseMove, 10`%, 5, 0", "Click right`, Up, Down", "Click x1`;, Up"],
+            msg="Values not escaped!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        ahk.set_backend(self.previous)
+
+# Assemble test suites
+gesture_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Gesture)
+all_tests = unittest.TestSuite([
+                                gesture_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
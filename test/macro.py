@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test compiled keystroke macros."""
+import os
+import unittest
+try:
+    # The mock library was accepted as part of the Python Std. Library in V3.3
+    from unittest import mock
+except ImportError:
+    import mock
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk import macro
+from ahk.macro import Keys, Macro
+from ahk.simulated import SimulatedBackend
+
+class Test_Macro(unittest.TestCase):
+    """Test Macro compilation and playback on the simulated engine."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.backend = SimulatedBackend()
+        self.previous = ahk.set_backend(self.backend)
+        self.script = ahk.Script()
+
+    def sent(self):
+        """:returns: The keys sent so far."""
+        return [event[2] for event in self.backend.desktop.events
+                if event[0] == 'send']
+
+    def test_00_escape(self):
+        """Testing text is escaped for Send."""
+        self.assertEqual(macro.escape("a{b}!+^#"), "a{{}b{}}{!}{+}{^}{#}",
+                         msg="Special characters not escaped!")
+        self.assertEqual(macro.escape("1\r\n2"), "1\n2",
+                         msg="Line ends not normalized!")
+
+    def test_01_play(self):
+        """Testing a macro replays text, keys and delays."""
+        text = 'a%b%;c, "q" `t\nline {x}!'
+        login = Macro([text, Keys("{Tab}"), "pw", 0.01, 0.02,
+                       Keys("{Enter}")])
+        before = self.backend.crossings
+        self.assertTrue(self.script.play(login), msg="Macro failed!")
+        self.assertEqual(self.backend.crossings - before, 1,
+                         msg="Play not a single engine call!")
+        self.assertEqual(self.sent(), [
+            macro.escape(text) + "{Tab}pw", "{Enter}"], msg="Wrong keys sent!")
+        self.assertIn("Sleep, 30", login.compile()[1],
+                      msg="Delays not merged!")
+        # Installed when played again, later replays take one engine call
+        self.assertTrue(self.script.play(login), msg="Replay failed!")
+        self.assertIn(login.compile()[1], ahk.current_engine().helpers,
+                      msg="Replayed macro not installed!")
+        before = self.backend.crossings
+        self.assertTrue(self.script.play(login), msg="Replay failed!")
+        self.assertEqual(self.backend.crossings - before, 1,
+                         msg="Replay not a single engine call!")
+        self.assertEqual(self.sent()[2:4], self.sent()[:2],
+                         msg="Replay differs!")
+        self.assertEqual(self.sent()[4:], self.sent()[:2],
+                         msg="Installed replay differs!")
+
+    def test_02_compile(self):
+        """Testing compiled macros are cached and long text split."""
+        keys = Macro().text("x").key("Tab", 3).keys("^a")
+        self.assertTrue(self.script.play([Keys("x{Tab 3}^a")]),
+                        msg="Keys failed!")
+        self.assertIs(keys.compile(), Macro().text("x").key("Tab", 3)
+                      .keys("^a").compile(), msg="Compiled macro not cached!")
+        self.assertNotEqual(keys.compile()[0], Macro(mode="Send").text("x")
+                            .key("Tab", 3).keys("^a").compile()[0],
+                            msg="Mode ignored!")
+        text = "{}" * macro._CHUNK
+        self.assertTrue(self.script.play([text]), msg="Long macro failed!")
+        sent = self.sent()[1:]
+        self.assertGreater(len(sent), 1, msg="Long text not split!")
+        self.assertEqual("".join(sent), macro.escape(text),
+                         msg="Split inside a keystroke!")
+
+    def test_03_one_off(self):
+        """Testing macros played once aren't installed."""
+        helpers = len(ahk.current_engine().helpers)
+        before = self.backend.crossings
+        for field in range(50):
+            self.assertTrue(self.script.play(["field {0}".format(field)]),
+                            msg="Macro failed!")
+        self.assertEqual(self.backend.crossings - before, 50,
+                         msg="One-off macros took extra engine calls!")
+        self.assertEqual(len(ahk.current_engine().helpers), helpers,
+                         msg="One-off macros installed in the engine!")
+        # Failing helpers report False like the other wrappers
+        failing = Macro(["fails"])
+        failing.play()
+        with mock.patch("ahk.ahk._call_many",
+                        side_effect=RuntimeError("failed")):
+            self.assertFalse(failing.play(), msg="Failure not reported!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        ahk.set_backend(self.previous)
+
+# Assemble test suites
+macro_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Macro)
+all_tests = unittest.TestSuite([
+                                macro_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
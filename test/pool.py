@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test the process pool engine farm with simulated engines."""
+import os, time
+import unittest
+try:
+    # The mock library was accepted as part of the Python Std. Library in V3.3
+    from unittest import mock
+except ImportError:
+    # Fall back to the back-ported version
+    import mock
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk.pool import Pool, WorkerError
+from ahk.simulated import SimulatedBackend
+
+# Jobs must be importable by the worker processes
+def increment(name):
+    """Increment a variable in the worker engine."""
+    ahk.execute("{0} += 1".format(name))
+    return os.getpid(), ahk.get(name)
+
+def square(x):
+    """Square x in the worker engine."""
+    ahk.execute("result := {0} * {0}".format(x))
+    return int(ahk.get("result"))
+
+def fail():
+    """Raise an exception in the worker."""
+    raise ValueError("job failed")
+
+class NeverReady(SimulatedBackend):
+    """Backend whose engine never becomes ready."""
+
+    def ready(self):
+        return False
+
+def crash():
+    """Kill the worker process."""
+    os._exit(3)
+
+class Test_Pool(unittest.TestCase):
+    """Test jobs are distributed over worker engines."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.pool = Pool(2, backend=SimulatedBackend, health_interval=0.05)
+
+    def test_00_jobs(self):
+        """Testing job results and errors."""
+        self.assertEqual(self.pool.map(square, range(10)),
+                         [x * x for x in range(10)], msg="Wrong results!")
+        self.assertRaises(ValueError, self.pool.submit(fail).result, 30)
+        self.assertEqual(self.pool.health(), [True, True],
+                         msg="Workers not healthy!")
+
+    def test_01_affinity(self):
+        """Testing jobs with a key share one worker engine."""
+        futures = [self.pool.submit(increment, "count", key=key)
+                   for i in range(5) for key in ("a", "b")]
+        results = [future.result(30) for future in futures]
+        for key, mine in (("a", results[0::2]), ("b", results[1::2])):
+            self.assertEqual(len(set(pid for pid, value in mine)), 1,
+                             msg="Key {0} ran on several workers!".format(key))
+            self.assertEqual([value for pid, value in mine],
+                             ["1", "2", "3", "4", "5"],
+                             msg="Key {0} lost engine state!".format(key))
+        self.assertNotEqual(results[0][0], results[1][0],
+                            msg="Keys not spread over the workers!")
+
+    def test_02_restart(self):
+        """Testing dead workers are restarted."""
+        pid = self.pool.submit(increment, "x", key="k").result(30)[0]
+        lost = self.pool.submit(crash, key="k")
+        self.assertRaises(WorkerError, lost.result, 30)
+        self.assertEqual(sum(stats['restarts'] for stats in self.pool.stats()),
+                         1, msg="Worker not restarted!")
+        new_pid, value = self.pool.submit(increment, "x", key="k").result(30)
+        self.assertNotEqual(new_pid, pid, msg="Job ran on the dead worker?")
+        self.assertEqual(value, "1", msg="Restarted engine kept state?")
+        self.assertEqual(self.pool.health(), [True, True],
+                         msg="Restarted worker not healthy!")
+
+    def test_03_affinity_bound(self):
+        """Testing affinity keys are bounded."""
+        self.pool.shutdown()
+        self.pool = Pool(2, backend=SimulatedBackend, affinity_size=3)
+        futures = [self.pool.submit(square, i, key=i) for i in range(10)]
+        self.assertEqual([future.result(30) for future in futures],
+                         [i * i for i in range(10)], msg="Wrong results!")
+        self.assertEqual(len(self.pool._affinity), 3,
+                         msg="Affinity keys not bounded!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        self.pool.shutdown()
+
+class Test_Failures(unittest.TestCase):
+    """Test workers failing to start."""
+
+    def test_00_not_ready(self):
+        """Testing jobs fail on a worker engine that isn't ready."""
+        with Pool(1, backend=NeverReady, timeout=0.1,
+                  health_interval=0.05) as pool:
+            error = pool.submit(square, 2).exception(30)
+            self.assertIsInstance(error, WorkerError,
+                                  msg="Job ran without a ready engine!")
+            self.assertIn("not ready", str(error),
+                          msg="Unclear error: {0}".format(error))
+
+    def test_02_give_up(self):
+        """Testing workers failing to start are restarted with backoff."""
+        with Pool(1, backend=NeverReady, timeout=0.1, health_interval=0.02,
+                  max_restarts=2, restart_delay=0.2) as pool:
+            for i in range(1500):
+                if pool.stats()[0]['failed']:
+                    break
+                time.sleep(0.02)
+            stats = pool.stats()[0]
+            self.assertTrue(stats['failed'], msg="Worker not given up!")
+            self.assertEqual(stats['restarts'], 2,
+                             msg="Wrong restart count {0}!".format(stats))
+            error = pool.submit(square, 2).exception(0)
+            self.assertIsInstance(error, WorkerError,
+                                  msg="Job queued on a given up worker!")
+            self.assertIn("given up", str(error),
+                          msg="Unclear error: {0}".format(error))
+            self.assertEqual(pool.check(), [], msg="Given up worker restarted!")
+
+    def test_01_failed_start(self):
+        """Testing started workers are stopped when another can't start."""
+        started = []
+        start = Pool._start
+        def fail_second(pool, worker):
+            if started:
+                raise OSError("Can't start")
+            start(pool, worker)
+            started.append(worker)
+        with mock.patch.object(Pool, '_start', fail_second):
+            self.assertRaises(OSError, Pool, 2, backend=SimulatedBackend)
+        self.assertEqual(len(started), 1, msg="First worker not started?")
+        self.assertFalse(started[0].process.is_alive(),
+                         msg="Started worker left running!")
+
+# Assemble test suites
+pool_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Pool)
+failures_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Failures)
+all_tests = unittest.TestSuite([
+                                pool_suite,
+                                failures_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
@@ -2,7 +2,7 @@
 from __future__ import absolute_import, print_function, division, unicode_literals
 
 """Test AutoHotKey script wrappers."""
-import os, time, random
+import copy, os, time, random
 import unittest
 try:
     # The mock library was accepted as part of the Python Std. Library in V3.3
@@ -49,6 +49,29 @@ class Test_Function(unittest.TestCase):
         # Cleanup
         ahk.terminate()
 
+    def test_01_arguments(self):
+        """Testing Function arguments and result slots."""
+        ahk.start()
+        ahk.ready()
+        echo = ahk.Function('echo', str, '(s)', 'return s')
+        other = ahk.Function('other', str, '(s)', 'return s')
+        self.assertNotEqual(echo.tmpname, other.tmpname,
+                            msg="Functions share a result variable!")
+        for value in ('plain', 'a "quoted", value; `tick` %x%', 'two\nlines',
+                      'x)y(', 42, -7):
+            self.assertEqual(echo(value), str(value),
+                             msg="Argument {0!r} changed!".format(value))
+            self.assertEqual(echo.evaluate(value), str(value),
+                msg="Argument {0!r} changed in expression!".format(value))
+        # Simulated backends count the engine calls
+        backend = ahk.get_backend()
+        if hasattr(backend, 'crossings'):
+            before = backend.crossings
+            echo('x')
+            self.assertEqual(backend.crossings - before, 1,
+                             msg="Call took several engine calls!")
+        ahk.terminate()
+
 # The methods of the Script class are not well suited to unit-tests as by their
 # nature they interact with the windowing environment they are run in.
 class Test_Script(unittest.TestCase):
@@ -209,6 +232,59 @@ class Test_Script(unittest.TestCase):
         self.assertNotEqual(result, None,
                             msg="Can't find an active window?")
 
+    def test_07_cachedVariable(self):
+        """Testing cached variable reads."""
+        script = ahk.Script()
+        script.variable('cached', int, 1, cache=True)
+        script.variable('recent', int, 1, cache=0.05)
+        script.variable('plain', int, 1)
+        ahk.execute("cached := 2\nrecent := 2\nplain := 2")
+        self.assertEqual((script.cached, script.recent, script.plain),
+                         (1, 1, 2), msg="Reads not cached!")
+        script.cached = 3
+        self.assertEqual(ahk.get("cached"), "3", msg="Write not passed on!")
+        ahk.execute("cached := 4")
+        self.assertEqual(script.cached, 3, msg="Write not cached!")
+        script.invalidate('cached')
+        self.assertEqual(script.cached, 4, msg="Value not invalidated!")
+        time.sleep(0.1)
+        self.assertEqual(script.recent, 2, msg="Stale value read!")
+        script.snapshot() # Installs the engine side helper
+        ahk.execute("cached := 5\nrecent := 5")
+        backend = ahk.get_backend()
+        before = getattr(backend, 'crossings', 0)
+        values = script.snapshot()
+        if hasattr(backend, 'crossings'):
+            self.assertEqual(backend.crossings - before, 1,
+                             msg="Snapshot took several engine calls!")
+        self.assertEqual((values['cached'], values['recent'], values['plain'],
+                          values['ErrorLevel']), (5, 5, 2, 0),
+                         msg="Wrong snapshot {0}!".format(values))
+        self.assertEqual(script.cached, 5, msg="Cache not refreshed!")
+
+    def test_08_bindings(self):
+        """Testing variables are bound per instance."""
+        first, second = ahk.Script(), ahk.Script()
+        first.variable('one', int, 1)
+        self.assertEqual(first.one, 1, msg="Wrong value!")
+        self.assertFalse(hasattr(second, 'one'),
+                         msg="Binding leaked between instances!")
+        self.assertIs(type(first), ahk.Script, msg="Not a Script anymore!")
+        with mock.patch.object(ahk.Script, '__getattr__') as fallback:
+            self.assertEqual(first.one, 1, msg="Wrong value!")
+        self.assertFalse(fallback.called, msg="Read went through __getattr__!")
+        self.assertEqual(copy.copy(first).one, 1, msg="Binding lost by a copy!")
+        # second started the running engine, a copy of it must not end it
+        clone = copy.copy(second)
+        del clone
+        self.assertTrue(ahk.ready(nowait=True),
+                        msg="Copy terminated the engine!")
+        first.variable('uncached', int, 1, cache=0)
+        ahk.execute("uncached := 2")
+        self.assertEqual(first.uncached, 2, msg="cache=0 cached the value!")
+        with self.assertRaises(AttributeError):
+            first.unknown = 1
+
     def tearDown(self):
         """Clean test environment."""
         pass
@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test the simulated AutoHotKey engine backend."""
+import os, threading, time
+import unittest
+try:
+    # The mock library was accepted as part of the Python Std. Library in V3.3
+    from unittest import mock
+except ImportError:
+    # Fall back to the back-ported version
+    import mock
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk.simulated import SimulatedBackend, WindowControl
+
+class Test_Simulated(unittest.TestCase):
+    """Test the simulated engine through the low-level wrappers."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.backend = SimulatedBackend()
+        self.previous = ahk.set_backend(self.backend)
+        ahk.start()
+        ahk.ready()
+
+    def test_00_select(self):
+        """Testing backend selection."""
+        self.assertIs(ahk.get_backend(), self.backend,
+                      msg="Backend not selected?")
+        ahk.terminate()
+        self.assertFalse(ahk.ready(nowait=True),
+                         msg="Terminated engine reports ready?")
+        self.assertFalse(ahk.execute("x := 1"),
+                         msg="Terminated engine executed commands?")
+
+    def test_01_expressions(self):
+        """Testing expression evaluation."""
+        tests = (
+            ('1 + 2', '3'),
+            ('7 // 2', '3'),
+            ('3 / 2', '1.500000'),
+            ('"a" . "b"', 'ab'),
+            ('"a" 5', 'a5'),
+            ('"He said ""hi"""', 'He said "hi"'),
+            ('"abc" + 1', ''),
+            ('0x10 + 1', '17'),
+            ('(1 < 2) && !(2 < 1)', '1'),
+            ('"ABC" = "abc"', '1'),
+            ('"ABC" == "abc"', '0'),
+            ('1 ? "yes" : "no"', 'yes'),
+            ('StrLen("hello")', '5'),
+            ('SubStr("hello", 2, 3)', 'ell'),
+            ('SubStr("hello", 0)', 'o'),
+            ('StrLen("\U0001F600")', '2'),
+            ('SubStr("a\U0001F600b", 2, 2)', '\U0001F600'),
+            ('InStr("\U0001F600b", "b")', '3'),
+            ('InStr("hello", "L")', '3'),
+            ('StrReplace("a,b,c", ",", ";")', 'a;b;c'),
+            ('Format("{}-{:03d}", "x", 7)', 'x-007'),
+            ('Round(2.5)', '3'),
+            ('Round(-2.5)', '-3'),
+            ('Round(0.5)', '1'),
+            ('Round(1250, -2)', '1300'),
+        )
+        for expr, expect in tests:
+            self.assertTrue(ahk.execute("result := " + expr),
+                            msg="Failed to execute {0}!".format(expr))
+            value = ahk.get("result")
+            self.assertEqual(value, expect,
+                msg="{0} gave {1!r}, expected {2!r}!".format(
+                    expr, value, expect))
+
+    def test_02_flow(self):
+        """Testing if/else, loops and functions."""
+        ahk.add_lines("""
+                      Collatz(n) {
+                          steps := 0
+                          while (n != 1) {
+                              if (Mod(n, 2) = 0)
+                                  n := n // 2
+                              else
+                                  n := 3*n + 1
+                              steps++
+                          }
+                          return steps
+                      }
+                      Total(list) {
+                          global count
+                          sum := 0
+                          Loop, Parse, list, `,
+                          {
+                              sum += A_LoopField
+                              count := A_Index
+                          }
+                          return sum
+                      }
+                      """)
+        self.assertEqual(ahk.call("Collatz", 27), "111",
+                         msg="Function with while loop miscalculated!")
+        self.assertEqual(ahk.call("Total", "1,2,3,4"), "10",
+                         msg="Function with parse loop miscalculated!")
+        self.assertEqual(ahk.get("count"), "4",
+                         msg="Global declaration ignored?")
+        self.assertEqual(ahk.get("sum"), "",
+                         msg="Local variable leaked into global scope!")
+        ahk.execute("x := 0\nLoop, 5\n{\nif (A_Index = 3)\ncontinue\nx += A_Index\n}")
+        self.assertEqual(ahk.get("x"), "12", msg="Loop/continue failed!")
+        self.assertFalse(ahk.execute("Bogus(1)"),
+                         msg="Call to missing function reported success!")
+
+    def test_03_windows(self):
+        """Testing window commands against the simulated desktop."""
+        desktop = self.backend.desktop
+        win = desktop.add_window("Untitled - Notepad", cls="Notepad", pid=42,
+                                 pos=(10, 20, 300, 200), activate=False)
+        script = ahk.Script()
+        self.assertEqual(script.winExist("Untitled"), win.hwnd,
+                         msg="Simulated window not found!")
+        self.assertEqual(script.winActive("Untitled"), None,
+                         msg="Inactive window reported active!")
+        script.winActivate("ahk_class Notepad")
+        self.assertEqual(script.winActive("A"), win.hwnd,
+                         msg="Window not activated!")
+        self.assertTrue(script.waitWindow("Untitled", timeout=0),
+                        msg="WinWait failed on existing window!")
+        self.assertFalse(script.waitWindow("Missing", timeout=0),
+                         msg="WinWait succeeded on missing window!")
+        desktop.close_window(win.hwnd)
+        self.assertTrue(script.waitWindow("Untitled", timeout=0, closed=True),
+                        msg="WinWaitClose failed on closed window!")
+
+    def test_04_input(self):
+        """Testing input commands are recorded."""
+        desktop = self.backend.desktop
+        script = ahk.Script()
+        script.send("abc{Enter}")
+        script.click(x=10, y=20)
+        self.assertEqual(desktop.events[-2][:3], ('send', 'sendinput',
+                                                  'abc{Enter}'),
+                         msg="Send not recorded!")
+        self.assertEqual(desktop.events[-1][:4], ('click', 'left', 10, 20),
+                         msg="Click not recorded!")
+        script.click(x=0, y=0)
+        self.assertEqual(desktop.events[-1][:4], ('click', 'left', 0, 0),
+                         msg="Click at the origin not moved!")
+        desktop.msgbox_responses.append('Cancel')
+        script.message("Continue?", options=1)
+        self.assertFalse(script.msgResult('OK'), msg="Wrong MsgBox result!")
+        self.assertTrue(script.msgResult('Cancel'), msg="Wrong MsgBox result!")
+        self.assertEqual(desktop.messages[-1][0], "Continue?",
+                         msg="MsgBox not recorded!")
+
+    def test_05_pixels(self):
+        """Testing pixel reads from the simulated screen."""
+        desktop = self.backend.desktop
+        desktop.fill(5, 5, 10, 10, (200, 100, 50))
+        script = ahk.Script()
+        self.assertEqual(script.getPixel(7, 7), (200, 100, 50),
+                         msg="Wrong pixel color read!")
+        self.assertEqual(script.getPixel(20, 20), desktop.background,
+                         msg="Wrong background color read!")
+
+    def test_06_controls(self):
+        """Testing Control commands against simulated controls."""
+        desktop = self.backend.desktop
+        desktop.add_window("Form", controls=[
+            WindowControl("Edit1"),
+            WindowControl("ComboBox1", choices=["red", "green", "blue"]),
+            WindowControl("Button1", text="Remember me"),
+        ])
+        script = ahk.Script()
+        ctl = ahk.Control(script, "Form")
+        form = desktop.window(ctl.hwnd)
+        ctl.setText("Edit1", "hello")
+        self.assertEqual(form.control("Edit1").text, "hello",
+                         msg="ControlSetText failed!")
+        self.assertEqual(ctl.get_choices("ComboBox1"),
+                         ["red", "green", "blue"], msg="Wrong choices!")
+        ctl.choose("ComboBox1", "gr")
+        self.assertEqual(ctl.get_chosen("ComboBox1"), "green",
+                         msg="ChooseString failed!")
+        ctl.choose("ComboBox1", 3)
+        self.assertEqual(ctl.get_chosen("ComboBox1"), "blue",
+                         msg="Choose by index failed!")
+        self.assertFalse(ctl.is_checked("Button1"), msg="Checked by default?")
+        ctl.check("Button1", True)
+        self.assertTrue(ctl.is_checked("Button1"), msg="Check failed!")
+        ctl.check("Button1")
+        self.assertFalse(ctl.is_checked("Button1"), msg="Toggle failed!")
+
+    def test_07_batch(self):
+        """Testing Script and Control wrappers queue into a batch."""
+        desktop = self.backend.desktop
+        desktop.add_window("Form", controls=[WindowControl("Edit1")])
+        script = ahk.Script()
+        ctl = ahk.Control(script, "Form")
+        events = len(desktop.events)
+        before = self.backend.crossings
+        with script.batch() as batch:
+            for i in range(20):
+                script.send("{0}".format(i))
+                script.click(x=i, y=i)
+            ctl.setText("Edit1", "done")
+            self.assertEqual(len(desktop.events), events,
+                             msg="Commands ran before the batch exited!")
+        self.assertEqual(self.backend.crossings - before, 2,
+                         msg="Batch used more than two engine calls!")
+        self.assertEqual(len(desktop.events) - events, 40,
+                         msg="Queued input commands not executed!")
+        self.assertEqual(desktop.window(ctl.hwnd).control("Edit1").text,
+                         "done", msg="Queued ControlSetText not executed!")
+        self.assertIsNone(batch.failed, msg="Unexpected batch failure!")
+
+    def test_08_ready(self):
+        """Testing readiness waiting on a slow starting engine."""
+        ahk.terminate()
+        self.backend.startup_delay = 0.1
+        ahk.start()
+        self.assertFalse(ahk.ready(timeout=0.01),
+                         msg="Engine ready before its startup delay!")
+        self.assertTrue(ahk.ready(timeout=5), msg="Engine never got ready!")
+        self.assertTrue(0.1 <= ahk.startup_time() < 0.3,
+            msg="Wrong startup time {0}!".format(ahk.startup_time()))
+        ahk.terminate()
+        self.backend.startup_delay = 0.5
+        self.assertRaises(RuntimeError, ahk.Script, timeout=0.01)
+        ahk.terminate()
+        # Scripts don't wait forever by default
+        with mock.patch.object(ahk.Engine, 'ready',
+                               return_value=False) as ready:
+            self.assertRaises(RuntimeError, ahk.Script)
+        self.assertEqual(ready.call_args[1]['timeout'], 10,
+                         msg="No default startup deadline!")
+        ahk.terminate()
+        self.backend.startup_delay = 0.05
+        ahk.start()
+        import asyncio
+        from ahk import aio
+        self.assertTrue(asyncio.run(aio.ready(timeout=5)),
+                        msg="Awaitable ready failed!")
+        self.assertTrue(ahk.startup_time() >= 0.05,
+                        msg="Startup time not recorded by awaitable ready!")
+
+    def test_09_engines(self):
+        """Testing independent engines side by side."""
+        first = ahk.Engine(SimulatedBackend())
+        second = ahk.Engine(SimulatedBackend())
+        one = ahk.Script(engine=first)
+        two = ahk.Script(engine=second)
+        self.assertIs(two.engine, second, msg="Script not bound to engine!")
+        first.backend.desktop.add_window("Only first")
+        self.assertTrue(one.winExist("Only first"), msg="Window not found!")
+        self.assertIsNone(two.winExist("Only first"),
+                          msg="Window found in the wrong engine!")
+        one.variable("shared", int, 1)
+        two.variable("shared", int, 2)
+        one.shared += 10
+        self.assertEqual((one.shared, two.shared), (11, 2),
+                         msg="Engines share variables!")
+        self.assertEqual(ahk.get("shared"), "",
+                         msg="Variable leaked into the default engine!")
+        with second:
+            self.assertEqual(ahk.get("shared"), "2",
+                             msg="Activated engine not used!")
+            self.assertIs(ahk.current_engine(), second,
+                          msg="Wrong current engine!")
+        self.assertIs(ahk.current_engine(), ahk.default_engine(),
+                      msg="Default engine not restored!")
+        # Batches only queue commands for their own engine
+        with two.batch():
+            two.send("queued")
+            ahk.execute("direct := 1")
+            self.assertEqual(ahk.get("direct"), "1",
+                             msg="Default engine command was queued!")
+            self.assertEqual(second.backend.desktop.events, [],
+                             msg="Batched command not queued!")
+        self.assertEqual(len(second.backend.desktop.events), 1,
+                         msg="Batched command not executed!")
+        # Collecting a Script only stops its own engine
+        del one
+        self.assertFalse(first.ready(nowait=True), msg="Engine still running!")
+        self.assertTrue(second.ready(nowait=True), msg="Other engine stopped!")
+        self.assertTrue(ahk.ready(nowait=True), msg="Default engine stopped!")
+        del two
+
+    def test_10_window_cache(self):
+        """Testing window lookups are cached and validated."""
+        desktop = self.backend.desktop
+        form = desktop.add_window("Form", controls=[WindowControl("Edit1")])
+        script = ahk.Script()
+        self.assertIsNone(script.window_stats(), msg="Cache on by default!")
+        script.cache_windows(ttl=None)
+        self.assertEqual(script.winExist("Form"), form.hwnd,
+                         msg="Window not found!")
+        before = self.backend.crossings
+        controls = [ahk.Control(script, "Form") for i in range(10)]
+        self.assertEqual(script.winActive("Form"), form.hwnd,
+                         msg="Active window not found!")
+        self.assertEqual(script.winActive("Form"), form.hwnd,
+                         msg="Cached active window not found!")
+        self.assertEqual(self.backend.crossings - before, 3,
+                         msg="Lookups not cached!")
+        self.assertEqual([ctl.hwnd for ctl in controls], [form.hwnd] * 10,
+                         msg="Controls found wrong window!")
+        # A closed window is looked up again
+        desktop.close_window(form.hwnd)
+        other = desktop.add_window("Form")
+        self.assertEqual(script.winExist("Form"), other.hwnd,
+                         msg="Closed window returned from cache!")
+        desktop.add_window("Other")
+        self.assertIsNone(script.winActive("Form"),
+                          msg="Inactive window returned from cache!")
+        stats = script.window_stats()
+        self.assertEqual((stats['hits'], stats['stale'], stats['saved']),
+                         (13, 2, 33), msg="Wrong statistics {0}!".format(stats))
+        # Entries expire
+        script.cache_windows(ttl=0.01)
+        script.winExist("Form")
+        desktop.set_title(other.hwnd, "Renamed")
+        self.assertEqual(script.winExist("Form"), other.hwnd,
+                         msg="Cached window not reused!")
+        time.sleep(0.02)
+        self.assertIsNone(script.winExist("Form"),
+                          msg="Expired window returned!")
+
+    def test_11_window_table(self):
+        """Testing bulk window enumeration."""
+        desktop = self.backend.desktop
+        pad = desktop.add_window("Untitled - Notepad", cls="Notepad", pid=7,
+                                 pos=(1, 2, 300, 200))
+        mail = desktop.add_window("Inbox (3) \U0001F4E7, \"Mail\"",
+                                  cls="Mail", pid=8)
+        script = ahk.Script()
+        script.windows() # Installs the engine side helper
+        before = self.backend.crossings
+        table = script.windows()
+        self.assertEqual(self.backend.crossings - before, 1,
+                         msg="Enumeration took several engine calls!")
+        self.assertEqual([info.hwnd for info in table],
+                         [win.hwnd for win in desktop.windows],
+                         msg="Windows not listed in z-order!")
+        info = table[pad.hwnd]
+        self.assertEqual((info.title, info.cls, info.pid, info.x, info.y,
+                          info.width, info.height),
+                         ("Untitled - Notepad", "Notepad", 7, 1, 2, 300, 200),
+                         msg="Wrong window details {0}!".format(info))
+        self.assertEqual(table[mail.hwnd].title, mail.title,
+                         msg="Title not transferred intact!")
+        self.assertEqual(table.find(cls="notepad"), [info],
+                         msg="Class lookup failed!")
+        self.assertEqual(table.first(regex=r"Inbox \((\d+)\)").hwnd,
+                         mail.hwnd, msg="Regex lookup failed!")
+        self.assertEqual(table.find(title="Notepad", pid=8), [],
+                         msg="Criteria not combined!")
+        # Incremental refresh only reports changes
+        desktop.close_window(pad.hwnd)
+        new = desktop.add_window("New", cls="Notepad")
+        title = mail.title
+        desktop.set_title(mail.hwnd, "Inbox (4)")
+        self.assertEqual(table.refresh(), ([new.hwnd], [pad.hwnd]),
+                         msg="Wrong changes reported!")
+        self.assertNotIn(pad.hwnd, table, msg="Closed window kept!")
+        self.assertEqual(table.first(cls="Notepad").hwnd, new.hwnd,
+                         msg="Class index not updated!")
+        self.assertEqual(table[mail.hwnd].title, title,
+                         msg="Known window queried again!")
+        self.assertEqual(table.refresh(full=True), ([], []),
+                         msg="Wrong changes reported!")
+        self.assertEqual(table[mail.hwnd].title, "Inbox (4)",
+                         msg="Full refresh didn't update details!")
+
+    def test_12_timers(self):
+        """Testing SetTimer and events."""
+        ahk.add_lines("ticks := 0\nreturn\nTick:\nticks++\nreturn\n")
+        self.assertTrue(ahk.execute("SetTimer, Tick, 10"),
+                        msg="SetTimer failed!")
+        self.assertFalse(ahk.execute("SetTimer, Missing, 10"),
+                         msg="Timer without target started!")
+        time.sleep(0.2)
+        self.assertTrue(ahk.execute("SetTimer, Tick, Off"),
+                        msg="Timer not stopped!")
+        ticks = int(ahk.get("ticks"))
+        self.assertGreater(ticks, 2, msg="Timer didn't run!")
+        time.sleep(0.05)
+        self.assertEqual(int(ahk.get("ticks")), ticks,
+                         msg="Timer ran after being stopped!")
+        event = self.backend.create_event()
+        self.assertFalse(event.wait(0), msg="New event set!")
+        ahk.execute('ok := DllCall("SetEvent", "Ptr", {0})'.format(
+            event.handle))
+        self.assertTrue(event.wait(0), msg="Event not set by the engine!")
+        self.assertEqual(ahk.get("ok"), "1", msg="Wrong DllCall result!")
+        event.close()
+
+    def test_13_window_waiter(self):
+        """Testing window waits multiplexed on one scheduler."""
+        desktop = self.backend.desktop
+        script = ahk.Script()
+        waiter = script.window_waiter(interval=0.02)
+        self.addCleanup(waiter.shutdown)
+        self.assertIs(script.window_waiter(interval=0.02), waiter,
+                      msg="Waiter not shared!")
+        self.assertIs(waiter.dispatcher, ahk.dispatch.shared(script.engine),
+                      msg="Waiter not on the engine's shared dispatcher!")
+        shown = [waiter.wait("Job {0}".format(i), timeout=5) for i in range(5)]
+        twice = waiter.wait("Job 1", timeout=5)
+        active = waiter.wait("Job 4", state="active", timeout=5)
+        never = waiter.wait("Never", timeout=0.1)
+        self.assertFalse(any(future.done() for future in shown),
+                         msg="Wait didn't return at once!")
+        self.assertRaises(ValueError, waiter.wait, "x", state="gone")
+        windows = []
+        for i in range(5):
+            time.sleep(0.03)
+            windows.append(desktop.add_window("Job {0}".format(i)))
+        self.assertEqual([future.result(5) for future in shown],
+                         [win.hwnd for win in windows],
+                         msg="Wrong windows found!")
+        self.assertEqual(twice.result(5), windows[1].hwnd,
+                         msg="Shared criteria not resolved!")
+        self.assertEqual(active.result(5), windows[4].hwnd,
+                         msg="Active window not found!")
+        self.assertIs(never.result(5), False, msg="Timeout not reported!")
+        closed = waiter.wait("Job 2", state="closed", timeout=5)
+        inactive = waiter.wait("Job 4", state="inactive", timeout=5)
+        desktop.close_window(windows[2].hwnd)
+        desktop.activate(windows[0].hwnd)
+        self.assertIs(closed.result(5), True, msg="Close not detected!")
+        self.assertIs(inactive.result(5), True, msg="Deactivation missed!")
+        metrics = waiter.metrics()
+        self.assertEqual((metrics['resolved'], metrics['timeouts'],
+                          metrics['pending']), (9, 1, 0),
+                         msg="Wrong metrics {0}!".format(metrics))
+        # One engine call per tick, however many waits are pending
+        waiter.interval = 10 # Keep the scheduler idle after its first tick
+        for i in range(5):
+            waiter.wait("Never {0}".format(i), timeout=10)
+        waiter.wait("Job 0", state="closed", timeout=10)
+        time.sleep(0.1)
+        before = self.backend.crossings
+        waiter.tick()
+        self.assertEqual(self.backend.crossings - before, 1,
+                         msg="Tick took several engine calls!")
+        waiter.shutdown()
+        self.assertEqual(waiter.pending(), 0, msg="Waits left pending!")
+
+    def test_14_waiter_failures(self):
+        """Testing window waits the engine doesn't answer fail alone."""
+        script = ahk.Script()
+        waiter = script.window_waiter(interval=0.02)
+        self.addCleanup(waiter.shutdown)
+        threads = []
+        def short(*args):
+            threads.append(threading.current_thread())
+            return "#0x0," # Only answers the first query
+        with mock.patch.object(ahk.ahk, '_call_many', side_effect=short):
+            first = waiter.wait("First", timeout=5)
+            second = waiter.wait("Second", timeout=5)
+            self.assertIsInstance(second.exception(5), RuntimeError,
+                                  msg="Unanswered wait not failed!")
+        self.assertFalse(first.done(), msg="Answered wait failed too!")
+        self.assertEqual(set(threads), set([waiter.dispatcher.thread]),
+                         msg="Engine queried outside the dispatcher!")
+        self.assertEqual(waiter.metrics()['failed'], 1,
+                         msg="Failure not counted!")
+        ahk.terminate()
+        self.assertIsInstance(first.exception(5), RuntimeError,
+                              msg="Wait not failed after terminate!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        ahk.set_backend(self.previous)
+
+# Assemble test suites
+simulated_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Simulated)
+all_tests = unittest.TestSuite([
+                                simulated_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)
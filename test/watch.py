@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, division, unicode_literals
+
+"""Test watching many pixels at once."""
+import os
+import threading
+import unittest
+try:
+    import ahk
+except ImportError:
+    # Try adding parent folder to front of path
+    import sys
+    sys.path = [os.path.abspath("../")] + sys.path
+    import ahk
+from ahk import capture
+from ahk.simulated import Desktop, SimulatedBackend, WindowControl
+from ahk.watch import PixelWatcher
+
+class Test_Watch(unittest.TestCase):
+    """Test PixelWatcher on the simulated desktop."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.backend = SimulatedBackend(Desktop(width=64, height=48))
+        self.previous = ahk.set_backend(self.backend)
+        self.desktop = self.backend.desktop
+        self.desktop.set_pixel(5, 5, (0, 0, 255))
+        self.script = ahk.Script()
+
+    def later(self, delay, x, y, color):
+        """Set a pixel from another thread after delay seconds."""
+        timer = threading.Timer(delay, self.desktop.set_pixel, (x, y, color))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_00_batched(self):
+        """Testing all pixels are read with one engine call per tick."""
+        watcher = PixelWatcher([(5, 5), (6, 6, (255, 0, 0)), (60, 40)],
+                               capturer=capture.EngineCapturer())
+        watcher.sample() # Installs the helper
+        before = self.backend.crossings
+        self.assertEqual(watcher.sample(), [(0, 0, 255), (0, 0, 0), (0, 0, 0)],
+                         msg="Wrong colors sampled!")
+        self.assertEqual(self.backend.crossings - before, 1,
+                         msg="Sample took several engine calls!")
+        self.assertEqual(watcher.check(), [], msg="Condition fired early!")
+
+    def test_01_wait(self):
+        """Testing which condition fired and when."""
+        self.later(0.1, 30, 20, (250, 5, 0))
+        fired = self.script.waitPixels([(5, 5), (30, 20, (255, 0, 0), 0.05)],
+                                       timeout=5)
+        self.assertIsNotNone(fired, msg="Nothing fired!")
+        self.assertEqual((fired.index, fired.color), (1, (250, 5, 0)),
+                         msg="Wrong condition fired!")
+        self.assertTrue(0.05 < fired.elapsed < 4,
+                        msg="Wrong elapsed time {0}!".format(fired.elapsed))
+        # Changes from the starting color
+        self.later(0.1, 5, 5, (0, 0, 0))
+        fired = self.script.waitPixels([(30, 21, (255, 255, 255)), (5, 5)],
+                                       timeout=5)
+        self.assertEqual((fired.index, fired.color), (1, (0, 0, 0)),
+                         msg="Change not detected!")
+
+    def test_02_timeout(self):
+        """Testing timeouts and interval adaptation."""
+        watcher = PixelWatcher([(5, 5)], interval=0.01, max_interval=0.04)
+        start = ahk.ahk._clock()
+        self.assertIsNone(watcher.wait(timeout=0.2), msg="Fired on no change!")
+        self.assertTrue(0.2 <= ahk.ahk._clock() - start < 2,
+                        msg="Wrong timeout!")
+        self.assertEqual(watcher.interval, 0.04,
+                         msg="Interval didn't grow while still!")
+        watcher.min_interval = 0.01
+        self.desktop.set_pixel(5, 5, (1, 2, 3))
+        watcher.check()
+        self.assertEqual(watcher.interval, 0.02,
+                         msg="Interval didn't shrink on change!")
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        ahk.set_backend(self.previous)
+
+class _PollingBackend(SimulatedBackend):
+    """Simulated engine without events."""
+
+    def create_event(self):
+        return None
+
+class Test_EngineWatcher(unittest.TestCase):
+    """Test EngineWatcher conditions run by engine timers."""
+
+    def setUp(self):
+        """Configure test environment."""
+        self.backend = self.make_backend()
+        self.previous = ahk.set_backend(self.backend)
+        self.desktop = self.backend.desktop
+        self.script = ahk.Script()
+
+    def make_backend(self):
+        return SimulatedBackend(Desktop(width=64, height=48))
+
+    def later(self, delay, func, *args):
+        """Call func from another thread after delay seconds."""
+        timer = threading.Timer(delay, func, args)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_00_signal(self):
+        """Testing waiting is signaled by the engine."""
+        watcher = self.script.watcher(period=10)
+        self.addCleanup(watcher.close)
+        self.assertEqual(watcher.variable("done", "yes"), 0,
+                         msg="Wrong condition index!")
+        watcher.start()
+        self.later(0.1, ahk.set, "done", "Yes")
+        before = self.backend.crossings
+        fired = watcher.wait(5)
+        self.assertEqual(fired.index, 0, msg="Condition didn't fire!")
+        # The set and reading the result, no polling
+        self.assertEqual(self.backend.crossings - before, 2,
+                         msg="Waiting called into the engine!")
+        self.assertTrue(0.05 < fired.elapsed < 4,
+                        msg="Wrong elapsed time {0}!".format(fired.elapsed))
+
+    def test_01_conditions(self):
+        """Testing window, pixel, control and expression conditions."""
+        watcher = self.script.watcher(period=10)
+        self.addCleanup(watcher.close)
+        save = watcher.window("Save As")
+        red = watcher.pixel(5, 5, (255, 0, 0), 0.05)
+        change = watcher.pixel(6, 6)
+        saved = watcher.control("Edit1", "Untitled", contains="saved")
+        count = watcher.expression("count > 3")
+        self.later(0.05, self.desktop.add_window, "Save As")
+        self.assertEqual(watcher.wait(5).index, save, msg="Window missed!")
+        self.desktop.close_window(self.desktop.active)
+        self.later(0.05, self.desktop.set_pixel, 5, 5, (250, 5, 0))
+        fired = watcher.wait(5)
+        self.assertEqual((fired.index, fired.color), (red, (250, 5, 0)),
+                         msg="Pixel color missed!")
+        self.desktop.set_pixel(5, 5, (0, 0, 0))
+        self.later(0.05, self.desktop.set_pixel, 6, 6, (9, 90, 9))
+        self.assertEqual(watcher.wait(5).index, change,
+                         msg="Pixel change missed!")
+        pad = self.desktop.add_window("Untitled - Notepad",
+                                      controls=[WindowControl("Edit1", "new")])
+        self.assertIsNone(watcher.wait(0.1), msg="Fired on wrong text!")
+        pad.controls[0].text = "file saved"
+        self.assertEqual(watcher.wait(5).index, saved,
+                         msg="Control text missed!")
+        self.desktop.close_window(pad.hwnd)
+        self.later(0.05, ahk.execute, "count := 4")
+        self.assertEqual(watcher.wait(5).index, count,
+                         msg="Expression missed!")
+        self.assertRaises(RuntimeError, watcher.expression, "1")
+        self.assertRaises(ValueError, watcher.variable, "x", 1, "~=")
+
+    def test_02_timeout(self):
+        """Testing timeouts stop the engine timer."""
+        watcher = self.script.watcher(period=10)
+        watcher.window("Never")
+        self.assertIsNone(watcher.wait(0.1), msg="Fired without window!")
+        self.assertFalse(self.backend._timers, msg="Timer still running!")
+        watcher.close()
+
+    def tearDown(self):
+        """Clean test environment."""
+        ahk.terminate()
+        ahk.set_backend(self.previous)
+
+class Test_EngineWatcherPolling(Test_EngineWatcher):
+    """Test EngineWatcher on backends without events."""
+
+    def make_backend(self):
+        return _PollingBackend(Desktop(width=64, height=48))
+
+    def test_00_signal(self):
+        """Testing waiting polls the result."""
+        watcher = self.script.watcher(period=10)
+        self.addCleanup(watcher.close)
+        watcher.variable("done", "yes")
+        self.later(0.05, ahk.set, "done", "yes")
+        self.assertEqual(watcher.wait(5).index, 0, msg="Condition missed!")
+
+# Assemble test suites
+watch_suite = unittest.TestLoader().loadTestsFromTestCase(Test_Watch)
+engine_suite = unittest.TestLoader().loadTestsFromTestCase(Test_EngineWatcher)
+polling_suite = unittest.TestLoader().loadTestsFromTestCase(
+    Test_EngineWatcherPolling)
+all_tests = unittest.TestSuite([
+                                watch_suite,
+                                engine_suite,
+                                polling_suite,
+                              ])
+if __name__ == "__main__":
+    # Run tests
+    unittest.TextTestRunner(verbosity=2).run(all_tests)